@@ -0,0 +1,48 @@
+# scripts/bench_batch.py
+# v14.2: Compares one 'run.py --batch' of N steps against N separate run.py invocations.
+# Runs in a scratch copy of the workspace so the real session.log is left untouched.
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+from bench_gateway import make_workspace
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark run.py --batch against separate gateway invocations.")
+    parser.add_argument("--steps", type=int, default=100, help="Number of intent/command steps.")
+    parser.add_argument("--command", default="true", help="The command each step runs.")
+    args = parser.parse_args()
+
+    workspace = make_workspace()
+    try:
+        plan_path = os.path.join(workspace, 'plan.jsonl')
+        with open(plan_path, 'w') as f:
+            for i in range(args.steps):
+                f.write(json.dumps({"intent": f"benchmark step {i}", "command": args.command}) + '\n')
+
+        start = time.perf_counter()
+        for i in range(args.steps):
+            subprocess.run([sys.executable, 'scripts/run.py', '--intent', f"benchmark step {i}", '--command', args.command],
+                           cwd=workspace, stdout=subprocess.DEVNULL, check=True)
+        separate = time.perf_counter() - start
+
+        start = time.perf_counter()
+        subprocess.run([sys.executable, 'scripts/run.py', '--batch', 'plan.jsonl'], cwd=workspace, stdout=subprocess.DEVNULL, check=True)
+        batch = time.perf_counter() - start
+
+        with open(os.path.join(workspace, 'session.log')) as f:
+            logged = sum(1 for line in f)
+        print(f"{args.steps} steps of {args.command!r}")
+        print(f"separate invocations  {separate * 1000:9.1f} ms total  {separate * 1000 / args.steps:7.2f} ms/step")
+        print(f"one --batch           {batch * 1000:9.1f} ms total  {batch * 1000 / args.steps:7.2f} ms/step")
+        print(f"speed-up              {separate / batch:9.1f}x   ({logged} log entries written)")
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
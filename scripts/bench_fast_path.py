@@ -0,0 +1,53 @@
+# scripts/bench_fast_path.py
+# v14.2: Per-command latency of the gateway's shell-free fast path against the bash path,
+# optionally with CPU hogs running to model a busy host.
+
+import argparse
+import multiprocessing
+import statistics
+import subprocess
+import time
+
+import gateway
+
+def hog():
+    while True:
+        pass
+
+def measure(command, direct_exec, runs):
+    options = gateway.RunOptions(stdin=subprocess.DEVNULL, direct_exec=direct_exec)
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = gateway.run_streaming(command, None, None, options)
+        samples.append((time.perf_counter() - start) * 1000)
+        result.stdout.close()
+        result.stderr.close()
+    return statistics.median(samples), sorted(samples)[int(len(samples) * 0.95) - 1]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the gateway's shell-free fast path against bash.")
+    parser.add_argument("--runs", type=int, default=200, help="Executions per command and path.")
+    parser.add_argument("--busy", type=int, default=0, help="Number of CPU-burning processes to run alongside.")
+    parser.add_argument("commands", nargs='*', default=["ls", "cat scripts/run.py", "git rev-parse HEAD"])
+    args = parser.parse_args()
+
+    hogs = [multiprocessing.Process(target=hog, daemon=True) for _ in range(args.busy)]
+    for proc in hogs:
+        proc.start()
+    try:
+        print(f"{args.runs} runs each, {args.busy} busy processes\n")
+        for command in args.commands:
+            if gateway.direct_argv(command, gateway.os.environ) is None:
+                print(f"{command!r}: needs bash, skipped")
+                continue
+            bash_median, bash_p95 = measure(command, False, args.runs)
+            direct_median, direct_p95 = measure(command, True, args.runs)
+            print(f"{command!r:<26} bash median {bash_median:6.2f} ms p95 {bash_p95:6.2f} ms | "
+                  f"direct median {direct_median:6.2f} ms p95 {direct_p95:6.2f} ms | saved {bash_median - direct_median:5.2f} ms")
+    finally:
+        for proc in hogs:
+            proc.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# scripts/bench_gateway.py
+# v14.2: Measures the per-call overhead of run.py through the gateway daemon and in-process,
+# against the original single-file run.py (taken from git) as the baseline. Runs in a scratch
+# copy of the workspace so the real session.log is left untouched.
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPTS_DIR)
+
+def make_workspace():
+    workspace = tempfile.mkdtemp(prefix='gateway_bench_')
+    shutil.copytree(SCRIPTS_DIR, os.path.join(workspace, 'scripts'), ignore=shutil.ignore_patterns('__pycache__'))
+    shutil.copytree(os.path.join(PROJECT_ROOT, 'config'), os.path.join(workspace, 'config'))
+    return workspace
+
+def baseline_client(workspace, rev):
+    """Writes run.py as of rev into the workspace and returns its path, or None if git cannot provide it."""
+    try:
+        rev = rev or subprocess.run(['git', 'rev-list', '--max-parents=0', 'HEAD'], cwd=PROJECT_ROOT, check=True,
+                                    capture_output=True, text=True).stdout.split()[0]
+        source = subprocess.run(['git', 'show', f"{rev}:scripts/run.py"], cwd=PROJECT_ROOT, check=True,
+                                capture_output=True).stdout
+    except (OSError, subprocess.CalledProcessError, IndexError):
+        return None
+    path = os.path.join(workspace, 'baseline_run.py')
+    with open(path, 'wb') as f:
+        f.write(source)
+    return path
+
+def time_calls(argv, calls, cwd):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        subprocess.run(argv, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def wait_for_socket(workspace, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(os.path.join(workspace, '.gateway', 'gateway.sock')):
+        if time.monotonic() > deadline:
+            raise RuntimeError("Gateway daemon did not come up.")
+        time.sleep(0.05)
+
+def report(label, samples, baseline=None):
+    median = statistics.median(samples)
+    line = f"{label:<28} median {median:7.2f} ms   mean {statistics.mean(samples):7.2f} ms   p95 {sorted(samples)[int(len(samples) * 0.95) - 1]:7.2f} ms"
+    if baseline is not None:
+        line += f"   overhead {median - baseline:7.2f} ms"
+    print(line)
+    return median
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark run.py per-call overhead with and without the gateway daemon.")
+    parser.add_argument("--calls", type=int, default=200, help="Number of gateway calls per scenario.")
+    parser.add_argument("--command", default="true", help="The command each gateway call runs.")
+    parser.add_argument("--baseline-rev", help="Commit whose scripts/run.py is the baseline (default: the root commit).")
+    args = parser.parse_args()
+
+    workspace = make_workspace()
+    gateway_args = ['--intent', 'benchmark', '--command', args.command]
+    gateway_call = [sys.executable, 'scripts/run.py'] + gateway_args
+    daemon = None
+    try:
+        print(f"{args.calls} calls of {args.command!r} in {workspace}\n")
+        bare = report("bare command (bash -c)", time_calls(['/bin/bash', '-c', args.command], args.calls, workspace))
+        baseline_path = baseline_client(workspace, args.baseline_rev)
+        baseline = None
+        if baseline_path is not None:
+            baseline = report("baseline run.py", time_calls([sys.executable, baseline_path] + gateway_args, args.calls, workspace), bare)
+        in_process = report("run.py, in-process", time_calls(gateway_call, args.calls, workspace), bare)
+
+        daemon = subprocess.Popen([sys.executable, 'scripts/gateway_daemon.py'], cwd=workspace, stdout=subprocess.DEVNULL)
+        wait_for_socket(workspace)
+        via_daemon = report("run.py, via daemon", time_calls(gateway_call, args.calls, workspace), bare)
+
+        if baseline is None:
+            print("\nBaseline run.py not available from git; comparing against the in-process path instead.")
+            baseline = in_process
+        print(f"\nPer-call overhead vs the baseline: daemon {via_daemon - baseline:+.2f} ms "
+              f"({(baseline - bare) / max(via_daemon - bare, 1e-9):.1f}x less), "
+              f"in-process fallback {in_process - baseline:+.2f} ms.")
+    finally:
+        if daemon is not None:
+            daemon.terminate()
+            daemon.wait()
+        shutil.rmtree(workspace, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# scripts/bench_log_reader.py
+# v14.2: Benchmark for log_reader on a large synthetic session log: a session of realistic intent
+# and command_result entries, sealed into segments as the writer would, of which the latest is the
+# hot, indexed log. Each query runs in a process of its own, so its peak RSS is its own; loading
+# the whole log into a list, as the scripts used to, is measured alongside for comparison. The scans
+# are repeated on the same session in binary_log's encoding.
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import binary_log
+import log_reader
+import log_segments
+import session_log
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp()
+TOOLS = ['git status', 'git diff', 'ls -la', 'cat scripts/run.py', 'pytest -q tests', 'grep -rn TODO scripts', 'python3 scripts/x.py']
+
+def synthetic_entries(rng):
+    """An endless session: an intent, then its command's result, a few seconds apart."""
+    seq = 0
+    while True:
+        for kind in ('intent', 'command_result'):
+            seq += 1
+            ts = datetime.fromtimestamp(START + seq * 2.5, timezone.utc).isoformat()
+            if kind == 'intent':
+                yield {"type": "intent", "details": f"Inspect the state of the work, step {seq}", "timestamp": ts, "seq": seq}
+            else:
+                yield {"type": "command_result", "command": rng.choice(TOOLS), "returncode": rng.choice((0, 0, 0, 1)),
+                       "stdout": "x" * rng.randint(20, 600), "stderr": "", "timestamp": ts, "duration_ms": rng.random() * 100,
+                       "stdout_bytes": 100, "stderr_bytes": 0, "seq": seq}
+
+def generate(path, size_mb, segment_mb):
+    """Writes about size_mb of entries, sealing a segment every segment_mb. Returns the entry count."""
+    rng = random.Random(0)
+    target, segment_bytes = size_mb * 1024 * 1024, segment_mb * 1024 * 1024
+    total = written = 0
+    summary = None
+    f = open(path, 'wb')
+    for entry in synthetic_entries(rng):
+        line = (json.dumps(entry) + '\n').encode('utf-8')
+        f.write(line)
+        written += len(line)
+        total += 1
+        ns = session_log.timestamp_ns(entry['timestamp'])
+        if summary is None:
+            summary = {"entries": 0, "first_seq": entry['seq'], "min_timestamp_ns": ns}
+        summary.update(entries=summary['entries'] + 1, last_seq=entry['seq'], max_timestamp_ns=ns)
+        if written >= target:
+            break
+        if f.tell() >= segment_bytes:
+            f.close()
+            log_segments.seal(path, summary)
+            f, summary = open(path, 'wb'), None
+    f.close()
+    # One append through the writer indexes the hot segment.
+    session_log.SessionLogWriter(path, segment_bytes=0, store=False).append({"type": "note"})
+    return total + 1
+
+def load_all(path):
+    return len(list(session_log.read_entries(path)))
+
+def count(path, **filters):
+    return sum(1 for _ in log_reader.entries(path, **filters))
+
+def last(path, n, **filters):
+    return log_reader.last(n, path, **filters)
+
+def encode(source, target):
+    with open(target, 'wb') as f:
+        encoder = binary_log.Encoder(f)
+        for entry in session_log.read_entries(source):
+            encoder.write(entry)
+
+def measure(case, result):
+    name, function, path, kwargs = case
+    start = time.perf_counter()
+    found = function(path, **kwargs)
+    elapsed = time.perf_counter() - start
+    result.put((name, found if isinstance(found, int) else len(found), elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark log_reader's streaming queries on a large synthetic session log.")
+    parser.add_argument("--mb", type=int, default=300, help="Size of the synthetic log in MB (default: 300).")
+    parser.add_argument("--segment-mb", type=int, default=session_log.SEGMENT_MAX_BYTES // (1024 * 1024), help="Segment size in MB.")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='log_reader_bench_')
+    path = os.path.join(workdir, 'session.log')
+    try:
+        start = time.perf_counter()
+        total = generate(path, args.mb, args.segment_mb)
+        print(f"{total} entries, {args.mb} MB in {len(log_segments.read_manifest(path)['segments'])} sealed segments "
+              f"+ the hot one, written in {time.perf_counter() - start:.1f} s\n")
+        last_hour = session_log.timestamp_ns(datetime.fromtimestamp(START + (total - 1) * 2.5 - 3600, timezone.utc).isoformat())
+        start = time.perf_counter()
+        encoded = os.path.join(workdir, 'session.bin')
+        encode(path, encoded)
+        print(f"Encoded in {time.perf_counter() - start:.1f} s: {os.path.getsize(encoded) / (1024 * 1024):.0f} MB\n")
+        cases = [
+            ("load all into a list", load_all, path, {}),
+            ("stream all", count, path, {}),
+            ("stream types={intent}", count, path, {"types": {'intent'}}),
+            ("stream base=git", count, path, {"base": 'git'}),
+            ("stream the last hour", count, path, {"since": last_hour}),
+            ("last 50 (index)", last, path, {"n": 50}),
+            ("last 50 pytest runs (index)", last, path, {"n": 50, "types": {'command_result'}, "base": 'pytest'}),
+            ("last 50 intents of the last hour", last, path, {"n": 50, "types": {'intent'}, "since": last_hour}),
+            ("binary: stream all", count, encoded, {}),
+            ("binary: stream types={intent}", count, encoded, {"types": {'intent'}}),
+            ("binary: stream base=git", count, encoded, {"base": 'git'}),
+            ("binary: stream the last hour", count, encoded, {"since": last_hour}),
+        ]
+        print(f"{'query':<34} {'entries':>9} {'seconds':>9} {'MB/s':>8} {'peak RSS MB':>12}")
+        for case in cases:
+            result = multiprocessing.Queue()
+            proc = multiprocessing.Process(target=measure, args=(case, result))
+            proc.start()
+            name, found, elapsed, rss_kb = result.get()
+            proc.join()
+            print(f"{name:<34} {found:>9} {elapsed:>9.3f} {args.mb / elapsed:>8.0f} {rss_kb / 1024:>12.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
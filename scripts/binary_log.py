@@ -0,0 +1,244 @@
+# scripts/binary_log.py
+# v14.2: Compact binary encoding of session entries, convertible to and from the JSONL session log
+# and a handoff's full_session_log without loss. A file is MAGIC followed by length-prefixed
+# records. String records intern the strings the entries repeat (types, commands, tool names and
+# key layouts) the first time they appear, so the file can be written and read as a stream. An
+# entry record is a fixed header (epoch-nanosecond timestamp, seq, and the ids of its type, key
+# layout, tool and command), the 32-byte digests of its *_hash fields, and a compact JSON array of
+# its other values. The timestamp style records how the timestamp string was written (fraction
+# digits and zone), so the gateway's +00:00 microseconds and bootstrap's %N Z nanoseconds both come
+# back as they were. Readers check the header before decoding the body, so a scan by type, time or
+# tool skips most of the work. session_log's readers (and log_reader on top of them) recognise
+# the magic, so an encoded log or segment is read like a JSONL one.
+# python3 scripts/binary_log.py encode|decode IN OUT converts a log or a handoff.
+
+import argparse
+import functools
+import json
+import os
+import re
+import struct
+import sys
+import time
+
+import session_log
+
+MAGIC = session_log.BINARY_MAGIC
+RECORD = struct.Struct('<IB') # payload length, kind
+KIND_STRING, KIND_ENTRY, KIND_HANDOFF = 1, 2, 3
+ENTRY_HEADER = struct.Struct('<qqIIIIBB') # timestamp_ns, seq, type, layout, tool and command ids, timestamp style, hash count
+NO_ID = 0xFFFFFFFF
+NO_VALUE = -1 << 63
+HASH_SIZE = 32
+READ_SIZE = 1024 * 1024
+HASH_PATTERN = re.compile(r'[0-9a-f]{64}')
+# Slots of a layout: where each key's value is kept.
+VALUE, TYPE, TIMESTAMP, SEQ, COMMAND, HASH = 'v', 't', 'ts', 's', 'c', 'h'
+ZONES = ('Z', '+00:00', '') # timestamp style: zone index << 4 | fraction digits
+NO_TIMESTAMP = 0xFF
+
+@functools.lru_cache(maxsize=256)
+def format_minute(minutes):
+    return time.strftime('%Y-%m-%dT%H:%M:', time.gmtime(minutes * 60))
+
+def format_timestamp(ns, style):
+    minutes, fraction = divmod(ns, 60_000_000_000)
+    seconds, fraction = divmod(fraction, 1_000_000_000)
+    digits = style & 0x0F # Entries come minutes apart at most, so the text up to the minute is cached.
+    text = f"{format_minute(minutes)}{seconds:02d}"
+    if digits:
+        text += '.' + f"{fraction:09d}"[:digits]
+    return text + ZONES[style >> 4]
+
+def parse_timestamp(text):
+    """(epoch ns, style) of a UTC timestamp that format_timestamp writes back exactly, or None."""
+    ns = session_log.timestamp_ns(text)
+    if ns is None:
+        return None
+    zone = next(i for i, suffix in enumerate(ZONES) if text.endswith(suffix))
+    dot = text.find('.')
+    digits = 0 if dot < 0 else len(text) - dot - 1 - len(ZONES[zone])
+    style = zone << 4 | digits
+    return (ns, style) if 0 <= digits <= 9 and format_timestamp(ns, style) == text else None
+
+class Encoder:
+    """Writes entries to a binary stream, interning strings as they first appear."""
+
+    def __init__(self, f):
+        self.f = f
+        self.ids = {}
+        f.write(MAGIC)
+
+    def record(self, kind, payload):
+        self.f.write(RECORD.pack(len(payload), kind))
+        self.f.write(payload)
+
+    def intern(self, text):
+        if text is None:
+            return NO_ID
+        if text not in self.ids:
+            self.ids[text] = len(self.ids)
+            self.record(KIND_STRING, text.encode('utf-8', 'surrogatepass'))
+        return self.ids[text]
+
+    def write(self, entry):
+        ns, seq, style = NO_VALUE, NO_VALUE, NO_TIMESTAMP
+        kind = command = None
+        layout, values, hashes = [], [], []
+        for key, value in entry.items():
+            slot = VALUE
+            if key == 'type' and isinstance(value, str):
+                slot, kind = TYPE, value
+            elif key == 'timestamp' and (parsed := parse_timestamp(value)) is not None:
+                slot, (ns, style) = TIMESTAMP, parsed
+            elif key == 'seq' and type(value) is int and NO_VALUE < value < 1 << 63:
+                slot, seq = SEQ, value
+            elif key == 'command' and isinstance(value, str):
+                slot, command = COMMAND, value
+            elif key.endswith('_hash') and isinstance(value, str) and HASH_PATTERN.fullmatch(value) and len(hashes) < 255:
+                slot = HASH
+                hashes.append(bytes.fromhex(value))
+            else:
+                values.append(value)
+            layout.append([key, slot])
+        tool = session_log.command_base(command) if command is not None else None
+        ids = [self.intern(text) for text in (kind, json.dumps(layout), tool, command)]
+        body = json.dumps(values, separators=(',', ':')).encode('utf-8') if values else b''
+        self.record(KIND_ENTRY, ENTRY_HEADER.pack(ns, seq, *ids, style, len(hashes)) + b''.join(hashes) + body)
+
+    def write_handoff(self, handoff):
+        """Records a handoff's fields other than full_session_log, and where that key was."""
+        keys = list(handoff)
+        fields = {key: value for key, value in handoff.items() if key != 'full_session_log'}
+        position = keys.index('full_session_log') if 'full_session_log' in handoff else None
+        self.record(KIND_HANDOFF, json.dumps({"fields": fields, "log_position": position}).encode('utf-8'))
+
+def is_binary(f):
+    """Whether a binary stream holds this encoding; it is left positioned after the magic if so."""
+    head = f.read(len(MAGIC))
+    if head == MAGIC:
+        return True
+    f.seek(0)
+    return False
+
+def records(f):
+    """(kind, payload) of each complete record after the magic; a record cut short ends the stream.
+    Read in large chunks: a read call per record would cost more than decoding it."""
+    unpack, header_size = RECORD.unpack_from, RECORD.size
+    data, position = b'', 0
+    while True:
+        chunk = f.read(READ_SIZE)
+        data, position = data[position:] + chunk, 0
+        end = len(data)
+        while position + header_size <= end:
+            length, kind = unpack(data, position)
+            start = position + header_size
+            if start + length > end:
+                break
+            position = start + length
+            yield kind, data[start:position]
+        if not chunk:
+            return
+
+def compile_layout(text):
+    """(keys, [(position, slot), ...]) of a layout: its keys in order, and where the values not in
+    the body go among the body's values, in ascending order."""
+    layout = json.loads(text)
+    return tuple(key for key, _ in layout), [(i, slot) for i, (_, slot) in enumerate(layout) if slot != VALUE]
+
+def decode(f, keep=None, handoff=None):
+    """Yields the entries of a binary stream positioned after its magic. keep(type, timestamp_ns,
+    tool), given, is asked before an entry's body is decoded and skips it if false; None stands for
+    a value the header does not hold. A handoff record's contents are put into handoff (a dict)."""
+    strings, layouts = [], {}
+    loads, unpack, header_size = json.JSONDecoder().raw_decode, ENTRY_HEADER.unpack_from, ENTRY_HEADER.size
+    for kind, payload in records(f):
+        if kind == KIND_STRING:
+            strings.append(payload.decode('utf-8', 'surrogatepass'))
+            continue
+        if kind == KIND_HANDOFF:
+            if handoff is not None:
+                handoff.update(json.loads(payload))
+            continue
+        if kind != KIND_ENTRY:
+            continue # A record kind from a later version.
+        ns, seq, type_id, layout_id, tool_id, command_id, style, hash_count = unpack(payload)
+        if keep is not None and not keep(None if type_id == NO_ID else strings[type_id],
+                                         None if style == NO_TIMESTAMP else ns,
+                                         None if tool_id == NO_ID else strings[tool_id]):
+            continue
+        layout = layouts.get(layout_id)
+        if layout is None:
+            layout = layouts[layout_id] = compile_layout(strings[layout_id])
+        keys, slots = layout
+        body_start = header_size + hash_count * HASH_SIZE
+        values = loads(payload[body_start:].decode('utf-8'))[0] if len(payload) > body_start else []
+        hashes = 0
+        for position, slot in slots:
+            if slot == TYPE:
+                value = strings[type_id]
+            elif slot == TIMESTAMP:
+                value = format_timestamp(ns, style)
+            elif slot == SEQ:
+                value = seq
+            elif slot == COMMAND:
+                value = strings[command_id]
+            else:
+                value = payload[header_size + hashes * HASH_SIZE:header_size + (hashes + 1) * HASH_SIZE].hex()
+                hashes += 1
+            values.insert(position, value)
+        yield dict(zip(keys, values))
+
+def encode_file(source, target):
+    """Encodes a JSONL log or a handoff JSON file. Returns the number of entries."""
+    count = 0
+    with open(target, 'wb') as out:
+        encoder = Encoder(out)
+        if source.endswith('.json'):
+            with open(source) as f:
+                handoff = json.load(f)
+            encoder.write_handoff(handoff)
+            for entry in handoff.get('full_session_log', []):
+                encoder.write(entry)
+                count += 1
+            return count
+        with open(source, 'rb') as f:
+            for entry in session_log.parse_entries(f):
+                encoder.write(entry)
+                count += 1
+    return count
+
+def decode_file(source, target):
+    """Writes an encoded file back as the JSONL log or the handoff JSON it came from (the handoff
+    as json.dump(indent=2) and consolidate_handoff write it). Returns the number of entries."""
+    handoff = {}
+    with open(source, 'rb') as f:
+        if not is_binary(f):
+            raise ValueError(f"{source} is not a binary session log")
+        entries = list(decode(f, handoff=handoff))
+    with open(target, 'w') as out:
+        if not handoff:
+            for entry in entries:
+                out.write(json.dumps(entry) + '\n')
+            return len(entries)
+        items = list(handoff['fields'].items())
+        if handoff['log_position'] is not None:
+            items.insert(handoff['log_position'], ('full_session_log', entries))
+        json.dump(dict(items), out, indent=2)
+    return len(entries)
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert session logs and handoffs to and from the binary encoding.")
+    parser.add_argument("direction", choices=("encode", "decode"))
+    parser.add_argument("source", help="A JSONL session log or handoff JSON file to encode, or an encoded file to decode.")
+    parser.add_argument("target", help="The file to write.")
+    args = parser.parse_args()
+    try:
+        count = (encode_file if args.direction == 'encode' else decode_file)(args.source, args.target)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"✅ {args.direction.capitalize()}d {count} entries: {os.path.getsize(args.source)} -> {os.path.getsize(args.target)} bytes.")
+
+if __name__ == "__main__":
+    main()
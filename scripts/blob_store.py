@@ -0,0 +1,132 @@
+# scripts/blob_store.py
+# v14.2: Content-addressed store for command outputs. Each distinct output is written once to
+# .session_outputs/<sha256>; session.log entries (and the handoffs built from them) keep only
+# the hash and size, and readers resolve them lazily. Blobs may be stored gzip- or
+# lzma-compressed, or as a line delta against another blob; the digest is always that of the
+# full, uncompressed output.
+
+import argparse
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import shutil
+import sys
+import tempfile
+
+OUTPUT_DIR = '.session_outputs'
+HASH_CHUNK_SIZE = 1024 * 1024
+# Compression -> (file suffix, opener). Readers try every suffix, so the setting can change freely.
+COMPRESSIONS = {
+    'none': ('', open),
+    'gzip': ('.gz', gzip.open),
+    'lzma': ('.xz', lzma.open)
+}
+DELTA_SUFFIX = '.delta' # gzip'd JSON {"base", "depth", "ops"}; see output_delta.py.
+
+def blob_path(digest, compression='none'):
+    return os.path.join(OUTPUT_DIR, digest + COMPRESSIONS[compression][0])
+
+def delta_path(digest):
+    return os.path.join(OUTPUT_DIR, digest + DELTA_SUFFIX)
+
+def find_blob(digest):
+    """Returns (path, compression) of a stored blob, or None."""
+    for compression in COMPRESSIONS:
+        path = blob_path(digest, compression)
+        if os.path.exists(path):
+            return path, compression
+    return None
+
+def blob_depth(digest):
+    """How many deltas a reader replays to load a blob: 0 for a full blob, None if it is not stored."""
+    if find_blob(digest) is not None:
+        return 0
+    try:
+        return load_delta(digest)['depth']
+    except FileNotFoundError:
+        return None
+
+def write_atomically(path, write, opener=open):
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    # Write under a temporary name and rename, so a concurrent reader never sees a partial blob.
+    fd, tmp_path = tempfile.mkstemp(dir=OUTPUT_DIR, prefix='.tmp-')
+    os.close(fd)
+    with opener(tmp_path, 'wb') as f:
+        write(f)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+def file_digest(fileobj):
+    hash_obj = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b''):
+        hash_obj.update(chunk)
+    return hash_obj.hexdigest()
+
+def save_blob(fileobj, compression='none'):
+    """Stores the contents of a binary file object, returning its hex digest. Existing blobs are never rewritten."""
+    digest = file_digest(fileobj)
+    if blob_depth(digest) is None:
+        def write(f):
+            fileobj.seek(0)
+            shutil.copyfileobj(fileobj, f, HASH_CHUNK_SIZE)
+        write_atomically(blob_path(digest, compression), write, COMPRESSIONS[compression][1])
+    return digest
+
+def save_delta(digest, base, ops):
+    """Stores blob digest as line edits (see apply_delta) of the stored blob base."""
+    if blob_depth(digest) is None:
+        delta = {"base": base, "depth": blob_depth(base) + 1, "ops": ops}
+        write_atomically(delta_path(digest), lambda f: f.write(json.dumps(delta).encode('utf-8')), gzip.open)
+
+def load_delta(digest):
+    with gzip.open(delta_path(digest), 'rb') as f:
+        return json.load(f)
+
+def apply_delta(base, ops):
+    """Rebuilds a blob from its base's bytes: [start, end] copies base lines, a list of strings inserts lines."""
+    lines = base.splitlines(keepends=True)
+    out = []
+    for op in ops:
+        if isinstance(op[0], int):
+            out.extend(lines[op[0]:op[1]])
+        else:
+            out.extend(line.encode('utf-8', errors='surrogateescape') for line in op)
+    return b''.join(out)
+
+def load_blob(digest):
+    found = find_blob(digest)
+    if found is None:
+        try:
+            delta = load_delta(digest)
+        except FileNotFoundError:
+            raise FileNotFoundError(blob_path(digest)) from None
+        return apply_delta(load_blob(delta['base']), delta['ops'])
+    path, compression = found
+    with COMPRESSIONS[compression][1](path, 'rb') as f:
+        return f.read()
+
+def resolve_output(entry, name):
+    """Returns the text of an entry's 'stdout'/'stderr', loading it from the store if it was stored by hash."""
+    digest = entry.get(f"{name}_hash")
+    if digest is None: # Inline in full; with a hash, the inline text is only a head/tail preview.
+        return entry.get(name, '')
+    try:
+        return load_blob(digest).decode('utf-8', errors='replace').strip()
+    except FileNotFoundError:
+        return f"[output {digest} not found in {OUTPUT_DIR}]"
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a command output stored in the session output store.")
+    parser.add_argument("digest", help="The stdout_hash/stderr_hash recorded in session.log.")
+    args = parser.parse_args()
+    try:
+        sys.stdout.buffer.write(load_blob(args.digest))
+    except FileNotFoundError:
+        print(f"ERROR: No stored output with hash {args.digest}.", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,9 @@
 SCRIPT_DIR=$( cd -- "$( dirname -- "${BASH_SOURCE[0]}" )" &> /dev/null && pwd )
 PROJECT_ROOT="$SCRIPT_DIR/.."
 SESSION_LOG="session.log"
-OLD_LOG="session.log.old"
+SEGMENTS_SCRIPT="scripts/log_segments.py"
 MONITOR_SCRIPT="scripts/meta_monitor.py"
+GATEWAY_DAEMON_SCRIPT="scripts/gateway_daemon.py"
 SUGGESTIONS_LOG="suggestions.log"
 HANDOFFS_DIR="context/handoffs"
 HANDOFF_NOTES_TEMPLATE="context/handoff_notes.md"
@@ -29,11 +30,9 @@ echo ""
 # --- 1. Log Management & Template Restoration ---
 pip install -r requirements.txt --quiet
 cd "$PROJECT_ROOT"
-if [ -f "$SESSION_LOG" ]; then
-    mv -f "$SESSION_LOG" "$OLD_LOG"
-    echo "✅ Previous session log archived to $OLD_LOG."
-fi
-echo "{\"type\": \"session_start\", \"timestamp\": \"$(date -u +%Y-%m-%dT%H:%M:%S.%NZ)\"}" > "$SESSION_LOG"
+# The previous session's log is sealed into $SESSION_LOG.segments/ (compressed, and listed in its
+# manifest with every earlier session) rather than overwriting the one archive there used to be.
+python3 "$SEGMENTS_SCRIPT" --new-session --log "$SESSION_LOG"
 echo "✅ New session log initialized."
 
 # Create a fresh handoff notes template for the new session.
@@ -66,8 +65,18 @@ else
 fi
 echo ""
 
-# --- 3. Intelligent Briefing ---
-echo -e "${YELLOW}II. SITUATIONAL BRIEFING:${NC}"
+# --- 3. Launch Gateway Daemon ---
+echo -e "${YELLOW}II. LAUNCHING GATEWAY DAEMON...${NC}"
+if [ -f "$GATEWAY_DAEMON_SCRIPT" ]; then
+    nohup python3 "$GATEWAY_DAEMON_SCRIPT" >/dev/null 2>&1 &
+    echo "✅ Gateway daemon launched in background. scripts/run.py calls are served without interpreter start-up."
+else
+    echo "⚠️ WARNING: Gateway daemon script not found. scripts/run.py will run every call in-process."
+fi
+echo ""
+
+# --- 4. Intelligent Briefing ---
+echo -e "${YELLOW}III. SITUATIONAL BRIEFING:${NC}"
 LATEST_HANDOFF=$(ls -1 "$HANDOFFS_DIR"/*.json 2>/dev/null | sort -r | head -n 1)
 
 if [ -z "$LATEST_HANDOFF" ]; then
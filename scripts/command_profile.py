@@ -0,0 +1,106 @@
+# scripts/command_profile.py
+# v14.2: run.py --profile. The command runs with the profile_hook directory on PYTHONPATH, whose
+# sitecustomize starts cProfile in every Python process the command starts and writes each one's
+# stats to a directory of its own. Afterwards the stats are merged, stored in the blob store
+# (gzip-compressed) and referenced from the command_result entry as profile.hash, and the top
+# functions by cumulative time are printed after the command's output.
+# python3 scripts/command_profile.py <hash> prints a stored profile again, sorted as asked.
+
+import argparse
+import io
+import os
+import pstats
+import shlex
+import shutil
+import sys
+import tempfile
+
+import blob_store
+
+PROFILE_DIR = '.gateway/profiles' # per-run directories for the raw stats, removed once stored
+HOOK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profile_hook')
+PROFILE_DIR_ENV = 'GATEWAY_PROFILE_DIR'
+PROFILE_COMPRESSION = 'gzip'
+TOP_FUNCTIONS = 15
+SORT_KEYS = {'cumulative': 3, 'tottime': 2, 'calls': 1} # index into pstats' (cc, nc, tt, ct, callers)
+
+class CommandProfile:
+    """Profiling for one command: wrap() the command before it runs, finish() after."""
+
+    def __init__(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        self.directory = os.path.abspath(tempfile.mkdtemp(dir=PROFILE_DIR))
+
+    def wrap(self, command, persistent_shell=False):
+        """The command with the hook enabled for every process it starts. In a persistent shell the
+        exports go in a subshell, so they do not outlive the command."""
+        exports = (f"export {PROFILE_DIR_ENV}={shlex.quote(self.directory)}; "
+                   f"export PYTHONPATH=${{PYTHONPATH:+$PYTHONPATH:}}{shlex.quote(HOOK_DIR)}\n")
+        return f"({exports}{command}\n)" if persistent_shell else exports + command
+
+    def finish(self):
+        """Stores the merged profile. Returns (log fields, printable summary), or ({}, None) if no
+        Python process ran."""
+        try:
+            paths = sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.prof'))
+            stats = None
+            for path in paths:
+                try:
+                    if stats is None:
+                        stats = pstats.Stats(path)
+                    else:
+                        stats.add(path)
+                except (OSError, EOFError, TypeError, ValueError):
+                    continue # Cut short while it was written.
+            if stats is None:
+                return {}, None
+            merged = os.path.join(self.directory, 'merged')
+            stats.dump_stats(merged)
+            with open(merged, 'rb') as f:
+                digest = blob_store.save_blob(f, PROFILE_COMPRESSION)
+        finally:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        fields = {"profile": {"hash": digest, "processes": len(paths), "cpu_s": round(stats.total_tt, 3)}}
+        header = (f"{len(paths)} Python process(es), {stats.total_tt:.3f} s profiled; "
+                  f"python3 scripts/command_profile.py {digest} for more.")
+        return fields, header + '\n' + summary(stats)
+
+def summary(stats, sort='cumulative', limit=TOP_FUNCTIONS):
+    """The top functions as a table: cumulative and own time, call count and where they are."""
+    key = SORT_KEYS[sort]
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][key], reverse=True)[:limit]
+    lines = [f"{'cumulative_s':>12} {'own_s':>9} {'calls':>9}  function"]
+    for (filename, line, name), (_, calls, own, cumulative, _) in rows:
+        where = name if filename == '~' else f"{name} ({shorten(filename)}:{line})" # '~' marks a builtin.
+        lines.append(f"{cumulative:>12.3f} {own:>9.3f} {calls:>9}  {where}")
+    return '\n'.join(lines)
+
+def shorten(filename):
+    relative = os.path.relpath(filename) if os.path.isabs(filename) else filename
+    return filename if relative.startswith('..') else relative
+
+def begin():
+    return CommandProfile()
+
+def load(digest):
+    """The pstats.Stats of a stored profile."""
+    with tempfile.NamedTemporaryFile(suffix='.prof') as f:
+        f.write(blob_store.load_blob(digest))
+        f.flush()
+        return pstats.Stats(f.name, stream=io.StringIO())
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a profile stored by run.py --profile.")
+    parser.add_argument("digest", help="The profile.hash recorded in session.log.")
+    parser.add_argument("--sort", choices=sorted(SORT_KEYS), default='cumulative', help="Order functions by this (default: cumulative).")
+    parser.add_argument("--limit", type=int, default=TOP_FUNCTIONS, help=f"Print this many functions (default: {TOP_FUNCTIONS}).")
+    args = parser.parse_args()
+    try:
+        stats = load(args.digest)
+    except FileNotFoundError:
+        print(f"ERROR: No stored profile with hash {args.digest}.", file=sys.stderr)
+        sys.exit(1)
+    print(summary(stats, args.sort, args.limit))
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,11 @@ from datetime import datetime, timezone
 import argparse
 import base64
 import subprocess
+import sys
+import textwrap
+
+import log_reader
+import session_log
 
 HANDOFF_DIR = 'context/handoffs'
 HANDOFF_NOTES_FILE = 'context/handoff_notes.md'
@@ -73,19 +78,35 @@ def update_wisdom(new_wisdom):
         json.dump(wisdom, f, indent=2)
     print(f"✅ Wisdom file updated.")
 
+def open_session_log(args):
+    if args.session_fd is not None:
+        return os.fdopen(args.session_fd, 'rb')
+    if args.session_log == '-':
+        return sys.stdin.buffer
+    if args.session_data:
+        # Legacy transport: the whole log base64-encoded on the command line.
+        return base64.b64decode(args.session_data).splitlines(keepends=True)
+    return []
+
+def write_handoff(f, handoff_data, session_entries):
+    """Writes the handoff as json.dump(indent=2) would, but streams 'full_session_log' entry by entry."""
+    header = json.dumps(handoff_data, indent=2)
+    f.write(header[:-2] + ',\n  "full_session_log": [')
+    empty = True
+    for entry in session_entries:
+        f.write(('\n' if empty else ',\n') + textwrap.indent(json.dumps(entry, indent=2), '    '))
+        empty = False
+    f.write(']\n}' if empty else '\n  ]\n}')
+
 def main():
     parser = argparse.ArgumentParser(description="v14.2 Consolidate Handoff")
-    parser.add_argument("--session-data", help="Base64 encoded session log data.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--session-log", help="Path to the session log to package ('-' reads it from stdin).")
+    source.add_argument("--session-fd", type=int, help="An inherited file descriptor (file or pipe) to read the session log from.")
+    source.add_argument("--session-data", help="Base64 encoded session log data (legacy; limited by ARG_MAX).")
     args = parser.parse_args()
 
     os.makedirs(HANDOFF_DIR, exist_ok=True)
-    
-    session_log = []
-    if args.session_data:
-        try:
-            log_content = base64.b64decode(args.session_data).decode('utf-8')
-            session_log = [json.loads(line) for line in log_content.strip().split('\n') if line]
-        except Exception: pass
 
     notes = parse_handoff_notes()
     update_wisdom(notes)
@@ -98,15 +119,24 @@ def main():
         "state": {
             "git_status": get_command_output("git status --porcelain"),
             "git_diff_staged": get_command_output("git diff --staged")
-        },
-        "full_session_log": session_log
+        }
     }
     
     ts_str = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
     handoff_filename = os.path.join(HANDOFF_DIR, f"handoff_{ts_str}.json")
     
-    with open(handoff_filename, 'w') as f:
-        json.dump(handoff_data, f, indent=2)
+    if args.session_log not in (None, '-'):
+        # Read as the session log it is: the session's sealed segments, then its hot segment.
+        with open(handoff_filename, 'w') as f:
+            write_handoff(f, handoff_data, log_reader.entries(args.session_log))
+    else:
+        log_stream = open_session_log(args)
+        try:
+            with open(handoff_filename, 'w') as f:
+                write_handoff(f, handoff_data, session_log.parse_entries(log_stream))
+        finally:
+            if hasattr(log_stream, 'close'):
+                log_stream.close()
         
     if os.path.exists(HANDOFF_NOTES_FILE):
         os.remove(HANDOFF_NOTES_FILE)
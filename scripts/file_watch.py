@@ -0,0 +1,130 @@
+# scripts/file_watch.py
+# v14.2: Blocks until watched files change, using Linux inotify through ctypes (no polling and
+# no third-party watcher). Directories are watched recursively; a watched file is tracked
+# through its parent directory, so editors that save by rename are still seen. A burst of
+# events is coalesced into one change set once the tree has been quiet for the debounce time.
+
+import os
+import select
+import struct
+
+DEBOUNCE = 0.1 # seconds of quiet after the last event before a change set is reported
+EVENT_HEADER = struct.Struct('iIII') # wd, mask, cookie, len; followed by the NUL-padded name
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+# Written by the gateway, editors and test runners on every run; reacting to them would loop.
+IGNORED_DIRS = {'.git', '.gateway', '.session_outputs', '__pycache__', '.pytest_cache', '.mypy_cache', 'node_modules'}
+IGNORED_PREFIXES = ('session.log', '.#')
+IGNORED_SUFFIXES = ('.swp', '.swx', '~', '.tmp', '.pyc')
+
+_libc = None
+
+def libc():
+    global _libc
+    if _libc is None:
+        import ctypes.util # Only a watch needs it; stat_index shares is_ignored without the import.
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    return _libc
+
+def is_ignored(name):
+    return name in IGNORED_DIRS or name.startswith(IGNORED_PREFIXES) or name.endswith(IGNORED_SUFFIXES)
+
+class FileWatcher:
+    """Watches files and directory trees; wait() returns the paths that changed."""
+
+    def __init__(self, paths, debounce=DEBOUNCE):
+        self.debounce = debounce
+        self.fd = libc().inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            import ctypes
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {} # wd -> directory path
+        self.files = {} # directory path -> names watched in it, or None for the whole directory
+        try:
+            for path in paths:
+                path = os.path.normpath(path)
+                if os.path.isdir(path):
+                    self.add_tree(path)
+                elif os.path.exists(path):
+                    parent, name = os.path.split(path)
+                    parent = parent or '.'
+                    if self.files.get(parent, set()) is not None:
+                        self.add_dir(parent)
+                        self.files.setdefault(parent, set()).add(name)
+                else:
+                    raise FileNotFoundError(f"cannot watch {path}: no such file or directory")
+        except BaseException:
+            self.close()
+            raise
+
+    def add_dir(self, path):
+        wd = libc().inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            import ctypes
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"cannot watch {path}: {os.strerror(errno)}")
+        self.dirs[wd] = path
+
+    def add_tree(self, root):
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = [name for name in dirnames if not is_ignored(name)]
+            self.add_dir(dirpath)
+            self.files[dirpath] = None
+
+    def read_events(self):
+        """Returns the changed paths among the events currently queued."""
+        changed = set()
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0'))
+            offset += EVENT_HEADER.size + length
+            directory = self.dirs.get(wd)
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None) # The directory was removed; the kernel dropped its watch.
+                continue
+            if directory is None or not name or is_ignored(name):
+                continue
+            names = self.files.get(directory)
+            if names is not None and name not in names:
+                continue
+            path = os.path.join(directory, name)
+            if names is None and mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and os.path.isdir(path):
+                self.add_tree(path) # New directories inside a watched tree are watched too.
+            changed.add(path)
+        return changed
+
+    def wait(self, timeout=None):
+        """Blocks until something changes, then until it has been quiet for the debounce time.
+        Returns the set of changed paths, or an empty set if timeout seconds passed first."""
+        changed = set()
+        while not changed:
+            if not select.select([self.fd], [], [], timeout)[0]:
+                return changed
+            changed |= self.read_events()
+        while select.select([self.fd], [], [], self.debounce)[0]:
+            changed |= self.read_events()
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,619 @@
+# scripts/gateway.py
+# v14.2: Core of the Unified Command Gateway. Logs intent and executes a command.
+# Shared by the run.py client (in-process fallback) and the gateway daemon.
+# The in-process path pays for every import on every call, so the modules behind optional
+# features (blob store, deltas, cache, fan-out, persistent shells, watch, pytest tracking, file
+# change attribution, profiling) are imported where they are used. The daemon alone prefetches.
+
+import subprocess
+import argparse
+import copy
+import io
+import json
+import os
+import sys
+import threading
+import time
+import selectors
+import shlex
+from datetime import datetime, timezone
+
+import session_log
+
+SESSION_LOG_FILE = session_log.SESSION_LOG_FILE
+READ_CHUNK_SIZE = 65536
+CAPTURE_MEMORY_LIMIT = 1024 * 1024 # Captured output beyond this spills from memory to a temporary file.
+INLINE_LIMIT_KB = 4 # Outputs larger than this are spilled whole to the blob store; the log keeps their head and tail.
+SPILL_COMPRESSION = 'gzip'
+SPILL_COMPRESSIONS = ('gzip', 'lzma', 'none') # blob_store.COMPRESSIONS
+DELTA_MIN_BYTES = 1024 # Smaller outputs are cheaper to keep inline than to diff against the previous run.
+FAN_OUT_WORKERS = min(8, (os.cpu_count() or 1) + 4) # Commands are mostly I/O-bound child processes.
+
+# Anything bash would expand, redirect, sequence or quote in ways shlex does not, and every
+# builtin or keyword, keeps a command on the bash path.
+SHELL_METACHARACTERS = set('|&;<>()$`\\*?[]{}~!#\n\r')
+BASH_BUILTINS = set(""". : [ alias bg bind break builtin caller cd command compgen complete compopt continue declare
+    dirs disown echo enable eval exec exit export false fc fg getopts hash help history jobs kill let local logout
+    mapfile popd printf pushd pwd read readarray readonly return set shift shopt source suspend test times trap
+    true type typeset ulimit umask unalias unset wait if then else elif fi case esac for select while until do done
+    in function time { } ! [[ ]] coproc""".split())
+
+def log_action(log_entry):
+    session_log.get_writer(SESSION_LOG_FILE).append(log_entry)
+
+class OutputTee:
+    """Forwards a child's output stream to a sink as it arrives and keeps a spooled copy for the log."""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.spool = io.BytesIO()
+        self.size = 0
+
+    def feed(self, chunk):
+        if self.sink is not None:
+            try:
+                self.sink.write(chunk)
+                self.sink.flush()
+            except OSError:
+                # The reader went away; the command still runs to completion and is logged.
+                self.sink = None
+        if self.size + len(chunk) > CAPTURE_MEMORY_LIMIT and isinstance(self.spool, io.BytesIO):
+            import tempfile
+            spool = tempfile.TemporaryFile()
+            spool.write(self.spool.getvalue())
+            self.spool = spool
+        self.spool.write(chunk)
+        self.size += len(chunk)
+
+    def getvalue(self):
+        self.spool.seek(0)
+        return self.spool.read()
+
+    def replay(self, sink):
+        """Writes the captured output to a sink, for output that was held back rather than streamed."""
+        self.spool.seek(0)
+        for chunk in iter(lambda: self.spool.read(READ_CHUNK_SIZE), b''):
+            sink.write(chunk)
+        sink.flush()
+
+    def close(self):
+        self.spool.close()
+
+class RunOptions:
+    """Per-call execution settings, taken from the command line and the caller's environment."""
+
+    def __init__(self, env=None, stdin=None, use_cache=False, cpu_limit=None, memory_limit=None, direct_exec=True,
+                 shell_session=None, inline_limit=INLINE_LIMIT_KB * 1024, spill_compression=SPILL_COMPRESSION, call=None,
+                 impacted=False, track_files=True, prefetcher=None, agent=None, profile=False):
+        self.env = env
+        self.stdin = stdin
+        self.use_cache = use_cache
+        self.cpu_limit = cpu_limit # seconds of CPU time
+        self.memory_limit = memory_limit # MB of address space
+        self.direct_exec = direct_exec # exec simple commands without a bash in between
+        self.shell_session = shell_session # run in this session's persistent shell instead of a fresh one
+        self.workdir = None # explicit working directory for spawned commands
+        self.inline_limit = inline_limit # bytes of each output kept in the log entry itself
+        self.spill_compression = spill_compression
+        self.call = call # CallProcesses of the daemon call this runs for, so the client can cancel it
+        self.impacted = impacted # narrow pytest runs to the tests affected since the last green run
+        self.track_files = track_files # record the files each state-changing command created, modified or deleted
+        self.prefetcher = prefetcher # the daemon's prefetch.Prefetcher, warming the cache for the next step
+        self.agent = agent # GATEWAY_AGENT: which of the agents sharing the workspace made the call
+        self.profile = profile # run the command's Python processes under cProfile and store the profile
+
+    @classmethod
+    def from_args(cls, args, env=None, stdin=None, call=None, prefetcher=None):
+        environ = os.environ if env is None else env
+        use_cache = args.cache or environ.get('GATEWAY_CACHE') == '1'
+        persistent = (args.shell or environ.get('GATEWAY_SHELL', 'spawn')) == 'persistent'
+        shell_session = (args.shell_session or environ.get('GATEWAY_SHELL_SESSION', 'default')) if persistent else None
+        inline_limit_kb = args.inline_limit if args.inline_limit is not None else int(environ.get('GATEWAY_INLINE_LIMIT_KB', INLINE_LIMIT_KB))
+        spill_compression = args.spill_compression or environ.get('GATEWAY_SPILL_COMPRESSION', SPILL_COMPRESSION)
+        if spill_compression not in SPILL_COMPRESSIONS:
+            spill_compression = SPILL_COMPRESSION
+        return cls(env=env, stdin=stdin, use_cache=use_cache, cpu_limit=args.cpu_limit, memory_limit=args.memory_limit,
+                   shell_session=shell_session, inline_limit=inline_limit_kb * 1024, spill_compression=spill_compression,
+                   call=call, impacted=args.impacted,
+                   track_files=not args.no_track_files and environ.get('GATEWAY_TRACK_FILES', '1') != '0',
+                   prefetcher=prefetcher if use_cache else None, # Prefetched results are only served from the cache.
+                   agent=environ.get('GATEWAY_AGENT') or None,
+                   profile=args.profile or environ.get('GATEWAY_PROFILE') == '1')
+
+    def captured(self):
+        """The same settings for a command whose output is held back: it gets no stdin."""
+        options = copy.copy(self)
+        options.stdin = subprocess.DEVNULL
+        return options
+
+    def use_persistent_shell(self):
+        # Resource limits are per process and cannot be applied to one command in a shared shell;
+        # execute() warns when they override --shell persistent.
+        return self.shell_session is not None and self.cpu_limit is None and self.memory_limit is None
+
+    def cwd(self):
+        """Where the command runs: the session shell's directory, which 'cd' may have moved."""
+        if self.workdir is not None:
+            return self.workdir
+        if self.shell_session is None:
+            return None
+        import shell_pool
+        return shell_pool.get_pool().cwd(self.shell_session)
+
+    def spawned(self):
+        """Captured settings that spawn a process in the session shell's directory, for concurrent commands."""
+        options = self.captured()
+        options.workdir, options.shell_session = self.cwd(), None
+        return options
+
+    def limit_prefix(self):
+        """bash ulimit commands that apply the resource limits before the command starts, or ''.
+        The shell sets them on itself, so unlike a preexec_fn this is safe in the threaded daemon,
+        and unlike a prlimit after the spawn nothing the command starts can escape them."""
+        limits = []
+        if self.cpu_limit is not None:
+            limits.append(f"-t {self.cpu_limit}")
+        if self.memory_limit is not None:
+            limits.append(f"-v {self.memory_limit * 1024}") # ulimit -v counts kilobytes.
+        return f"ulimit {' '.join(limits)} || exit 126\n" if limits else ''
+
+class CallProcesses:
+    """The processes running for one daemon call, so a client that is interrupted can stop them.
+    Each runs in its own process group, which takes the command's own children down with it."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.procs = set()
+        self.signal = None # set once the call has been cancelled
+
+    def add(self, proc):
+        with self.lock:
+            self.procs.add(proc)
+            signum = self.signal
+        if signum is not None: # Cancelled before this process started.
+            self.kill(proc, signum)
+
+    def discard(self, proc):
+        with self.lock:
+            self.procs.discard(proc)
+
+    def cancel(self, signum):
+        with self.lock:
+            self.signal = signum
+            procs = list(self.procs)
+        for proc in procs:
+            self.kill(proc, signum)
+
+    @staticmethod
+    def kill(proc, signum):
+        try:
+            os.killpg(proc.pid, signum)
+        except (ProcessLookupError, PermissionError):
+            pass # Already gone.
+
+class CommandResult:
+    """The outcome of one command: exit code, captured output and resource usage."""
+
+    def __init__(self, returncode, stdout, stderr, usage=None, cached=False, prefetched=False):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.usage = usage or {}
+        self.cached = cached
+        self.prefetched = prefetched # served from a cache entry a prefetch stored
+        self.timestamp = datetime.now(timezone.utc).isoformat()
+
+def find_executable(name, path):
+    """shutil.which for a command word, without importing shutil on every call."""
+    candidates = [name] if '/' in name else [os.path.join(directory or '.', name) for directory in path.split(os.pathsep)]
+    for candidate in candidates:
+        if os.access(candidate, os.X_OK) and not os.path.isdir(candidate):
+            return candidate
+    return None
+
+def direct_argv(command, env):
+    """(executable, argv) to exec a command with no shell in between, or None if it needs bash."""
+    if SHELL_METACHARACTERS.intersection(command):
+        return None
+    try:
+        words = shlex.split(command)
+    except ValueError:
+        return None
+    if not words or words[0] in BASH_BUILTINS or '=' in words[0]:
+        return None
+    executable = find_executable(words[0], env.get('PATH', os.defpath))
+    if executable is None:
+        return None # Let bash report 'command not found' exactly as it always has.
+    return executable, words
+
+def spawn(command, options, env):
+    # A cancellable daemon call runs each command in its own process group; killing the group
+    # must not reach the daemon.
+    popen_args = dict(stdin=options.stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, cwd=options.cwd(),
+                      start_new_session=options.call is not None)
+    limits = options.limit_prefix()
+    if limits:
+        return subprocess.Popen(limits + command, shell=True, executable='/bin/bash', **popen_args)
+    direct = direct_argv(command, env) if options.direct_exec else None
+    if direct is not None:
+        try:
+            return subprocess.Popen(direct[1], executable=direct[0], **popen_args)
+        except OSError:
+            pass # e.g. not executable; bash reports it in its own words.
+    return subprocess.Popen(command, shell=True, executable='/bin/bash', **popen_args)
+
+def run_in_persistent_shell(command, out, err, options, env):
+    import shell_pool
+    started = time.monotonic()
+    stdout_tee, stderr_tee = OutputTee(out), OutputTee(err)
+    returncode = shell_pool.get_pool().run(options.shell_session, command, stdout_tee, stderr_tee, env=env, call=options.call)
+    # No process of its own, so no rusage: only wall time is recorded.
+    usage = {"duration_ms": round((time.monotonic() - started) * 1000, 3)}
+    return CommandResult(returncode, stdout_tee, stderr_tee, usage)
+
+def run_streaming(command, out, err, options):
+    """Runs a command, streaming its stdout/stderr to out/err, and returns a CommandResult."""
+    child_env = dict(os.environ if options.env is None else options.env)
+    child_env.setdefault('PYTHONUNBUFFERED', '1') # Python children would otherwise hold output until exit.
+    if options.use_persistent_shell():
+        return run_in_persistent_shell(command, out, err, options, child_env)
+    started = time.monotonic()
+    proc = spawn(command, options, child_env)
+    if options.call is not None:
+        options.call.add(proc)
+    stdout_tee, stderr_tee = OutputTee(out), OutputTee(err)
+    tees = {proc.stdout.fileno(): stdout_tee, proc.stderr.fileno(): stderr_tee}
+    with selectors.DefaultSelector() as selector:
+        for fd in tees:
+            selector.register(fd, selectors.EVENT_READ)
+        while selector.get_map():
+            for key, _ in selector.select():
+                chunk = os.read(key.fd, READ_CHUNK_SIZE)
+                if chunk:
+                    tees[key.fd].feed(chunk)
+                else:
+                    selector.unregister(key.fd)
+    proc.stdout.close()
+    proc.stderr.close()
+
+    # wait4 rather than Popen.wait: it reports this child's own rusage, which RUSAGE_CHILDREN
+    # cannot do once the daemon or a fan-out has several children in flight. Note that Linux
+    # counts the forked gateway image in max_rss_kb, so it never reads below the gateway's own RSS.
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if options.call is not None:
+        options.call.discard(proc)
+    usage = {
+        "duration_ms": round((time.monotonic() - started) * 1000, 3),
+        "cpu_user_s": round(rusage.ru_utime, 3),
+        "cpu_sys_s": round(rusage.ru_stime, 3),
+        "max_rss_kb": rusage.ru_maxrss
+    }
+    return CommandResult(proc.returncode, stdout_tee, stderr_tee, usage)
+
+def output_preview(tee, limit, digest):
+    """The head and tail of a spilled output, at most limit bytes of it, around a pointer to the full blob."""
+    head_size = min(tee.size, limit // 2)
+    tail_size = min(tee.size - head_size, limit - head_size)
+    tee.spool.seek(0)
+    head = tee.spool.read(head_size)
+    tee.spool.seek(tee.size - tail_size)
+    tail = tee.spool.read(tail_size)
+    omitted = tee.size - head_size - tail_size
+    if omitted == 0:
+        return (head + tail).decode('utf-8', errors='replace').strip()
+    marker = f"\n[... {omitted} bytes omitted; full output: python3 scripts/blob_store.py {digest} ...]\n"
+    return (head.decode('utf-8', errors='replace') + marker + tail.decode('utf-8', errors='replace')).strip()
+
+def stored_output_fields(name, tee, options):
+    if tee.size <= options.inline_limit:
+        try:
+            return {name: tee.getvalue().decode('utf-8').strip()}
+        except UnicodeDecodeError:
+            pass # Not UTF-8: only the stored bytes keep it intact, so it is spilled like a large output.
+    import blob_store
+    digest = blob_store.save_blob(tee.spool, options.spill_compression)
+    return {name: output_preview(tee, options.inline_limit, digest), f"{name}_hash": digest}
+
+def output_fields(name, tee, options, command):
+    """Log fields for one output: inline, spilled whole, or as a delta of the command's previous output."""
+    if tee.size < DELTA_MIN_BYTES:
+        return stored_output_fields(name, tee, options)
+    import blob_store
+    import output_delta
+    fields = output_delta.store(command, name, tee, options.inline_limit)
+    if fields is not None:
+        return fields
+    fields = stored_output_fields(name, tee, options)
+    if tee.size <= output_delta.MAX_OUTPUT_BYTES:
+        # Keep it in the store as the base for the command's next output.
+        digest = fields.get(f"{name}_hash") or blob_store.save_blob(tee.spool, options.spill_compression)
+        output_delta.remember(command, name, digest)
+    return fields
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="run.py", description="v14.2 Unified Command Gateway: Logs intent and executes a command.")
+    parser.add_argument("--intent", help="The agent's intent for this action.")
+    parser.add_argument("--command", action="append", help="The command to execute. Repeat it to fan several read-only commands out in parallel.")
+    parser.add_argument("--batch", metavar="PLAN", help="Run a JSONL plan of {\"intent\", \"command\"} steps in one process ('-' reads stdin).")
+    parser.add_argument("--cache", action="store_true", help="Serve unchanged read-only commands from the result cache (also enabled by GATEWAY_CACHE=1).")
+    parser.add_argument("--cpu-limit", type=int, metavar="SECONDS", help="Kill the command once it has used this much CPU time.")
+    parser.add_argument("--memory-limit", type=int, metavar="MB", help="Cap the command's address space at this many megabytes.")
+    parser.add_argument("--shell", choices=("spawn", "persistent"), help="'persistent' runs commands in a long-lived per-session bash that keeps cd/exports between calls (default: GATEWAY_SHELL or spawn). The shells live in the gateway daemon: a call it does not take (no daemon, or piped stdin) warns and runs in a fresh bash, as does one with --cpu-limit/--memory-limit.")
+    parser.add_argument("--shell-session", metavar="NAME", help="The persistent shell session to use (default: GATEWAY_SHELL_SESSION or 'default').")
+    parser.add_argument("--inline-limit", type=int, metavar="KB", help=f"Keep at most this much of each output in the log entry; larger or non-UTF-8 output is stored whole in the blob store (default: GATEWAY_INLINE_LIMIT_KB or {INLINE_LIMIT_KB}).")
+    parser.add_argument("--spill-compression", choices=SPILL_COMPRESSIONS, help=f"How spilled outputs are compressed (default: GATEWAY_SPILL_COMPRESSION or {SPILL_COMPRESSION}).")
+    parser.add_argument("--watch", action="append", metavar="PATH", help="Run the command, then re-run it whenever these files or directory trees change, until interrupted. Repeatable.")
+    parser.add_argument("--impacted", action="store_true", help="For a pytest command, run only the tests affected by files changed since the last green run, previously failed tests first.")
+    parser.add_argument("--no-track-files", action="store_true", help="Do not record which files a state-changing command created, modified or deleted, saving a stat of every worktree directory per call (also disabled by GATEWAY_TRACK_FILES=0).")
+    parser.add_argument("--profile", action="store_true", help="Run the Python processes the command starts under cProfile, store the profile in the blob store and print the top functions (also enabled by GATEWAY_PROFILE=1).")
+    parser.add_argument("--keep-going", action="store_true", help="With --batch, continue past failing steps instead of stopping at the first.")
+    return parser
+
+def parse_args(argv=None, parser=None):
+    parser = parser or build_parser()
+    args = parser.parse_args(argv)
+    if args.batch is None and (args.intent is None or args.command is None):
+        parser.error("the following arguments are required: --intent, --command (or --batch)")
+    if args.command and len(args.command) > 1:
+        import read_only
+        state_changing = [command for command in args.command if not read_only.is_read_only(command)]
+        if state_changing:
+            parser.error(f"only read-only commands can be fanned out; not read-only: {', '.join(state_changing)}")
+    if args.watch and (args.batch is not None or len(args.command) > 1):
+        parser.error("--watch takes a single --command")
+    return args
+
+def run_command(command, out, err, options):
+    """Runs a command, serving read-only ones from the result cache if enabled. Returns a CommandResult."""
+    # Cache fingerprints name paths relative to the gateway, so a session shell elsewhere bypasses it.
+    key = None
+    if options.use_cache:
+        import read_only
+        import result_cache
+        if read_only.is_read_only(command) and options.cwd() in (None, os.getcwd()):
+            key = result_cache.cache_key(command)
+    if key is not None:
+        started = time.monotonic()
+        hit = result_cache.get(key)
+        if hit is not None:
+            returncode, stdout, stderr = hit
+            stdout_tee, stderr_tee = OutputTee(out), OutputTee(err)
+            for tee, data in ((stdout_tee, stdout), (stderr_tee, stderr)):
+                if data:
+                    tee.feed(data)
+            usage = {"duration_ms": round((time.monotonic() - started) * 1000, 3)}
+            prefetched = options.prefetcher is not None and options.prefetcher.note_hit(key, usage['duration_ms'])
+            return CommandResult(returncode, stdout_tee, stderr_tee, usage, cached=True, prefetched=prefetched)
+
+    result = run_streaming(command, out, err, options)
+    # Only cache if the inputs did not change while the command ran.
+    if (key is not None and result.stdout.size + result.stderr.size <= result_cache.CACHE_MAX_ENTRY_BYTES
+            and result_cache.cache_key(command) == key):
+        result_cache.put(key, result.returncode, result.stdout.getvalue(), result.stderr.getvalue())
+    return result
+
+def intent_entry(intent, options):
+    entry = {
+        "type": "intent",
+        "details": intent,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+    if options.agent is not None:
+        entry["agent"] = options.agent
+    return entry
+
+def run_step(intent, command, out, err, options, log=log_action):
+    """Logs the intent, runs the command streaming its output to the binary streams out/err. Returns the exit code."""
+    log(intent_entry(intent, options))
+
+    command_to_run = command
+
+    # Check if the command is specifically for running the handoff script.
+    # The original check was a broad substring search, which was buggy.
+    command_parts = command_to_run.strip().split()
+    is_handoff_execution = (
+        len(command_parts) >= 2 and
+        'python' in command_parts[0] and # handles python, python3
+        command_parts[1] == 'scripts/consolidate_handoff.py'
+    )
+
+    if is_handoff_execution:
+        # The handoff script reads the log itself; passing it inline on the command line hit ARG_MAX.
+        if os.path.exists(SESSION_LOG_FILE):
+            command_to_run += f" --session-log {shlex.quote(SESSION_LOG_FILE)}"
+
+    # pytest runs report per-test outcomes, which --impacted uses to select the next run's tests.
+    pytest_run = None
+    if 'pytest' in command_to_run and not is_handoff_execution:
+        import pytest_impact
+        pytest_run = pytest_impact.prepare(command_to_run, options.cwd() or os.getcwd(), options.impacted)
+    if pytest_run is not None and pytest_run.notice is not None and options.impacted:
+        err.write(f"run.py: --impacted: {pytest_run.notice}\n".encode('utf-8'))
+        err.flush()
+
+    # State-changing commands record the files they created, modified or deleted.
+    tracker = None
+    if options.track_files:
+        import read_only
+        if not read_only.is_read_only(command_to_run):
+            import stat_index
+            tracker = stat_index.begin(command_to_run, options.cwd())
+
+    # --profile runs every Python process the command starts under cProfile.
+    profile, run_options = None, options
+    if options.profile:
+        import command_profile
+        profile = command_profile.begin()
+        run_options = copy.copy(options)
+        run_options.use_cache = False # A cached result would have nothing to profile.
+
+    if pytest_run is not None and pytest_run.nothing_to_run():
+        result = CommandResult(0, OutputTee(None), OutputTee(None), {"duration_ms": 0.0})
+    else:
+        command_to_run = pytest_run.command() if pytest_run is not None else command_to_run
+        if profile is not None:
+            command_to_run = profile.wrap(command_to_run, options.use_persistent_shell())
+        result = run_command(command_to_run, out, err, run_options)
+    entry = result_entry(command, result, options)
+    if pytest_run is not None:
+        entry.update(pytest_run.finish(result.returncode))
+    if tracker is not None:
+        entry.update(tracker.finish())
+    if profile is not None:
+        fields, summary = profile.finish()
+        entry.update(fields)
+        err.write(f"run.py: --profile: {summary or 'no Python process ran; nothing was profiled.'}\n".encode('utf-8'))
+        err.flush()
+    log(entry)
+    if options.prefetcher is not None and options.cwd() in (None, os.getcwd()):
+        options.prefetcher.after_step(intent, command, options.env)
+    return result.returncode
+
+def result_entry(command, result, options):
+    entry = {
+        "type": "command_result",
+        "command": command,
+        "returncode": result.returncode,
+        **output_fields("stdout", result.stdout, options, command),
+        **output_fields("stderr", result.stderr, options, command),
+        "timestamp": result.timestamp,
+        **result.usage,
+        "stdout_bytes": result.stdout.size,
+        "stderr_bytes": result.stderr.size
+    }
+    if options.cpu_limit is not None:
+        entry["cpu_limit_s"] = options.cpu_limit
+    if options.memory_limit is not None:
+        entry["memory_limit_mb"] = options.memory_limit
+    if result.cached:
+        entry["cached"] = True
+    if result.prefetched:
+        entry["prefetched"] = True
+    if options.agent is not None:
+        entry["agent"] = options.agent
+    result.stdout.close()
+    result.stderr.close()
+    return entry
+
+def run_fan_out(intent, commands, out, err, options, log=log_action):
+    """Runs read-only commands on a bounded worker pool; output and log entries follow request order."""
+    log(intent_entry(intent, options))
+    from concurrent.futures import ThreadPoolExecutor
+    first_failure = 0
+    captured = options.spawned() # Parallel commands cannot share the one session shell.
+    with ThreadPoolExecutor(max_workers=min(FAN_OUT_WORKERS, len(commands))) as pool:
+        futures = [pool.submit(run_command, command, None, None, captured) for command in commands]
+        for command, future in zip(commands, futures):
+            result = future.result()
+            result.stdout.replay(out)
+            result.stderr.replay(err)
+            log(result_entry(command, result, options))
+            first_failure = first_failure or result.returncode
+    return first_failure
+
+def load_plan(path):
+    steps = []
+    f = sys.stdin if path == '-' else open(path)
+    try:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            step = json.loads(line)
+            if not isinstance(step, dict) or not isinstance(step.get('intent'), str) or not isinstance(step.get('command'), str):
+                raise ValueError(f"{path}:{lineno}: each step needs string 'intent' and 'command' fields")
+            steps.append(step)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    return steps
+
+def execute_batch(args, out, err, options):
+    """Runs every step of a plan through one log writer. Returns the first failing exit code, or 0."""
+    try:
+        steps = load_plan(args.batch)
+    except (OSError, ValueError) as e:
+        err.write(f"run.py: error: cannot load batch plan: {e}\n".encode('utf-8'))
+        return 2
+
+    # The log stays open for the whole plan, and the steps' entries are written a buffer at a time
+    # (see session_log.BufferedWriter) instead of an open/append/close per entry.
+    writer = session_log.BufferedWriter(session_log.get_writer(SESSION_LOG_FILE))
+    step_options = options.captured()
+    first_failure = 0
+    try:
+        for number, step in enumerate(steps, 1):
+            if options.call is not None and options.call.signal is not None:
+                err.write(f"run.py: batch cancelled before step {number}/{len(steps)}.\n".encode('utf-8'))
+                first_failure = first_failure or 128 + options.call.signal
+                break
+            returncode = run_step(step['intent'], step['command'], out, err, step_options, log=writer)
+            if returncode != 0:
+                first_failure = first_failure or returncode
+                if not args.keep_going:
+                    err.write(f"run.py: batch stopped at step {number}/{len(steps)} (exit code {returncode}).\n".encode('utf-8'))
+                    break
+    finally:
+        writer.flush()
+    return first_failure
+
+def run_watch(intent, command, paths, out, err, options):
+    """Runs the command, then again after each (debounced) change to the watched paths, until interrupted.
+    Each run is logged like any other step. Returns the exit code of the last run."""
+    import file_watch
+    try:
+        watcher = file_watch.FileWatcher(paths)
+    except OSError as e:
+        err.write(f"run.py: error: {e}\n".encode('utf-8'))
+        return 2
+    step_options = options.captured()
+    returncode = 0
+    with watcher:
+        try:
+            while True:
+                returncode = run_step(intent, command, out, err, step_options)
+                err.write(f"run.py: exit code {returncode}; watching {', '.join(paths)} (Ctrl-C to stop).\n".encode('utf-8'))
+                changed = watcher.wait()
+                shown = ', '.join(sorted(changed)[:3]) + (f" and {len(changed) - 3} more" if len(changed) > 3 else "")
+                err.write(f"run.py: changed: {shown}; re-running.\n".encode('utf-8'))
+        except KeyboardInterrupt:
+            pass
+    return returncode
+
+def execute(args, out, err, env=None, stdin=None, call=None, prefetcher=None):
+    options = RunOptions.from_args(args, env=env, stdin=stdin, call=call, prefetcher=prefetcher)
+    if options.shell_session is not None and not options.use_persistent_shell():
+        err.write(b"run.py: warning: --shell persistent ignored: --cpu-limit/--memory-limit need a process of the "
+                  b"command's own. This call runs in a fresh bash.\n")
+        err.flush()
+    if args.batch is not None:
+        return execute_batch(args, out, err, options)
+    if args.watch:
+        return run_watch(args.intent, args.command[0], args.watch, out, err, options)
+    if len(args.command) > 1:
+        return run_fan_out(args.intent, args.command, out, err, options)
+    return run_step(args.intent, args.command[0], out, err, options)
+
+def persistent_shell_unavailable(args):
+    """Why a call run in-process cannot have the persistent shell it asks for, or None. The shells
+    live in the daemon; one started here would end with this call, taking its cd and exports along."""
+    if (args.shell or os.environ.get('GATEWAY_SHELL', 'spawn')) != 'persistent':
+        return None
+    import run
+    if not run.stdin_is_forwardable():
+        return "stdin is piped or redirected, and only a call without input goes to the gateway daemon"
+    return "no gateway daemon took this call (start one with: python3 scripts/gateway_daemon.py &)"
+
+def main(argv=None):
+    args = parse_args(argv)
+    reason = persistent_shell_unavailable(args)
+    if reason is not None:
+        sys.stderr.write(f"run.py: warning: --shell persistent ignored: {reason}. This call runs in a fresh bash; "
+                         f"its cd and exports will not carry over.\n")
+        sys.stderr.flush()
+        args.shell = 'spawn'
+    returncode = execute(args, sys.stdout.buffer, sys.stderr.buffer)
+    sys.exit(128 - returncode if returncode < 0 else returncode) # Killed by a signal: the shell's convention.
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+# scripts/gateway_daemon.py
+# v14.2: Long-lived gateway server. Listens on a Unix domain socket in the workspace and
+# serves run.py calls, so a call no longer pays interpreter start-up and imports. Calls from the
+# agents sharing the workspace are admitted by the scheduler: state-changing ones one at a time.
+
+import argparse
+import itertools
+import os
+import signal
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+
+import gateway
+import read_only
+import run
+import scheduler
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PID_FILE = '.gateway/gateway.pid'
+
+def snapshot_sources():
+    """mtimes of the gateway's own code; agents amend these scripts, and a stale daemon must not keep serving."""
+    return {name: os.stat(os.path.join(SCRIPTS_DIR, name)).st_mtime_ns
+            for name in os.listdir(SCRIPTS_DIR) if name.endswith('.py')}
+
+def decode_request(data):
+    fields = data.split(b'\0')
+    op, argc = fields[0].decode(), int(fields[1])
+    argv = [os.fsdecode(field) for field in fields[2:2 + argc]]
+    env = dict(os.fsdecode(field).split('=', 1) for field in fields[2 + argc:] if b'=' in field)
+    return op, argv, env
+
+def decline_call(*args, **kwargs):
+    raise SystemExit(2)
+
+class FrameWriter:
+    """A binary stream look-alike that sends everything written to it as frames on one channel."""
+
+    def __init__(self, wfile, channel, lock):
+        self.wfile = wfile
+        self.channel = channel
+        self.lock = lock
+
+    def write(self, data):
+        if data:
+            with self.lock:
+                self.wfile.write(run.encode_frame(self.channel, bytes(data)))
+                self.wfile.flush()
+        return len(data)
+
+    def flush(self):
+        pass
+
+class GatewayHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        chunks = []
+        while True:
+            chunk = self.request.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        op, argv, env = decode_request(b''.join(chunks))
+
+        wfile = self.request.makefile('wb')
+        lock = threading.Lock()
+        if op == 'ping':
+            wfile.write(run.encode_frame(run.CHANNEL_EXIT, b'0'))
+        elif op == 'shutdown':
+            wfile.write(run.encode_frame(run.CHANNEL_EXIT, b'0'))
+            self.server.stop()
+        elif op == 'cancel':
+            call = self.server.calls.get(argv[0]) if len(argv) == 2 else None
+            if call is not None:
+                call.cancel(int(argv[1]))
+            wfile.write(run.encode_frame(run.CHANNEL_EXIT, b'0' if call is not None else b'1'))
+        elif op == 'run':
+            wfile.write(self.run_call(argv, env, wfile, lock))
+        wfile.flush()
+
+    def run_call(self, argv, env, wfile, lock):
+        if self.server.sources_changed():
+            self.server.stop(reload=True)
+            return run.encode_frame(run.CHANNEL_FALLBACK, b'')
+        parser = gateway.build_parser()
+        parser.print_help = parser.print_usage = parser.error = parser.exit = decline_call
+        try:
+            args = gateway.parse_args(argv, parser)
+        except SystemExit:
+            # Usage errors and --help are rendered by the in-process path, exactly as before.
+            return run.encode_frame(run.CHANNEL_FALLBACK, b'')
+        if args.batch == '-' or args.watch:
+            # The client's stdin is not forwarded, so a plan piped on stdin is read in-process. A watch
+            # loop runs until the user interrupts it, which only the client's own process sees.
+            return run.encode_frame(run.CHANNEL_FALLBACK, b'')
+
+        # Fanned-out commands are all read-only (parse_args checks); a plan is taken as state-changing.
+        is_read_only = args.batch is None and all(read_only.is_read_only(command) for command in args.command)
+        agent = scheduler.agent_identity(env)
+
+        # The client names this call when it is interrupted, so its processes can be stopped.
+        call_id, call = str(next(self.server.call_ids)), gateway.CallProcesses()
+        self.server.calls[call_id] = call
+        out = FrameWriter(wfile, run.CHANNEL_STDOUT, lock)
+        err = FrameWriter(wfile, run.CHANNEL_STDERR, lock)
+        try:
+            FrameWriter(wfile, run.CHANNEL_CALL, lock).write(call_id.encode())
+            try:
+                wait_ms = self.server.scheduler.admit(agent, is_read_only, scheduler.agent_priority(env),
+                                                      cancelled=lambda: call.signal is not None)
+            except scheduler.Busy as e:
+                err.write(f"run.py: gateway busy ({e}); retry later.\n".encode('utf-8'))
+                return run.encode_frame(run.CHANNEL_EXIT, str(scheduler.BUSY_EXIT_CODE).encode())
+            except scheduler.Cancelled:
+                return run.encode_frame(run.CHANNEL_EXIT, str(-call.signal).encode())
+            started = time.monotonic()
+            try:
+                prefetcher = self.server.get_prefetcher() if env.get('GATEWAY_PREFETCH') == '1' else None
+                returncode = gateway.execute(args, out, err, env=env, stdin=subprocess.DEVNULL, call=call, prefetcher=prefetcher)
+            finally:
+                self.server.scheduler.release(agent, is_read_only, wait_ms, (time.monotonic() - started) * 1000)
+        except Exception as e:
+            err.write(f"gateway daemon error: {e}\n".encode('utf-8'))
+            returncode = 1
+        finally:
+            del self.server.calls[call_id]
+        return run.encode_frame(run.CHANNEL_EXIT, str(returncode).encode())
+
+class GatewayServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    def __init__(self, path):
+        super().__init__(path, GatewayHandler)
+        self.sources = snapshot_sources()
+        self.reload_requested = False
+        self.call_ids = itertools.count(1)
+        self.calls = {} # call id -> gateway.CallProcesses of the calls in flight
+        self.scheduler = scheduler.Scheduler()
+        self.prefetcher = None
+        self.prefetcher_lock = threading.Lock()
+
+    def get_prefetcher(self):
+        """The prefetcher, started on the first call that asks for it (GATEWAY_PREFETCH=1)."""
+        with self.prefetcher_lock:
+            if self.prefetcher is None:
+                import prefetch
+                self.prefetcher = prefetch.Prefetcher()
+            return self.prefetcher
+
+    def sources_changed(self):
+        try:
+            return snapshot_sources() != self.sources
+        except OSError:
+            return True
+
+    def stop(self, reload=False):
+        self.reload_requested = self.reload_requested or reload
+        # shutdown() blocks until serve_forever() returns, so it cannot run on a handler or signal path.
+        threading.Thread(target=self.shutdown).start()
+
+def send_op(op):
+    """Returns the daemon's reply code for a control op, or None if no daemon is listening."""
+    sock = run._socket.socket(run._socket.AF_UNIX, run._socket.SOCK_STREAM)
+    try:
+        sock.connect(run.GATEWAY_SOCKET)
+        sock.sendall(run.encode_request(op))
+        sock.shutdown(run._socket.SHUT_WR)
+        header = run._recv_exact(sock, 5)
+        return None if header is None else int(run._recv_exact(sock, int.from_bytes(header[1:], 'big')))
+    except OSError:
+        return None
+    finally:
+        sock.close()
+
+def serve():
+    os.makedirs(os.path.dirname(run.GATEWAY_SOCKET), exist_ok=True)
+    if send_op('ping') is not None:
+        print(f"Gateway daemon already listening on {run.GATEWAY_SOCKET}.")
+        return
+    if os.path.exists(run.GATEWAY_SOCKET):
+        os.remove(run.GATEWAY_SOCKET)
+
+    server = GatewayServer(run.GATEWAY_SOCKET)
+    with open(PID_FILE, 'w') as f:
+        f.write(str(os.getpid()))
+    # Handled rather than left as inherited: a daemon started in the background ignores SIGINT,
+    # and its commands would inherit that and ignore a cancelled client's Ctrl-C.
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda signum, frame: server.stop())
+    print(f"Gateway daemon listening on {run.GATEWAY_SOCKET} (pid {os.getpid()}).")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        for path in (run.GATEWAY_SOCKET, PID_FILE):
+            if os.path.exists(path):
+                os.remove(path)
+
+    if server.reload_requested:
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+def main():
+    parser = argparse.ArgumentParser(description="v14.2 Gateway Daemon: serves run.py calls over a Unix domain socket.")
+    parser.add_argument("--stop", action="store_true", help="Stop the daemon listening in this workspace.")
+    parser.add_argument("--status", action="store_true", help="Report whether a daemon is listening in this workspace.")
+    args = parser.parse_args()
+
+    if args.stop or args.status:
+        listening = send_op('shutdown' if args.stop else 'ping') is not None
+        deadline = time.monotonic() + 5
+        while args.stop and listening and os.path.exists(run.GATEWAY_SOCKET) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        print(f"Gateway daemon {'stopped' if args.stop and listening else 'listening' if listening else 'not running'}.")
+        return
+    serve()
+
+if __name__ == "__main__":
+    main()
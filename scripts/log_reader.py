@@ -0,0 +1,87 @@
+# scripts/log_reader.py
+# v14.2: The one way scripts read session history. entries() lazily yields a session's entries,
+# from a session log (its sealed segments, then the hot segment) or a handoff's full_session_log,
+# optionally only those of some types, within a time range or for one command base; last() takes
+# the last N of them, through the session store or the log's index when it can. Nothing is loaded
+# whole and nothing heavier than the standard library is imported: sqlite3 only when the session
+# store is enabled. Type filters skip non-matching lines before parsing them (in binary_log's
+# encoding, filters on type, time and tool skip them on their record header), and time ranges skip
+# the sealed segments that fall outside them unread. bench_log_reader.py measures it on large logs.
+
+import json
+from collections import deque
+from contextlib import contextmanager
+
+import session_log
+
+SESSION_LOG_FILE = session_log.SESSION_LOG_FILE
+sessions = session_log.sessions
+
+def type_needles(types):
+    # json.dumps' separators, as every writer of the log uses; a line without one is not of these types.
+    return tuple(f'"type": {json.dumps(kind)}'.encode('utf-8') for kind in types) if types else ()
+
+def matches(entry, types=None, since=None, until=None, base=None):
+    """Whether an entry is of one of types (a set), timestamped in [since, until) (epoch nanoseconds;
+    an entry without a timestamp is outside any range) and has a command with this base."""
+    if types is not None and entry.get('type') not in types:
+        return False
+    if base is not None and session_log.command_base(entry.get('command')) != base:
+        return False
+    if since is not None or until is not None:
+        timestamp = entry.get('timestamp')
+        ns = session_log.timestamp_ns(timestamp) if isinstance(timestamp, str) else None
+        if ns is None or since is not None and ns < since or until is not None and ns >= until:
+            return False
+    return True
+
+def encoded(path):
+    """Whether the file at path is in binary_log's encoding rather than JSONL."""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(session_log.BINARY_MAGIC)) == session_log.BINARY_MAGIC
+    except OSError:
+        return False
+
+def handoff_entries(path):
+    with open(path) as f:
+        yield from json.load(f).get('full_session_log', [])
+
+def entries(path=SESSION_LOG_FILE, session=None, types=None, since=None, until=None, base=None):
+    """Yields the matching entries (see matches) of a session, oldest first: of the log at path
+    (default: its current session), or of the handoff if path is a .json file."""
+    if path.endswith('.json'):
+        stream = handoff_entries(path)
+    else:
+        def wanted(segment):
+            low, high = segment.get('min_timestamp_ns'), segment.get('max_timestamp_ns')
+            if low is None or high is None: # Entries without timestamps only; none can match a range.
+                return since is None and until is None
+            return (since is None or high >= since) and (until is None or low < until)
+        def keep(kind, ns, tool): # The header of a binary record; None where it does not say.
+            return ((types is None or kind in types) and (base is None or tool == base)
+                    and (ns is None or (since is None or ns >= since) and (until is None or ns < until)))
+        stream = session_log.read_entries(path, session, type_needles(types), wanted, keep)
+    for entry in stream:
+        if matches(entry, types, since, until, base):
+            yield entry
+
+@contextmanager
+def recent(path=SESSION_LOG_FILE):
+    """The fastest source of the current session's latest entries, with tail(n), last(n, types, base)
+    and position(): the session store when it is enabled, otherwise the log's index."""
+    if session_log.store_enabled(path):
+        import session_db
+        yield session_db.get_store(path)
+    else:
+        with session_log.IndexedSessionLog(path) as log:
+            yield log
+
+def last(n, path=SESSION_LOG_FILE, session=None, types=None, since=None, until=None, base=None):
+    """The last n matching entries, in log order."""
+    if n <= 0:
+        return []
+    if session is None and since is None and until is None and not path.endswith('.json') and not encoded(path):
+        with recent(path) as log:
+            return log.last(n, types, base)
+    return list(deque(entries(path, session, types, since, until, base), maxlen=n))
@@ -0,0 +1,193 @@
+# scripts/log_segments.py
+# v14.2: Segmented session log history. session.log is only the hot segment: once it passes the
+# segment size the writer seals it, moving it (and its index) into session.log.segments/ and
+# starting an empty one, and a detached process compresses the sealed segment with gzip or lzma.
+# A new session (bootstrap.sh) seals the hot segment the same way instead of replacing
+# session.log.old, so every session's history is kept, compressed. manifest.json lists the
+# segments in order with their session, sequence and timestamp ranges; session_log's readers
+# iterate a session's sealed segments and then the hot one as if they were one log.
+
+import argparse
+import fcntl
+import gzip
+import json
+import lzma
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+import session_log
+
+LOCK_FILE = 'manifest.lock'
+INDEX_SUFFIX = '.idx' # session_log's index sidecar; moved with a sealed segment, dropped once it is compressed
+COMPRESSIONS = {
+    'none': ('', open),
+    'gzip': ('.gz', gzip.open),
+    'lzma': ('.xz', lzma.open),
+}
+COMPRESSION = 'gzip' # for sealed segments (GATEWAY_LOG_COMPRESSION)
+
+manifest_path = session_log.manifest_path
+
+def segments_dir(path):
+    return path + session_log.SEGMENTS_SUFFIX
+
+def load_manifest(path):
+    """The manifest of a log's sealed segments; session 1 with none before the first seal. Call it
+    under ManifestLock, or use read_manifest."""
+    try:
+        with open(manifest_path(path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"session": 1, "segments": []}
+
+def read_manifest(path):
+    """The manifest as of a completed seal: a seal moves the hot segment and records it in one step
+    under the lock. A log that was never sealed has no segment directory, and none is created."""
+    if not os.path.isdir(segments_dir(path)):
+        return load_manifest(path)
+    with ManifestLock(path):
+        return load_manifest(path)
+
+def save_manifest(path, manifest):
+    directory = segments_dir(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, manifest_path(path))
+
+class ManifestLock:
+    """Serializes read-modify-write cycles of a manifest between writers and compressors."""
+
+    def __init__(self, path):
+        os.makedirs(segments_dir(path), exist_ok=True)
+        self.fd = os.open(os.path.join(segments_dir(path), LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+
+    def __enter__(self):
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+
+def segment_path(path, segment, compression=None):
+    suffix = COMPRESSIONS[compression or segment['compression']][0]
+    return os.path.join(segments_dir(path), segment['file'] + suffix)
+
+def seal(path, summary):
+    """Moves the hot segment at path into the segment directory and records it in the manifest with
+    summary ({entries, first_seq, last_seq, min_timestamp_ns, max_timestamp_ns}). The caller holds
+    the log's write lock and opens a new hot segment afterwards. Returns the segment's manifest entry."""
+    with ManifestLock(path):
+        manifest = load_manifest(path)
+        session = manifest['session']
+        ordinal = sum(1 for segment in manifest['segments'] if segment['session'] == session) + 1
+        st = os.stat(path)
+        # The inode lets a reader that opened the hot segment before the seal tell it was sealed.
+        segment = {"file": f"{session:06d}-{ordinal:06d}.log", "session": session, **summary,
+                   "bytes": st.st_size, "inode": st.st_ino, "compression": 'none'}
+        target = segment_path(path, segment)
+        os.replace(path, target)
+        if os.path.exists(path + INDEX_SUFFIX):
+            os.replace(path + INDEX_SUFFIX, target + INDEX_SUFFIX)
+        manifest['segments'].append(segment)
+        save_manifest(path, manifest)
+    return segment
+
+def start_session(path):
+    """Makes the next sealed segments belong to a new session. Returns its number."""
+    with ManifestLock(path):
+        manifest = load_manifest(path)
+        manifest['session'] += 1
+        save_manifest(path, manifest)
+    return manifest['session']
+
+def compress_in_background(path):
+    """Starts a detached process that compresses the log's uncompressed sealed segments."""
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), '--compress', path], stdin=subprocess.DEVNULL,
+                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True, close_fds=True)
+
+def compress_segments(path, compression=None):
+    """Compresses every sealed segment still stored plain. Readers that opened one keep reading it;
+    readers that look it up afterwards follow the manifest to the compressed file."""
+    compression = compression or os.environ.get('GATEWAY_LOG_COMPRESSION', COMPRESSION)
+    if compression not in COMPRESSIONS or compression == 'none':
+        return 0
+    with ManifestLock(path):
+        pending = [segment['file'] for segment in load_manifest(path)['segments'] if segment['compression'] == 'none']
+    compressed = 0
+    for name in pending:
+        source = os.path.join(segments_dir(path), name)
+        target = source + COMPRESSIONS[compression][0]
+        fd, tmp_path = tempfile.mkstemp(dir=segments_dir(path), suffix='.tmp')
+        os.close(fd)
+        try:
+            with open(source, 'rb') as src, COMPRESSIONS[compression][1](tmp_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        except FileNotFoundError: # Another compressor got there first.
+            os.remove(tmp_path)
+            continue
+        with ManifestLock(path):
+            manifest = load_manifest(path)
+            segment = next((segment for segment in manifest['segments'] if segment['file'] == name), None)
+            if segment is None or segment['compression'] != 'none':
+                os.remove(tmp_path)
+                continue
+            os.replace(tmp_path, target)
+            segment['compression'] = compression
+            save_manifest(path, manifest)
+        for leftover in (source, source + INDEX_SUFFIX):
+            try:
+                os.remove(leftover)
+            except FileNotFoundError:
+                pass
+        compressed += 1
+    return compressed
+
+def open_segment(path, segment):
+    """A binary stream of a sealed segment's lines, following it if it was compressed meanwhile."""
+    for attempt in range(2):
+        try:
+            return COMPRESSIONS[segment['compression']][1](segment_path(path, segment), 'rb')
+        except FileNotFoundError:
+            if attempt:
+                raise
+            segment = next((found for found in read_manifest(path)['segments'] if found['file'] == segment['file']), segment)
+
+def session_segments(manifest, session=None):
+    """The manifest entries of a session's sealed segments (default: the current session), in order."""
+    session = manifest['session'] if session is None else session
+    return [segment for segment in manifest['segments'] if segment['session'] == session]
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the sealed segments of a session log.")
+    parser.add_argument("--log", default='session.log', help="The session log (default: session.log).")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--new-session", action="store_true", help="Seal the current session's log and start a new session.")
+    action.add_argument("--compress", metavar="LOG", help="Compress the sealed segments of LOG that are still stored plain.")
+    args = parser.parse_args()
+
+    if args.compress:
+        compress_segments(args.compress)
+        return
+    if args.new_session:
+        import session_log
+        writer = session_log.SessionLogWriter(args.log)
+        sealed = writer.new_session()
+        writer.append({"type": "session_start", "timestamp": datetime.now(timezone.utc).isoformat()})
+        writer.close()
+        if sealed is not None:
+            print(f"✅ Previous session log sealed into {segments_dir(args.log)}/{sealed['file']} ({sealed['entries']} entries).")
+        return
+    manifest = read_manifest(args.log)
+    print(f"Session {manifest['session']}; {len(manifest['segments'])} sealed segment(s):")
+    for segment in manifest['segments']:
+        print(f"  {segment['file']}{COMPRESSIONS[segment['compression']][0]}: session {segment['session']}, "
+              f"{segment['entries']} entries, seq {segment['first_seq']}-{segment['last_seq']}, {segment['bytes']} bytes")
+
+if __name__ == "__main__":
+    main()
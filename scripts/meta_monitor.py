@@ -1,18 +1,20 @@
 # scripts/meta_monitor.py
-# v14.2: Proactive meta-cognitive monitor.
+# v14.2: Proactive meta-cognitive monitor. It reads the recent entries through log_reader.recent():
+# the SQLite session store when it is enabled (session_db.py), where it records its suggestions as
+# well, otherwise the session log's index.
 
 import time
-import json
-import os
 import yaml
 from datetime import datetime, timezone
 
-SESSION_LOG_FILE = "session.log"
+import log_reader
+import session_db
+
+SESSION_LOG_FILE = log_reader.SESSION_LOG_FILE
 TRIGGERS_FILE = "config/meta_triggers.yaml"
 SUGGESTIONS_LOG = "suggestions.log"
 SLEEP_INTERVAL = 10
-
-last_processed_line = 0
+HISTORY_WINDOW = 10 # entries the Tool Fixation check looks back over
 
 def load_file(filepath, loader, default):
     try:
@@ -22,12 +24,14 @@ def load_file(filepath, loader, default):
         return default
 
 def log_suggestion(message):
+    timestamp = datetime.now(timezone.utc).isoformat()
     with open(SUGGESTIONS_LOG, 'a') as f:
-        f.write(f"[{datetime.now(timezone.utc).isoformat()}] {message}\n")
+        f.write(f"[{timestamp}] {message}\n")
+    if session_db.enabled(SESSION_LOG_FILE):
+        session_db.get_store(SESSION_LOG_FILE).add_suggestion(timestamp, message)
 
 def check_for_patterns(log_entries, triggers):
     if not log_entries: return
-    history_window = 10
     if len(log_entries) < 2: return
 
     for pattern in triggers.get('patterns', []):
@@ -57,7 +61,7 @@ def check_for_patterns(log_entries, triggers):
         elif pattern['name'] == 'Tool Fixation':
             threshold = pattern.get('threshold', 3)
             failures = {}
-            for entry in log_entries[-history_window:]:
+            for entry in log_entries[-HISTORY_WINDOW:]:
                 if entry.get('type') == 'command_result' and entry.get('returncode') != 0:
                     tool_name = entry.get('command', ' ').split()[0]
                     failures[tool_name] = failures.get(tool_name, 0) + 1
@@ -67,8 +71,20 @@ def check_for_patterns(log_entries, triggers):
                     log_suggestion(pattern['message'].format(tool_name=tool, count=count))
                     return
 
+def recent_entries(log, triggers):
+    """What check_for_patterns needs, read through the log's index (or the session store) rather than
+    the whole log: the last HISTORY_WINDOW entries, preceded by the command results before them that
+    Analysis Paralysis counts."""
+    recent = log.tail(HISTORY_WINDOW)
+    needed = max((pattern.get('threshold', 5) for pattern in triggers.get('patterns', [])
+                  if pattern['name'] == 'Analysis Paralysis'), default=0)
+    first_seq = recent[0].get('seq') if recent else None
+    if first_seq is None:
+        return recent # The window reaches back to the start of the session.
+    earlier = [entry for entry in log.last(needed, {'command_result'}) if entry.get('seq', first_seq) < first_seq]
+    return earlier + recent
+
 def main():
-    global last_processed_line
     log_suggestion("Meta-cognitive monitor initialized and running.")
 
     triggers = load_file(TRIGGERS_FILE, yaml.safe_load, {})
@@ -77,16 +93,14 @@ def main():
         log_suggestion(f"ERROR: Missing triggers config file '{TRIGGERS_FILE}'. Monitor will not run effectively.")
         return
 
+    checked = None # position() of the log when it was last checked
     while True:
         try:
-            if os.path.exists(SESSION_LOG_FILE):
-                with open(SESSION_LOG_FILE, 'r') as f:
-                    lines = f.readlines()
-                
-                if len(lines) > last_processed_line:
-                    all_log_entries = [json.loads(line) for line in lines if line.strip()]
-                    check_for_patterns(all_log_entries, triggers)
-                    last_processed_line = len(lines)
+            with log_reader.recent(SESSION_LOG_FILE) as log:
+                state = log.position()
+                if state is not None and state != checked:
+                    checked = state
+                    check_for_patterns(recent_entries(log, triggers), triggers)
         except Exception as e:
             log_suggestion(f"MONITOR-ERROR: An exception occurred: {e}")
 
@@ -0,0 +1,124 @@
+# scripts/output_delta.py
+# v14.2: Line-level deltas between successive outputs of the same command. Agents re-run the
+# same observational commands (git status, cat, pytest) and the output barely changes, which
+# exact-hash deduplication cannot exploit. A repeated output is stored in the blob store as
+# edits of the command's previous output, and its log entry shows only the changed lines;
+# blob_store.load_blob rebuilds the full bytes on demand. The diff runs on the command path, so
+# it is a single pass over a hash of the base's lines rather than difflib's quadratic matcher.
+
+import bisect
+import hashlib
+import json
+import os
+import tempfile
+
+import blob_store
+
+STATE_DIR = '.gateway/last_output' # <sha256 of command>.<stream> -> digest of its last output
+MAX_OUTPUT_BYTES = 8 * 1024 * 1024 # Larger outputs are stored whole rather than loaded and diffed.
+MAX_DEPTH = 16 # Longest chain of deltas a reader replays; the next output is stored whole.
+MAX_DELTA_RATIO = 0.5 # A delta must be at most this fraction of the output to be worth it.
+
+def state_path(command, name):
+    return os.path.join(STATE_DIR, f"{hashlib.sha256(command.encode('utf-8')).hexdigest()}.{name}")
+
+def previous_output(command, name):
+    """The digest of the command's last output on this stream, if it is still in the blob store."""
+    try:
+        with open(state_path(command, name)) as f:
+            digest = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return digest if blob_store.blob_depth(digest) is not None else None
+
+def remember(command, name, digest):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=STATE_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(digest)
+    os.replace(tmp_path, state_path(command, name))
+
+def line_delta(base, data, budget=None):
+    """Returns (ops for blob_store.apply_delta, removed lines, added lines) turning bytes base into data,
+    or None as soon as the inserted lines pass budget bytes.
+
+    Each line of data extends the current copy if it is the base's next line, else starts a copy at
+    its next occurrence in the base, else is inserted. That is linear in the number of lines, and
+    finds appends, edits, deletions and moved blocks; it may miss the shortest possible delta."""
+    if budget is not None and len(data) - len(base) > budget:
+        return None # The growth alone has to be inserted.
+    base_lines = base.splitlines(keepends=True)
+    new_lines = data.splitlines(keepends=True)
+    positions = {}
+    for i, line in enumerate(base_lines):
+        positions.setdefault(line, []).append(i)
+    ops, added, copied = [], [], bytearray(len(base_lines))
+    inserted = cursor = 0 # cursor: the base line after the last copy.
+    start = end = None # The base range of the copy being extended.
+    for line in new_lines:
+        if end is not None and end < len(base_lines) and base_lines[end] == line:
+            end += 1
+            continue
+        if end is not None:
+            ops.append([start, end])
+            copied[start:end] = b'\1' * (end - start)
+            cursor, start, end = end, None, None
+        found = positions.get(line)
+        if found:
+            k = bisect.bisect_left(found, cursor)
+            start = found[k] if k < len(found) else found[0]
+            end = start + 1
+            continue
+        inserted += len(line)
+        if budget is not None and inserted > budget:
+            return None
+        added.append(line)
+        # surrogateescape keeps non-UTF-8 bytes intact through JSON.
+        text = line.decode('utf-8', errors='surrogateescape')
+        if ops and not isinstance(ops[-1][0], int):
+            ops[-1].append(text)
+        else:
+            ops.append([text])
+    if end is not None:
+        ops.append([start, end])
+        copied[start:end] = b'\1' * (end - start)
+    removed = [line for line, kept in zip(base_lines, copied) if not kept]
+    return ops, removed, added
+
+def describe(digest, base, removed, added, limit):
+    """The log entry's view of a delta-stored output: the changed lines, at most about limit bytes."""
+    if digest == base:
+        header = "[unchanged from the previous run"
+    elif not removed and not added:
+        header = "[previous run's output with lines moved or repeated"
+    else:
+        header = f"[previous run's output with {len(removed)} line(s) removed and {len(added)} added"
+    text = f"{header}; full output: python3 scripts/blob_store.py {digest}]"
+    changes = [b'- ' + line for line in removed] + [b'+ ' + line for line in added]
+    body = b''.join(line if line.endswith(b'\n') else line + b'\n' for line in changes)
+    if len(body) > limit:
+        body = body[:limit] + b'\n[... more changes omitted ...]'
+    return (text + '\n' + body.decode('utf-8', errors='replace')).strip()
+
+def store(command, name, tee, limit):
+    """Stores an output as a delta against the command's previous one if that is much smaller.
+    Returns the log fields for it, or None to store it the usual way. Either way it becomes the next base."""
+    if tee.size > MAX_OUTPUT_BYTES:
+        return None
+    base = previous_output(command, name)
+    if base is None or blob_store.blob_depth(base) >= MAX_DEPTH:
+        return None
+    data = tee.getvalue()
+    digest = hashlib.sha256(data).hexdigest()
+    removed = added = []
+    if digest != base:
+        budget = tee.size * MAX_DELTA_RATIO
+        delta = line_delta(blob_store.load_blob(base), data, budget)
+        if delta is None:
+            return None
+        ops, removed, added = delta
+        if len(json.dumps(ops)) > budget:
+            return None
+        blob_store.save_delta(digest, base, ops)
+    remember(command, name, digest)
+    return {name: describe(digest, base, removed, added, limit), f"{name}_hash": digest}
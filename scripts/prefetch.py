@@ -0,0 +1,332 @@
+# scripts/prefetch.py
+# v14.2: Speculative prefetch of likely follow-up read-only commands. A next-command model is
+# learned from past sessions (handoff logs and every session in the session log): n-gram counts of which
+# command follows the previous one or two, keyed by command base ('cat', 'git log') and with the
+# arguments the follow-up shares with its predecessor or that step's intent generalised into
+# placeholders. After each step the daemon predicts the next commands, and a background worker runs
+# the cacheable, read-only ones at low priority to warm the result cache, within a CPU budget.
+# Hits and the latency they saved are counted against the CPU spent, so it can be checked that
+# prefetching pays for itself (python3 scripts/prefetch.py).
+
+import argparse
+import glob
+import json
+import os
+import re
+import shlex
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+
+import log_reader
+import read_only
+import result_cache
+import session_log
+
+HANDOFF_DIR = 'context/handoffs'
+STEP_TYPES = {'intent', 'command_result'} # the entries session_steps reads
+LEGACY_LOG = session_log.SESSION_LOG_FILE + '.old' # the one previous session older bootstraps kept
+STATS_FILE = '.gateway/prefetch_stats.json'
+MAX_PREDICTIONS = 3
+MIN_COUNT = 2 # A transition must have been seen this often...
+MIN_PROBABILITY = 0.2 # ...and make up this share of what followed its context.
+CPU_SHARE = 0.1 # CPU seconds of prefetching allowed per second of wall time...
+CPU_BURST = 2.0 # ...accumulating up to this many seconds.
+PREFETCH_TIMEOUT = 10 # seconds before a prefetched command is abandoned
+PATH_PATTERN = re.compile(r'[\w.-]*/[\w./-]+|[\w-]+\.\w+') # path-like words in an intent
+
+def command_base(words):
+    """'cat', or 'git log' for git: what a command does, without its arguments."""
+    if not words:
+        return ''
+    base = os.path.basename(words[0])
+    if base == 'git':
+        subcommand = next((word for word in words[1:] if not word.startswith('-')), None)
+        return f"git {subcommand}" if subcommand else base
+    return base
+
+def split_command(command):
+    """The words of a command that round-trips through shlex, so a prediction rebuilt from its words
+    is the same string an agent would type; None for anything else, e.g. pipelines."""
+    try:
+        words = shlex.split(command)
+    except ValueError:
+        return None
+    return words if words and shlex.join(words) == command else None
+
+def intent_paths(intent):
+    return PATH_PATTERN.findall(intent or '')
+
+def template(words, previous_words, paths):
+    """The command with the words it shares with the previous command or its intent as placeholders."""
+    result = []
+    for word in words:
+        if word in previous_words[1:]:
+            result.append(f"{{prev:{previous_words.index(word, 1)}}}")
+        elif word in paths:
+            result.append(f"{{intent:{paths.index(word)}}}")
+        else:
+            result.append(word)
+    return result
+
+def instantiate(words, previous_words, paths):
+    result = []
+    for word in words:
+        match = re.fullmatch(r'\{(prev|intent):(\d+)\}', word)
+        if match is None:
+            result.append(word)
+            continue
+        source = previous_words if match.group(1) == 'prev' else paths
+        index = int(match.group(2))
+        if index >= len(source):
+            return None
+        result.append(source[index])
+    return shlex.join(result)
+
+def session_steps(entries):
+    """(intent, command) of each command in a session, in order."""
+    intent = None
+    for entry in entries:
+        if entry.get('type') == 'intent':
+            intent = entry.get('details')
+        elif entry.get('type') == 'command_result' and isinstance(entry.get('command'), str):
+            yield intent, entry['command']
+
+def history_sessions(handoff_dir=HANDOFF_DIR, path=session_log.SESSION_LOG_FILE):
+    for handoff in sorted(glob.glob(os.path.join(handoff_dir, '*.json'))):
+        try:
+            yield list(session_steps(log_reader.entries(handoff, types=STEP_TYPES)))
+        except (OSError, ValueError, AttributeError):
+            continue
+    yield list(session_steps(log_reader.entries(LEGACY_LOG, types=STEP_TYPES)))
+    for session in log_reader.sessions(path):
+        yield list(session_steps(log_reader.entries(path, session, types=STEP_TYPES)))
+
+class NextCommandModel:
+    """Counts of the command templates that followed each context: the previous command's base, and
+    the previous two bases."""
+
+    def __init__(self):
+        self.counts = {} # context -> Counter of JSON-encoded templates
+
+    @staticmethod
+    def contexts(history):
+        """The contexts of what follows history, a sequence of (intent, words), most specific first."""
+        bases = [command_base(words) for _, words in history]
+        keys = [bases[-1]]
+        if len(bases) >= 2:
+            keys.insert(0, f"{bases[-2]} > {bases[-1]}")
+        return keys
+
+    def observe(self, history, command):
+        """Counts command as following history (the steps before it, oldest first)."""
+        words = split_command(command)
+        if not history or words is None:
+            return
+        intent, previous_words = history[-1]
+        key = json.dumps(template(words, previous_words, intent_paths(intent)))
+        for context in self.contexts(history):
+            self.counts.setdefault(context, Counter())[key] += 1
+
+    def learn(self, sessions):
+        for steps in sessions:
+            history = deque(maxlen=2)
+            for intent, command in steps:
+                self.observe(history, command)
+                words = split_command(command)
+                if words is None:
+                    history.clear() # Its successor cannot be predicted from an unparsed step.
+                else:
+                    history.append((intent, words))
+        return self
+
+    def predict(self, history, limit=MAX_PREDICTIONS):
+        """The likeliest next commands after history, most likely first."""
+        if not history:
+            return []
+        intent, previous_words = history[-1]
+        paths = intent_paths(intent)
+        predictions = []
+        for context in self.contexts(history):
+            counter = self.counts.get(context)
+            if not counter:
+                continue
+            total = sum(counter.values())
+            for key, count in counter.most_common():
+                if count < MIN_COUNT or count / total < MIN_PROBABILITY:
+                    break
+                command = instantiate(json.loads(key), previous_words, paths)
+                if command is not None and command not in predictions:
+                    predictions.append(command)
+            if len(predictions) >= limit:
+                break
+        return predictions[:limit]
+
+class Prefetcher:
+    """Warms the result cache with predicted next commands on one low-priority background worker."""
+
+    def __init__(self, model=None, cpu_share=CPU_SHARE, cpu_burst=CPU_BURST):
+        self.model = model or NextCommandModel().learn(history_sessions())
+        self.cpu_share = cpu_share
+        self.cpu_burst = cpu_burst
+        self.budget = cpu_burst
+        self.budget_time = time.monotonic()
+        self.history = deque(maxlen=2)
+        self.pending = [] # (command, env) still to prefetch; replaced after every step
+        self.warmed = {} # cache key -> duration_ms of the prefetch that stored it
+        self.stats = load_stats()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        threading.Thread(target=self.worker, daemon=True).start()
+
+    def after_step(self, intent, command, env=None):
+        """Learns from a step just run and queues prefetches of the commands likely to follow it."""
+        with self.lock:
+            self.model.observe(list(self.history), command)
+            words = split_command(command)
+            if words is None:
+                self.history.clear()
+            else:
+                self.history.append((intent, words))
+            predictions = self.model.predict(list(self.history))
+            # Only what is still likely matters; older predictions are dropped.
+            self.pending = [(prediction, env) for prediction in predictions if read_only.is_read_only(prediction)]
+            if self.pending:
+                self.wakeup.notify()
+
+    def note_hit(self, key, served_ms):
+        """Records a cache hit; returns True if a prefetch stored the entry. Only its first hit counts:
+        without the prefetch, the call that missed would have stored it for the later ones."""
+        with self.lock:
+            warmed_ms = self.warmed.pop(key, None)
+            if warmed_ms is None:
+                return False
+            self.stats['hits'] += 1
+            self.stats['saved_ms'] = round(self.stats['saved_ms'] + max(0.0, warmed_ms - served_ms), 3)
+            save_stats(self.stats)
+            return True
+
+    def refill_budget(self):
+        now = time.monotonic()
+        self.budget = min(self.cpu_burst, self.budget + (now - self.budget_time) * self.cpu_share)
+        self.budget_time = now
+
+    def worker(self):
+        while True:
+            with self.lock:
+                while not self.pending:
+                    self.wakeup.wait()
+                self.refill_budget()
+                if self.budget <= 0:
+                    wait = -self.budget / self.cpu_share
+                else:
+                    command, env = self.pending.pop(0)
+                    wait = None
+            if wait is not None:
+                time.sleep(wait)
+                continue
+            self.prefetch(command, env)
+
+    def prefetch(self, command, env):
+        key = result_cache.cache_key(command)
+        if key is None or result_cache.get(key) is not None:
+            return
+        started = time.monotonic()
+        with tempfile.TemporaryFile() as stdout_file, tempfile.TemporaryFile() as stderr_file:
+            # nice rather than a preexec_fn, which is unsafe in the threaded daemon.
+            proc = subprocess.Popen(['nice', '-n', '19', '/bin/bash', '-c', command], stdin=subprocess.DEVNULL,
+                                    stdout=stdout_file, stderr=stderr_file, env=env)
+            timer = threading.Timer(PREFETCH_TIMEOUT, proc.kill)
+            timer.start()
+            # wait4 for this child's own CPU time, which is what the budget is charged.
+            _, status, rusage = os.wait4(proc.pid, 0)
+            timer.cancel()
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            stdout_file.seek(0)
+            stderr_file.seek(0)
+            stdout, stderr = stdout_file.read(), stderr_file.read()
+        duration_ms = round((time.monotonic() - started) * 1000, 3)
+        cpu_s = rusage.ru_utime + rusage.ru_stime
+        with self.lock:
+            self.budget -= cpu_s
+            self.stats['prefetched'] += 1
+            self.stats['cpu_s'] = round(self.stats['cpu_s'] + cpu_s, 3)
+            # Stored only if it finished and its inputs did not change while it ran, as for any cached result.
+            if (proc.returncode >= 0 and len(stdout) + len(stderr) <= result_cache.CACHE_MAX_ENTRY_BYTES
+                    and result_cache.cache_key(command) == key):
+                result_cache.put(key, proc.returncode, stdout, stderr)
+                self.warmed[key] = duration_ms
+                self.stats['stored'] += 1
+            save_stats(self.stats)
+
+def load_stats():
+    stats = {"prefetched": 0, "stored": 0, "hits": 0, "cpu_s": 0.0, "saved_ms": 0.0}
+    try:
+        with open(STATS_FILE) as f:
+            stats.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+    return stats
+
+def save_stats(stats):
+    os.makedirs(os.path.dirname(STATS_FILE), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(STATS_FILE), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(stats, f)
+    os.replace(tmp_path, STATS_FILE)
+
+def evaluate(model_sessions, test_steps):
+    """Offline check of the model: the share of test_steps' commands it predicted from the steps before them."""
+    model = NextCommandModel().learn(model_sessions)
+    history, predicted, total = deque(maxlen=2), 0, 0
+    for intent, command in test_steps:
+        if history:
+            total += 1
+            predicted += command in model.predict(list(history))
+        model.observe(list(history), command) # As the daemon does, it keeps learning during the session.
+        words = split_command(command)
+        if words is None:
+            history.clear()
+        else:
+            history.append((intent, words))
+    return predicted, total
+
+def report(stats):
+    hit_rate = stats['hits'] / stats['stored'] if stats['stored'] else 0.0
+    print(f"Prefetched {stats['prefetched']} command(s), {stats['stored']} stored in the result cache, "
+          f"{stats['hits']} later served from it ({hit_rate:.0%} of those stored).")
+    print(f"CPU spent prefetching: {stats['cpu_s'] * 1000:.1f} ms; agent latency saved by hits: {stats['saved_ms']:.1f} ms.")
+    verdict = "pays for itself" if stats['saved_ms'] >= stats['cpu_s'] * 1000 else "does not yet pay for itself"
+    print(f"Saved latency vs CPU spent: prefetching {verdict}.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Report on speculative prefetching, or test its next-command model on past sessions.")
+    parser.add_argument("--reset", action="store_true", help="Clear the recorded prefetch statistics.")
+    parser.add_argument("--evaluate", action="store_true", help="Replay each handoff against a model learned from the others and report how often the next command was predicted.")
+    args = parser.parse_args()
+
+    if args.reset:
+        if os.path.exists(STATS_FILE):
+            os.remove(STATS_FILE)
+        print("Prefetch statistics cleared.")
+        return
+    if args.evaluate:
+        sessions = [steps for steps in history_sessions() if steps]
+        if len(sessions) < 2:
+            print("ERROR: Need at least two recorded sessions to evaluate the model.", file=sys.stderr)
+            sys.exit(1)
+        predicted = total = 0
+        for i, steps in enumerate(sessions):
+            hits, count = evaluate(sessions[:i] + sessions[i + 1:], steps)
+            predicted += hits
+            total += count
+        print(f"Next command predicted (in the top {MAX_PREDICTIONS}) for {predicted} of {total} step(s) "
+              f"({predicted / total if total else 0:.0%}) across {len(sessions)} session(s).")
+        return
+    report(load_stats())
+
+if __name__ == "__main__":
+    main()
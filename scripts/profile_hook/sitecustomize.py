@@ -0,0 +1,28 @@
+# scripts/profile_hook/sitecustomize.py
+# v14.2: Loaded by every Python process started by a command run with run.py --profile, which puts
+# this directory on PYTHONPATH. When GATEWAY_PROFILE_DIR is set, the process runs under cProfile and
+# writes its stats to <dir>/<pid>.prof at exit, so any Python entry point is profiled: scripts,
+# -m modules, -c one-liners and Python processes started by shell pipelines or other Python.
+# Processes that leave through os._exit (e.g. forked multiprocessing workers) write nothing.
+# While it is on the path it shadows any other sitecustomize module for the command.
+
+import os
+
+PROFILE_DIR_ENV = 'GATEWAY_PROFILE_DIR'
+
+if os.environ.get(PROFILE_DIR_ENV):
+    import atexit
+    import cProfile
+
+    _profiler = cProfile.Profile()
+    _directory = os.environ[PROFILE_DIR_ENV]
+
+    def _dump_stats():
+        _profiler.disable()
+        try:
+            _profiler.dump_stats(os.path.join(_directory, f"{os.getpid()}.prof"))
+        except OSError:
+            pass # The gateway gave up on the run and removed the directory.
+
+    atexit.register(_dump_stats) # Registered first, so it runs last, after the program's own handlers.
+    _profiler.enable()
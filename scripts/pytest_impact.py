@@ -0,0 +1,300 @@
+# scripts/pytest_impact.py
+# v14.2: Test-impact tracking for pytest runs through the gateway. A pytest command is run with
+# the gateway_test_report plugin loaded, and every test's outcome and duration is kept in
+# .gateway/tests/. A green run that was not narrowed to a subset of the suite also records a stat
+# snapshot of the Python sources. With --impacted, a run is narrowed to the test files that
+# import (transitively) something changed since that snapshot, plus the files of previously failed
+# tests, which run first; such a narrowed run never records a new snapshot, so a file stays selected
+# until a run of the whole suite is green.
+# Imports are read statically, so a test affected only through data files, plugins or dynamic
+# imports is not selected; a change to conftest.py or to pytest's configuration selects every
+# test it governs.
+
+import ast
+import json
+import os
+import shlex
+import tempfile
+import time
+
+STATE_DIR = '.gateway/tests'
+RESULTS_FILE = os.path.join(STATE_DIR, 'results.json') # {"rootdir", "tests": {nodeid: {...}}, "green": {path: [mtime_ns, size]}}
+IMPORTS_FILE = os.path.join(STATE_DIR, 'imports.json') # path -> [mtime_ns, size, imported modules], so unchanged files are not re-parsed
+PLUGIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pytest_plugin')
+PLUGIN = 'gateway_test_report'
+REPORT_ENV = 'GATEWAY_PYTEST_REPORT'
+FIRST_ENV = 'GATEWAY_PYTEST_FIRST' # a file of node ids the plugin moves to the front of the run
+CONFIG_FILES = ('pytest.ini', 'pyproject.toml', 'setup.cfg', 'tox.ini')
+SKIP_DIRS = {'.git', '.gateway', '.session_outputs', '__pycache__', '.pytest_cache', '.mypy_cache', '.ruff_cache',
+             '.tox', '.nox', '.venv', 'venv', 'node_modules', 'build', 'dist', '.eggs'}
+SHELL_SYNTAX = set('|&;<>()$`\n') # Only a plain pytest invocation can be extended with more arguments.
+# Options whose value is the next word, so it is not taken for a test path.
+VALUE_OPTIONS = {'-k', '-m', '-p', '-c', '-o', '-n', '-W', '--maxfail', '--deselect', '--ignore', '--ignore-glob',
+                 '--tb', '--durations', '--basetemp', '--rootdir', '--confcutdir', '--junitxml', '--log-level',
+                 '--cov', '--cov-report', '--dist', '--import-mode'}
+# Options that select a subset of the suite; a green run with them says nothing about the rest.
+NARROWING_OPTIONS = ('-k', '-m', '--lf', '--last-failed', '--deselect', '--sw', '--stepwise', '--ignore', '--ignore-glob')
+FAILED_OUTCOMES = ('failed', 'error')
+MAX_LOGGED_FAILURES = 20
+
+def pytest_words(command):
+    """The words of a plain pytest invocation, or None for anything else."""
+    if SHELL_SYNTAX & set(command):
+        return None
+    try:
+        words = shlex.split(command)
+    except ValueError:
+        return None
+    if not words:
+        return None
+    program = os.path.basename(words[0])
+    if program in ('pytest', 'py.test') or (program.startswith('python') and words[1:3] == ['-m', 'pytest']):
+        return words
+    return None
+
+def program_length(words):
+    """How many words name the program: 'pytest', or 'python -m pytest'."""
+    return 3 if words[1:3] == ['-m', 'pytest'] else 1
+
+def split_arguments(words):
+    """Returns (options, operands) of a pytest invocation, the program included in options."""
+    start = program_length(words)
+    options, operands = words[:start], []
+    expect_value = False
+    for word in words[start:]:
+        if expect_value:
+            options.append(word)
+            expect_value = False
+        elif word.startswith('-'):
+            options.append(word)
+            expect_value = word in VALUE_OPTIONS
+        else:
+            operands.append(word)
+    return options, operands
+
+def is_narrowed(options):
+    return any(option.split('=', 1)[0] in NARROWING_OPTIONS for option in options[program_length(options):])
+
+def load_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def save_json(path, data):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=STATE_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def snapshot(rootdir):
+    """path (relative to rootdir) -> [mtime_ns, size] of every Python source and pytest config file."""
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(rootdir):
+        dirnames[:] = [name for name in dirnames if name not in SKIP_DIRS]
+        for name in filenames:
+            if name.endswith('.py') or name in CONFIG_FILES:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files[os.path.relpath(path, rootdir)] = [st.st_mtime_ns, st.st_size]
+    return files
+
+def changed_files(old, new):
+    return {path for path in old.keys() | new.keys() if old.get(path) != new.get(path)}
+
+def module_keys(path):
+    """The dotted names a file may be imported by: its path from the root and every suffix of it,
+    since test suites often put a source directory on sys.path."""
+    parts = path[:-len('.py')].split(os.sep)
+    if parts[-1] == '__init__':
+        parts.pop()
+    return ['.'.join(parts[i:]) for i in range(len(parts))]
+
+def imported_modules(rootdir, path):
+    try:
+        with open(os.path.join(rootdir, path), 'rb') as f:
+            tree = ast.parse(f.read(), path)
+    except (OSError, SyntaxError, ValueError):
+        return []
+    package = path[:-len('.py')].split(os.sep)[:-1]
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = package[:len(package) - node.level + 1] if node.level else []
+            module = '.'.join(base + (node.module.split('.') if node.module else []))
+            if module:
+                modules.add(module)
+            modules.update(f"{module}.{alias.name}" if module else alias.name for alias in node.names)
+    return sorted(modules)
+
+def import_graph(rootdir, files):
+    """path -> modules it imports, re-parsing only files whose stat changed since the last call."""
+    cached = load_json(IMPORTS_FILE, {})
+    graph, fresh = {}, {}
+    for path, stat in files.items():
+        if not path.endswith('.py'):
+            continue
+        entry = cached.get(path)
+        if entry is None or entry[:2] != stat:
+            entry = stat + [imported_modules(rootdir, path)]
+        fresh[path] = entry
+        graph[path] = entry[2]
+    if fresh != cached:
+        save_json(IMPORTS_FILE, fresh)
+    return graph
+
+def is_test_file(path):
+    name = os.path.basename(path)
+    return name.endswith('.py') and (name.startswith('test_') or name.endswith('_test.py'))
+
+def impacted_test_files(changed, graph, test_files):
+    """The test files affected by the changed paths, or None if every test is."""
+    if any(os.path.basename(path) in CONFIG_FILES for path in changed):
+        return None
+    index = {}
+    for path in graph.keys() | {path for path in changed if path.endswith('.py')}:
+        for key in module_keys(path):
+            index.setdefault(key, []).append(path)
+    importers = {}
+    for path, modules in graph.items():
+        for module in modules:
+            for target in index.get(module, ()):
+                importers.setdefault(target, set()).add(path)
+    affected, pending = set(changed), list(changed)
+    while pending:
+        for importer in importers.get(pending.pop(), ()):
+            if importer not in affected:
+                affected.add(importer)
+                pending.append(importer)
+    selected = {path for path in test_files if path in affected}
+    for conftest in (path for path in affected if os.path.basename(path) == 'conftest.py'):
+        directory = os.path.dirname(conftest)
+        if not directory:
+            return None
+        selected.update(path for path in test_files if path.startswith(directory + os.sep))
+    return selected
+
+class PytestRun:
+    """One pytest command run through the gateway: the command actually run, and the bookkeeping after it."""
+
+    def __init__(self, words, cwd, impacted):
+        self.words = words
+        self.cwd = cwd
+        self.options, self.operands = split_arguments(words)
+        self.report_path = os.path.abspath(os.path.join(STATE_DIR, f"report-{os.getpid()}-{time.monotonic_ns()}.json"))
+        self.results = load_json(RESULTS_FILE, {"rootdir": None, "tests": {}, "green": None})
+        self.rootdir = self.results['rootdir'] or cwd
+        self.snapshot = None # Taken before the run, when a green run would vouch for the whole suite.
+        self.selection = None # {"changed_files", "failed_first", "test_files"} when --impacted narrowed the run
+        self.failed_first = [] # node ids to run before the rest of the selection
+        self.arguments = self.operands
+        self.notice = None
+        if is_narrowed(self.options) or any('::' in operand for operand in self.operands):
+            if impacted:
+                self.notice = "-k/-m/node ids already narrow this run; running it as given."
+            return
+        files = snapshot(self.rootdir)
+        test_files = {path for path in files if is_test_file(path)}
+        test_files.update(nodeid.split('::', 1)[0] for nodeid in self.results['tests'])
+        test_files &= files.keys()
+        if all(self.in_scope(path) for path in test_files):
+            self.snapshot = files
+        if impacted:
+            self.select(files, test_files)
+
+    def in_scope(self, path):
+        """True if the test file at path (relative to rootdir) is among the paths the command names."""
+        if not self.operands:
+            return True
+        for operand in self.operands:
+            scope = os.path.relpath(os.path.abspath(os.path.join(self.cwd, operand)), self.rootdir)
+            if scope == '.' or path == scope or path.startswith(scope + os.sep):
+                return True
+        return False
+
+    def select(self, files, test_files):
+        green = self.results.get('green')
+        if green is None:
+            self.notice = "no green run recorded yet; running every test."
+            return
+        changed = changed_files(green, files)
+        impacted = impacted_test_files(changed, import_graph(self.rootdir, files), test_files)
+        if impacted is None:
+            self.notice = "pytest configuration or a top-level conftest.py changed; running every test."
+            return
+        failed = [nodeid for nodeid, test in self.results['tests'].items()
+                  if test['outcome'] in FAILED_OUTCOMES and nodeid.split('::', 1)[0] in test_files and self.in_scope(nodeid.split('::', 1)[0])]
+        # A failed test's whole file runs: its other tests may have broken since they last ran. pytest
+        # merges node ids into their file's collection, so the plugin puts the failed ones first.
+        selected = sorted({path for path in impacted if self.in_scope(path)} | {nodeid.split('::', 1)[0] for nodeid in failed})
+        self.selection = {"changed_files": len(changed), "failed_first": len(failed), "test_files": len(selected)}
+        self.failed_first = failed
+        self.arguments = [self.relative(path) for path in selected]
+        self.snapshot = None # Green or not, a narrowed run does not vouch for the rest of the suite.
+        self.notice = (f"{len(changed)} file(s) changed since the last green run; running {len(failed)} previously failed "
+                       f"test(s) first, then the rest of {len(selected)} impacted or failing test file(s).")
+
+    def relative(self, nodeid):
+        return os.path.relpath(os.path.join(self.rootdir, nodeid), self.cwd)
+
+    def nothing_to_run(self):
+        return self.selection is not None and not self.arguments
+
+    def command(self):
+        """The command to run: the plugin's directory on PYTHONPATH, its report path in the environment."""
+        os.makedirs(STATE_DIR, exist_ok=True)
+        arguments = self.words if self.selection is None else self.options + self.arguments
+        start = program_length(arguments)
+        first = ''
+        if self.failed_first:
+            with open(self.report_path + '.first', 'w') as f:
+                json.dump(self.failed_first, f)
+            first = f"{FIRST_ENV}={shlex.quote(self.report_path + '.first')} "
+        return (f"{first}{REPORT_ENV}={shlex.quote(self.report_path)} PYTHONPATH=${{PYTHONPATH:+$PYTHONPATH:}}{shlex.quote(PLUGIN_DIR)} "
+                f"{shlex.join(arguments[:start] + ['-p', PLUGIN] + arguments[start:])}")
+
+    def finish(self, returncode):
+        """Stores the run's per-test results and returns the summary for its log entry."""
+        report = load_json(self.report_path, None)
+        for path in (self.report_path, self.report_path + '.first'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        summary = {}
+        if self.selection is not None:
+            summary['impacted'] = self.selection
+        if report is None:
+            return {"tests": summary} if summary else {}
+        if self.results['rootdir'] not in (None, report['rootdir']):
+            self.results = {"rootdir": None, "tests": {}, "green": None} # A different project: its history does not apply.
+        self.results['rootdir'] = report['rootdir']
+        now = time.time()
+        for nodeid, test in report['tests'].items():
+            self.results['tests'][nodeid] = dict(test, timestamp=now)
+        if report['exitstatus'] == 0 and returncode == 0 and self.snapshot is not None and report['rootdir'] == self.rootdir:
+            self.results['green'] = self.snapshot
+        save_json(RESULTS_FILE, self.results)
+        outcomes = {}
+        for test in report['tests'].values():
+            outcomes[test['outcome']] = outcomes.get(test['outcome'], 0) + 1
+        failed = [nodeid for nodeid, test in report['tests'].items() if test['outcome'] in FAILED_OUTCOMES]
+        summary.update(outcomes)
+        summary['duration_ms'] = round(sum(test['duration_ms'] for test in report['tests'].values()), 3)
+        if failed:
+            summary['failed_tests'] = failed[:MAX_LOGGED_FAILURES]
+        return {"tests": summary}
+
+def prepare(command, cwd, impacted=False):
+    """A PytestRun for a plain pytest command, or None for any other command."""
+    words = pytest_words(command)
+    if words is None:
+        return None
+    return PytestRun(words, cwd, impacted)
@@ -0,0 +1,46 @@
+# scripts/pytest_plugin/gateway_test_report.py
+# v14.2: pytest plugin the gateway loads (-p gateway_test_report) into pytest runs it records.
+# It writes every test's outcome and duration, as JSON, to the path in GATEWAY_PYTEST_REPORT, and
+# runs the node ids listed in the JSON file at GATEWAY_PYTEST_FIRST (previously failed tests) first.
+# It lives in a directory of its own because the gateway puts that directory on the tested
+# project's PYTHONPATH, where the gateway's other modules could shadow the project's.
+
+import json
+import os
+
+REPORT_ENV = 'GATEWAY_PYTEST_REPORT'
+FIRST_ENV = 'GATEWAY_PYTEST_FIRST'
+
+_report = None
+
+def pytest_configure(config):
+    global _report
+    if os.environ.get(REPORT_ENV) and not hasattr(config, 'workerinput'): # Only the xdist controller reports.
+        _report = {"rootdir": str(config.rootpath), "tests": {}}
+
+def pytest_collection_modifyitems(session, config, items):
+    if not os.environ.get(FIRST_ENV):
+        return
+    try:
+        with open(os.environ[FIRST_ENV]) as f:
+            first = set(json.load(f))
+    except (OSError, ValueError):
+        return
+    items.sort(key=lambda item: item.nodeid not in first) # Stable: each group keeps its order.
+
+def pytest_runtest_logreport(report):
+    if _report is None:
+        return
+    test = _report['tests'].setdefault(report.nodeid, {"outcome": "passed", "duration_ms": 0.0})
+    test['duration_ms'] = round(test['duration_ms'] + report.duration * 1000, 3)
+    if report.failed:
+        test['outcome'] = 'failed' if report.when == 'call' else 'error'
+    elif report.skipped and test['outcome'] == 'passed':
+        test['outcome'] = 'skipped'
+
+def pytest_sessionfinish(session, exitstatus):
+    if _report is None:
+        return
+    _report['exitstatus'] = int(exitstatus)
+    with open(os.environ[REPORT_ENV], 'w') as f:
+        json.dump(_report, f)
@@ -0,0 +1,53 @@
+# scripts/read_only.py
+# v14.2: Classifies gateway commands as read-only. Read-only commands cannot interfere with
+# each other or with the workspace, so the gateway may run them concurrently.
+
+import json
+import shlex
+
+READ_ONLY_COMMANDS_FILE = 'config/read_only_commands.json'
+UNSAFE_SHELL_SYNTAX = ('>', ';', '&', '`', '$(', '\n')
+
+_policy = None
+
+def load_policy():
+    global _policy
+    if _policy is None:
+        try:
+            with open(READ_ONLY_COMMANDS_FILE, 'r') as f:
+                _policy = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            _policy = {"commands": [], "git_subcommands": [], "unsafe_arguments": {}}
+    return _policy
+
+def git_subcommand(words):
+    """The first non-option word after 'git', e.g. 'status' in 'git --no-pager status -s'."""
+    for word in words[1:]:
+        if not word.startswith('-'):
+            return word
+    return None
+
+def is_read_only_words(words, policy):
+    if not words or words[0] not in policy['commands']:
+        return False
+    if words[0] == 'git' and git_subcommand(words) not in policy['git_subcommands']:
+        return False
+    unsafe = policy['unsafe_arguments'].get(words[0], [])
+    return not any(is_unsafe(word, unsafe) for word in words[1:])
+
+def is_unsafe(word, unsafe):
+    if word in unsafe or word.split('=', 1)[0] in unsafe:
+        return True
+    # A short option may carry its value (-Ovim) or share a cluster with others (-nO). A letter
+    # that is part of another option's value is refused too; refusing is the safe side.
+    return word.startswith('-') and not word.startswith('--') and any(f'-{letter}' in unsafe for letter in word[1:])
+
+def is_read_only(command):
+    """True if every stage of the command (pipes allowed) is a read-only tool with no redirection."""
+    if any(token in command for token in UNSAFE_SHELL_SYNTAX):
+        return False
+    policy = load_policy()
+    try:
+        return all(is_read_only_words(shlex.split(stage), policy) for stage in command.split('|'))
+    except ValueError:
+        return False
@@ -0,0 +1,207 @@
+# scripts/replay_session.py
+# v14.2: Re-runs the commands of a past session in a scratch git worktree checked out at the
+# commit the session started from, and compares each returncode, output and duration with the
+# recorded result. Consecutive read-only steps run concurrently; a state-changing step waits
+# for everything before it and everything after it waits for the step.
+
+import argparse
+import difflib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import blob_store
+import log_reader
+import read_only
+
+REPLAY_WORKERS = min(8, (os.cpu_count() or 1) + 4)
+STEP_TIMEOUT = 300 # seconds
+SLOWDOWN_FACTOR = 1.5 # A step is flagged as slower when it takes this many times its recorded duration...
+SLOWDOWN_MIN_MS = 50 # ...and at least this much longer, so noise on fast commands is not reported.
+# Steps whose effects reach beyond the scratch worktree: bootstrap.sh starts daemons, git commands
+# on refs, the stash, config or remotes act on the repository every worktree shares, and package
+# installs change the environment. They are skipped unless --allow names them.
+DEFAULT_SKIP = '|'.join([
+    r'scripts/bootstrap\.sh',
+    r'\bgit\s+(?:-[Cc]\s+\S+\s+|-\S+\s+)*(?:push|pull|fetch|remote|branch|tag|stash|config|update-ref|symbolic-ref|reflog|gc|prune|worktree|notes|replace|clone|submodule)\b',
+    r'\bgit\s+(?:-[Cc]\s+\S+\s+|-\S+\s+)*(?:checkout|switch)\s+(?:\S+\s+)*-[bBc]\b',
+    r'\b(?:pip3?|python3?\s+-m\s+pip|uv\s+pip|npm|yarn|pnpm|apt(?:-get)?|conda|gem|cargo)\s+(?:\S+\s+)*?(?:install|uninstall|add|remove)\b',
+])
+DIFF_LINES = 20
+
+def load_session(path):
+    """Returns the entries of a handoff's full_session_log, or of a session log."""
+    return list(log_reader.entries(path))
+
+def parse_timestamp(text):
+    # fromisoformat takes at most microseconds; bootstrap.sh writes nanoseconds.
+    return datetime.fromisoformat(re.sub(r'(\.\d{6})\d+', r'\1', text).replace('Z', '+00:00'))
+
+def git(*args):
+    return subprocess.run(['git', *args], check=True, capture_output=True, text=True).stdout.strip()
+
+def start_revision(entries):
+    """The last commit made before the session's first entry, or HEAD if none is that old."""
+    for entry in entries:
+        if 'timestamp' in entry:
+            started = parse_timestamp(entry['timestamp'])
+            return git('rev-list', '-1', f"--before=@{int(started.timestamp())}", 'HEAD') or git('rev-parse', 'HEAD')
+    return git('rev-parse', 'HEAD')
+
+def add_worktree(rev):
+    path = tempfile.mkdtemp(prefix='replay-')
+    git('worktree', 'add', '--detach', '--quiet', path, rev)
+    return path
+
+def remove_worktree(path):
+    try:
+        git('worktree', 'remove', '--force', path)
+    except subprocess.CalledProcessError:
+        pass
+    shutil.rmtree(path, ignore_errors=True)
+
+def plan_waves(steps):
+    """Groups steps into waves that can each run concurrently: runs of read-only steps, and each other step alone."""
+    waves = []
+    for step in steps:
+        if step['read_only'] and waves and waves[-1][-1]['read_only']:
+            waves[-1].append(step)
+        else:
+            waves.append([step])
+    return waves
+
+def recorded_limits(entry):
+    """The ulimit prefix for the resource limits the step was recorded under, as the gateway applies them."""
+    limits = []
+    if entry.get('cpu_limit_s') is not None:
+        limits.append(f"-t {entry['cpu_limit_s']}")
+    if entry.get('memory_limit_mb') is not None:
+        limits.append(f"-v {entry['memory_limit_mb'] * 1024}")
+    return f"ulimit {' '.join(limits)} || exit 126\n" if limits else ''
+
+def run_command(command, cwd, timeout, limits=''):
+    started = time.monotonic()
+    try:
+        proc = subprocess.run(limits + command, shell=True, executable='/bin/bash', cwd=cwd, stdin=subprocess.DEVNULL,
+                              capture_output=True, timeout=timeout)
+        returncode, stdout, stderr = proc.returncode, proc.stdout, proc.stderr
+    except subprocess.TimeoutExpired as e:
+        returncode, stdout, stderr = None, e.stdout or b'', e.stderr or b''
+    return {
+        "returncode": returncode,
+        "stdout": stdout.decode('utf-8', errors='replace').strip(),
+        "stderr": stderr.decode('utf-8', errors='replace').strip(),
+        "duration_ms": round((time.monotonic() - started) * 1000, 3)
+    }
+
+def recorded_output(entry, name):
+    """The recorded text of an output, or None if it is no longer available to compare with."""
+    digest = entry.get(f"{name}_hash")
+    if digest is not None and blob_store.blob_depth(digest) is None:
+        return None
+    return blob_store.resolve_output(entry, name)
+
+def compare(entry, result):
+    """Returns (behaviour differences, output diffs, slower) of a replayed step against its recording."""
+    differences, diffs = [], {}
+    if result['returncode'] is None:
+        differences.append("timed out")
+    elif result['returncode'] != entry.get('returncode'):
+        differences.append(f"returncode {entry.get('returncode')} -> {result['returncode']}")
+    for name in ('stdout', 'stderr'):
+        recorded = recorded_output(entry, name)
+        if recorded is not None and recorded != result[name]:
+            differences.append(f"{name} differs")
+            diffs[name] = list(difflib.unified_diff(recorded.splitlines(), result[name].splitlines(),
+                                                    'recorded', 'replayed', lineterm=''))
+    recorded_ms = entry.get('duration_ms')
+    slower = (recorded_ms is not None and not entry.get('cached') and result['duration_ms'] > recorded_ms * SLOWDOWN_FACTOR
+              and result['duration_ms'] - recorded_ms >= SLOWDOWN_MIN_MS)
+    return differences, diffs, slower
+
+def replay(steps, cwd, jobs, timeout):
+    for wave in plan_waves(steps):
+        with ThreadPoolExecutor(max_workers=min(jobs, len(wave))) as pool:
+            results = list(pool.map(lambda step: run_command(step['command'], cwd, timeout, recorded_limits(step['entry'])), wave))
+        for step, result in zip(wave, results):
+            step['result'] = result
+            yield step
+
+def format_ms(value):
+    return f"{value:.1f} ms" if value is not None else "n/a"
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a past session's commands in a scratch worktree and compare the results.")
+    parser.add_argument("session", help="A handoff JSON file (its full_session_log) or a session log.")
+    parser.add_argument("--rev", help="Commit to replay at (default: the last commit before the session started).")
+    parser.add_argument("--jobs", type=int, default=REPLAY_WORKERS, help=f"Read-only steps to run at once (default: {REPLAY_WORKERS}; 1 for the most faithful timings).")
+    parser.add_argument("--timeout", type=float, default=STEP_TIMEOUT, help=f"Seconds before a step is killed (default: {STEP_TIMEOUT}).")
+    parser.add_argument("--skip", default=DEFAULT_SKIP, help="Regex of commands not to replay (default: bootstrap.sh, git commands on refs, the stash, config or remotes, and package installs).")
+    parser.add_argument("--allow", help="Regex of commands to replay even though --skip matches them.")
+    parser.add_argument("--show-diff", action="store_true", help="Print a diff of every output that changed.")
+    parser.add_argument("--json", metavar="PATH", help="Also write the per-step report to this file.")
+    parser.add_argument("--keep-worktree", action="store_true", help="Leave the scratch worktree in place for inspection.")
+    args = parser.parse_args()
+
+    try:
+        entries = load_session(args.session)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: Cannot load session {args.session}: {e}", file=sys.stderr)
+        sys.exit(1)
+    skip = re.compile(args.skip) if args.skip else None
+    allow = re.compile(args.allow) if args.allow else None
+    def skipped_step(step):
+        return skip is not None and skip.search(step['command']) and not (allow and allow.search(step['command']))
+    steps = [{"number": number, "command": entry['command'], "entry": entry, "read_only": read_only.is_read_only(entry['command'])}
+             for number, entry in enumerate((e for e in entries if e.get('type') == 'command_result'), 1)]
+    skipped = [step for step in steps if skipped_step(step)]
+    steps = [step for step in steps if not skipped_step(step)]
+
+    rev = args.rev or start_revision(entries)
+    worktree = add_worktree(rev)
+    print(f"Replaying {len(steps)} step(s) at {rev[:12]} in {worktree} ({len(skipped)} skipped).")
+    for step in skipped:
+        print(f"[{step['number']:>3}] skipped {step['command'][:80]}")
+    report, changed, slower = [], 0, 0
+    try:
+        for step in replay(steps, worktree, max(1, args.jobs), args.timeout):
+            entry, result = step['entry'], step['result']
+            differences, diffs, is_slower = compare(entry, result)
+            changed += bool(differences)
+            slower += is_slower
+            status = "CHANGED" if differences else "SLOWER" if is_slower else "same"
+            print(f"[{step['number']:>3}] {status:<7} {format_ms(result['duration_ms']):>10} (recorded {format_ms(entry.get('duration_ms'))})  {step['command'][:80]}")
+            for difference in differences:
+                print(f"      {difference}")
+            if args.show_diff:
+                for name, diff in diffs.items():
+                    print(f"      --- {name} ---")
+                    for line in diff[:DIFF_LINES]:
+                        print(f"      {line}")
+                    if len(diff) > DIFF_LINES:
+                        print(f"      [... {len(diff) - DIFF_LINES} more diff lines ...]")
+            report.append({"step": step['number'], "command": step['command'], "read_only": step['read_only'],
+                           "recorded": {"returncode": entry.get('returncode'), "duration_ms": entry.get('duration_ms')},
+                           "replayed": {"returncode": result['returncode'], "duration_ms": result['duration_ms']},
+                           "differences": differences, "slower": is_slower})
+    finally:
+        if args.keep_worktree:
+            print(f"Worktree kept at {worktree}.")
+        else:
+            remove_worktree(worktree)
+
+    print(f"\n{len(steps)} step(s) replayed: {len(steps) - changed} same, {changed} changed, {slower} slower.")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"session": args.session, "rev": rev, "steps": report}, f, indent=2)
+    sys.exit(1 if changed or slower else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# scripts/result_cache.py
+# v14.2: Opt-in, size-bounded on-disk LRU of read-only command results. A result is keyed by
+# the exact command plus a cheap fingerprint of its inputs: mtime/size of the paths it names,
+# and the index, HEAD, refs and config for git subcommands. A command whose inputs cannot be
+# pinned down that way (globs, variables, operands that are not paths) is never cached.
+
+import hashlib
+import json
+import os
+import re
+import shlex
+import tempfile
+import time
+
+CACHE_DIR = '.gateway/cache'
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_MAX_ENTRY_BYTES = CACHE_MAX_BYTES // 8
+GIT_DIR = '.git'
+
+# Inputs a path fingerprint cannot see: recursive walks read files below the named directory,
+# and these git subcommands read the worktree rather than the index.
+RECURSIVE_SHORT_FLAGS = {'grep': 'rR', 'ls': 'R'}
+RECURSIVE_LONG_FLAGS = {'grep': ('--recursive', '--dereference-recursive', '--directories=recurse'), 'ls': ('--recursive',)}
+UNCACHEABLE_COMMANDS = ('find',)
+WORKTREE_GIT_SUBCOMMANDS = ('status', 'grep')
+# Options with which these git subcommands read the worktree too: {subcommand: (short flags, long options)}.
+WORKTREE_GIT_OPTIONS = {'ls-files': ('omdk', ('--others', '--modified', '--deleted', '--killed')),
+                        'describe': ('', ('--dirty', '--broken'))}
+# ls flags that only change which names are listed and how; any other flag (-l, -s, -t, -i, ...)
+# shows entry metadata, which changes without touching the directory's own mtime.
+LS_NAME_ONLY_FLAGS = set('aA1drCxm')
+PATTERN_COMMANDS = ('grep',) # The first operand is a pattern, not a path.
+NUMBER = re.compile(r'[+-]?\d+$') # Option values such as 'head -n 20'.
+GLOB_CHARACTERS = set('*?[{~')
+
+def stat_fingerprint(path):
+    try:
+        st = os.stat(path)
+        return [path, st.st_mtime_ns, st.st_size, st.st_ino]
+    except OSError:
+        return [path, None]
+
+def refs_fingerprint():
+    """Digest of the stat of every loose ref, so updating any branch, tag or stash changes it."""
+    hash_obj = hashlib.sha256()
+    for dirpath, dirnames, filenames in os.walk(os.path.join(GIT_DIR, 'refs')):
+        dirnames.sort()
+        for name in sorted(filenames):
+            hash_obj.update(json.dumps(stat_fingerprint(os.path.join(dirpath, name))).encode('utf-8'))
+    return hash_obj.hexdigest()
+
+def git_fingerprint():
+    parts = [stat_fingerprint(os.path.join(GIT_DIR, name)) for name in ('index', 'packed-refs', 'config', os.path.join('logs', 'HEAD'))]
+    parts.append(refs_fingerprint())
+    try:
+        with open(os.path.join(GIT_DIR, 'HEAD')) as f:
+            head = f.read().strip()
+        parts.append(head)
+        if head.startswith('ref: '):
+            parts.append(stat_fingerprint(os.path.join(GIT_DIR, head[5:])))
+    except OSError:
+        parts.append(None)
+    return parts
+
+def is_recursive(words):
+    short_flags = RECURSIVE_SHORT_FLAGS.get(words[0], '')
+    long_flags = RECURSIVE_LONG_FLAGS.get(words[0], ())
+    for word in words[1:]:
+        if word in long_flags:
+            return True
+        if word.startswith('-') and not word.startswith('--') and any(flag in short_flags for flag in word[1:]):
+            return True
+    return False
+
+def reads_worktree(subcommand, words):
+    """True if git reads the worktree for this subcommand, not only the index, objects and refs."""
+    if subcommand in WORKTREE_GIT_SUBCOMMANDS:
+        return True
+    if subcommand == 'diff':
+        return not {'--cached', '--staged'} & set(words)
+    short_flags, long_options = WORKTREE_GIT_OPTIONS.get(subcommand, ('', ()))
+    for word in words:
+        if word.startswith('--'):
+            if word.split('=', 1)[0] in long_options:
+                return True
+        elif word.startswith('-') and any(flag in short_flags for flag in word[1:]):
+            return True
+    return False
+
+def has_expansion(stage):
+    """True if bash would expand something in the stage: an unquoted glob or tilde, or a $ or
+    backquote outside single quotes. The expanded words, not the ones written, are the inputs."""
+    quote = None
+    escaped = False
+    for ch in stage:
+        if escaped:
+            escaped = False
+        elif ch == '\\' and quote != "'":
+            escaped = True
+        elif quote == "'":
+            quote = None if ch == "'" else quote
+        elif ch in '$`':
+            return True
+        elif quote == '"':
+            quote = None if ch == '"' else quote
+        elif ch in '\'"':
+            quote = ch
+        elif ch in GLOB_CHARACTERS:
+            return True
+    return False
+
+def operands(words):
+    """The non-option words after the command name."""
+    result, options_done = [], False
+    for word in words[1:]:
+        if word == '--' and not options_done:
+            options_done = True
+        elif options_done or not word.startswith('-') or word == '-':
+            result.append(word)
+    return result
+
+def fingerprint(command):
+    """Returns the input fingerprint of a read-only command, or None if its inputs cannot be fingerprinted cheaply."""
+    parts = []
+    for stage in command.split('|'):
+        words = shlex.split(stage)
+        if not words or words[0] in UNCACHEABLE_COMMANDS or is_recursive(words) or has_expansion(stage):
+            return None
+        if words[0] == 'ls' and any(word.startswith('--') or not set(word[1:]) <= LS_NAME_ONLY_FLAGS
+                                    for word in words[1:] if word.startswith('-')):
+            return None
+        args = operands(words)
+        if words[0] == 'git':
+            subcommand = next((word for word in words[1:] if not word.startswith('-')), None)
+            if reads_worktree(subcommand, words):
+                return None
+            # Revisions and other non-path operands resolve through the refs the git fingerprint covers.
+            parts.append(git_fingerprint())
+            paths = [word for word in args if os.path.exists(word)]
+        else:
+            if words[0] in PATTERN_COMMANDS:
+                if any(word in ('-e', '-f', '--regexp', '--file') or word.startswith(('--regexp=', '--file=')) for word in words[1:]):
+                    return None
+                args = args[1:]
+            if any(not os.path.exists(word) and not NUMBER.match(word) for word in args):
+                return None # Not a path we can stat, e.g. an option value we cannot tell apart from one.
+            paths = [word for word in args if os.path.exists(word)]
+        parts.extend(stat_fingerprint(path) for path in paths or ['.'])
+    return parts
+
+def cache_key(command):
+    inputs = fingerprint(command)
+    if inputs is None:
+        return None
+    return hashlib.sha256(json.dumps([command, inputs]).encode('utf-8')).hexdigest()
+
+def entry_path(key):
+    return os.path.join(CACHE_DIR, key)
+
+def get(key):
+    """Returns (returncode, stdout bytes, stderr bytes) for a cached result, or None."""
+    path = entry_path(key)
+    try:
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline())
+            stdout = f.read(header['stdout_bytes'])
+            stderr = f.read(header['stderr_bytes'])
+        os.utime(path) # Recency for LRU eviction.
+    except (OSError, ValueError, KeyError):
+        return None
+    return header['returncode'], stdout, stderr
+
+def put(key, returncode, stdout, stderr):
+    if len(stdout) + len(stderr) > CACHE_MAX_ENTRY_BYTES:
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    header = {"returncode": returncode, "stdout_bytes": len(stdout), "stderr_bytes": len(stderr), "created": time.time()}
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(json.dumps(header).encode('utf-8') + b'\n' + stdout + stderr)
+    os.replace(tmp_path, entry_path(key))
+    evict()
+
+def evict(max_bytes=CACHE_MAX_BYTES):
+    """Removes least recently used entries until the cache fits in max_bytes."""
+    entries = []
+    with os.scandir(CACHE_DIR) as it:
+        for entry in it:
+            if entry.name.endswith('.tmp'):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
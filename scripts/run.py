@@ -1,70 +1,116 @@
 # scripts/run.py
 # The v14.2 Unified Command Gateway
+# A thin client: when the gateway daemon is listening in this workspace the call is
+# forwarded to it and the result streamed back; otherwise it runs in-process.
 
-import subprocess
-import argparse
-import json
 import os
 import sys
-import base64
-from datetime import datetime, timezone
+import _signal # Likewise for 'signal', which imports enum.
+import _socket # The C module only; 'socket' pulls in enum/selectors and costs more than the call itself.
 
-SESSION_LOG_FILE = 'session.log'
+GATEWAY_SOCKET = '.gateway/gateway.sock'
 
-def log_action(log_entry):
-    with open(SESSION_LOG_FILE, 'a') as f:
-        f.write(json.dumps(log_entry) + '\n')
+# Wire format. The request is a NUL-separated field list (op, argc, argv..., env "KEY=VALUE"...)
+# terminated by EOF. The reply is a series of frames: a one-byte channel, a 4-byte big-endian
+# length and the payload.
+CHANNEL_STDOUT = b'o'
+CHANNEL_STDERR = b'e'
+CHANNEL_EXIT = b'x'
+CHANNEL_FALLBACK = b'r' # The daemon declined the call; run it in-process instead.
+CHANNEL_CALL = b'c' # The daemon's id for the call, which a 'cancel' request names.
 
-def main():
-    parser = argparse.ArgumentParser(description="v14.2 Unified Command Gateway: Logs intent and executes a command.")
-    parser.add_argument("--intent", required=True, help="The agent's intent for this action.")
-    parser.add_argument("--command", required=True, help="The command to execute.")
-    args = parser.parse_args()
+def encode_request(op, argv=(), env=None):
+    fields = [op, str(len(argv))] + list(argv)
+    fields += [f"{key}={value}" for key, value in (env or {}).items()]
+    return b'\0'.join(os.fsencode(field) for field in fields)
+
+def encode_frame(channel, payload):
+    return channel + len(payload).to_bytes(4, 'big') + payload
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+def stdin_is_forwardable():
+    """Daemon calls give the command no stdin, which only matches running in-process when the
+    client's stdin is a terminal, /dev/null or closed; piped or redirected input is not forwarded."""
+    try:
+        mode = os.fstat(0).st_mode
+    except OSError:
+        return True
+    return (mode & 0o170000) == 0o020000 # a character device
 
-    log_action({
-        "type": "intent",
-        "details": args.intent,
-        "timestamp": datetime.now(timezone.utc).isoformat()
-    })
+def send_cancel(call_id, signum):
+    sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    try:
+        sock.connect(GATEWAY_SOCKET)
+        sock.sendall(encode_request('cancel', [call_id, str(signum)]))
+        sock.shutdown(_socket.SHUT_WR)
+        _recv_exact(sock, 5)
+    except OSError:
+        pass
+    finally:
+        sock.close()
 
-    command_to_run = args.command
-    
-    # Check if the command is specifically for running the handoff script.
-    # The original check was a broad substring search, which was buggy.
-    command_parts = command_to_run.strip().split()
-    is_handoff_execution = (
-        len(command_parts) >= 2 and
-        'python' in command_parts[0] and # handles python, python3
-        command_parts[1] == 'scripts/consolidate_handoff.py'
-    )
+def forward_to_daemon(argv):
+    """Returns the exit code of the forwarded call, or None if no daemon took it."""
+    if not stdin_is_forwardable():
+        return None
+    sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    try:
+        sock.connect(GATEWAY_SOCKET)
+    except OSError:
+        sock.close()
+        return None
 
-    if is_handoff_execution:
-        if os.path.exists(SESSION_LOG_FILE):
-            with open(SESSION_LOG_FILE, 'rb') as f:
-                session_data_b64 = base64.b64encode(f.read()).decode('utf-8')
-            command_to_run += f" --session-data '{session_data_b64}'"
+    # Ctrl-C or SIGTERM stops the command in the daemon, as it would a child of this process; the
+    # call's exit code still arrives as usual. A second signal gives up on the daemon.
+    call = {"id": None, "signals": 0}
+    def cancel(signum, frame):
+        call["signals"] += 1
+        if call["signals"] > 1 or call["id"] is None:
+            sys.exit(128 + signum)
+        send_cancel(call["id"], signum)
+    handlers = {signum: _signal.signal(signum, cancel) for signum in (_signal.SIGINT, _signal.SIGTERM)}
 
+    sinks = {CHANNEL_STDOUT: sys.stdout.buffer, CHANNEL_STDERR: sys.stderr.buffer}
     try:
-        result = subprocess.run(command_to_run, shell=True, check=True, capture_output=True, text=True, executable='/bin/bash')
-        stdout, stderr, returncode = result.stdout, result.stderr, result.returncode
-    except subprocess.CalledProcessError as e:
-        stdout, stderr, returncode = e.stdout, e.stderr, e.returncode
-    
-    log_action({
-        "type": "command_result",
-        "command": args.command,
-        "returncode": returncode,
-        "stdout": stdout.strip(),
-        "stderr": stderr.strip(),
-        "timestamp": datetime.now(timezone.utc).isoformat()
-    })
+        sock.sendall(encode_request('run', argv, os.environ))
+        sock.shutdown(_socket.SHUT_WR)
+        while True:
+            header = _recv_exact(sock, 5)
+            if header is None:
+                # The command may already have run, so it must not be retried in-process.
+                print("run.py: lost connection to the gateway daemon.", file=sys.stderr)
+                return 1
+            channel, length = header[:1], int.from_bytes(header[1:], 'big')
+            payload = _recv_exact(sock, length) if length else b''
+            if channel == CHANNEL_EXIT:
+                return int(payload)
+            if channel == CHANNEL_FALLBACK:
+                return None
+            if channel == CHANNEL_CALL:
+                call["id"] = payload.decode()
+                continue
+            sinks[channel].write(payload)
+            sinks[channel].flush()
+    finally:
+        for signum, handler in handlers.items():
+            _signal.signal(signum, handler)
+        sock.close()
 
-    if stdout:
-        print(stdout)
-    if stderr:
-        print(stderr, file=sys.stderr)
-        
-    sys.exit(returncode)
+def main():
+    returncode = forward_to_daemon(sys.argv[1:])
+    if returncode is None:
+        import gateway
+        gateway.main(sys.argv[1:])
+    sys.exit(128 - returncode if returncode < 0 else returncode) # Killed by a signal: the shell's convention.
 
 if __name__ == "__main__":
     main()
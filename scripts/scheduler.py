@@ -0,0 +1,172 @@
+# scripts/scheduler.py
+# v14.2: Admission control for the gateway daemon when several agents share one workspace.
+# Each call carries an agent identity (GATEWAY_AGENT, else the tmux pane, else 'default') and a
+# priority (GATEWAY_PRIORITY, higher first). State-changing calls run one at a time, in priority
+# then arrival order, so two agents never edit the tree at once; read-only calls run concurrently
+# with everything, up to a cap. A call that finds the queue full is turned away at once rather than
+# left waiting behind it. Queue wait, run time and throughput are kept per agent and written to
+# .gateway/scheduler_stats.json (python3 scripts/scheduler.py prints them).
+
+import heapq
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+
+STATS_FILE = '.gateway/scheduler_stats.json'
+MAX_QUEUED = 16 # calls waiting for their turn before new ones are refused
+MAX_READERS = 8 # read-only calls running at once
+LATENCY_SAMPLES = 1000 # per agent, for the percentiles
+CANCEL_POLL = 0.2 # seconds between checks that a waiting call was not cancelled
+BUSY_EXIT_CODE = 75 # EX_TEMPFAIL: the caller should retry later
+
+class Busy(Exception):
+    """The queue is full; the call was not admitted."""
+
+class Cancelled(Exception):
+    """The call was cancelled while it waited."""
+
+def agent_identity(env):
+    return env.get('GATEWAY_AGENT') or (f"tmux{env['TMUX_PANE']}" if env.get('TMUX_PANE') else 'default')
+
+def agent_priority(env):
+    try:
+        return int(env.get('GATEWAY_PRIORITY', 0))
+    except ValueError:
+        return 0
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class AgentStats:
+    def __init__(self):
+        self.calls = 0
+        self.refused = 0
+        self.wait_ms = deque(maxlen=LATENCY_SAMPLES)
+        self.latency_ms = deque(maxlen=LATENCY_SAMPLES) # queue wait plus run time, as the agent sees it
+
+    def summary(self):
+        return {"calls": self.calls, "refused": self.refused,
+                "wait_ms_p50": round(percentile(self.wait_ms, 0.5), 3), "wait_ms_p95": round(percentile(self.wait_ms, 0.95), 3),
+                "latency_ms_p50": round(percentile(self.latency_ms, 0.5), 3),
+                "latency_ms_p95": round(percentile(self.latency_ms, 0.95), 3)}
+
+class Scheduler:
+    """Admits daemon calls: state-changing ones one at a time by priority, read-only ones concurrently."""
+
+    def __init__(self, max_queued=MAX_QUEUED, max_readers=MAX_READERS, stats_file=STATS_FILE):
+        self.max_queued = max_queued
+        self.max_readers = max_readers
+        self.stats_file = stats_file
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.writers = [] # heap of (-priority, arrival, agent) tickets of the state-changing calls waiting
+        self.writer_running = False
+        self.readers_waiting = 0
+        self.readers_running = 0
+        self.arrivals = itertools.count()
+        self.started = time.time()
+        self.completed = 0
+        self.max_depth = 0
+        self.agents = {} # agent -> AgentStats
+
+    def depth(self):
+        return len(self.writers) + self.readers_waiting
+
+    def admit(self, agent, read_only, priority=0, cancelled=None):
+        """Blocks until the call may run; returns the queue wait in ms. Raises Busy when the queue is
+        full and Cancelled if cancelled() turns true while waiting. Every admit needs a release()."""
+        started = time.monotonic()
+        with self.lock:
+            stats = self.agents.setdefault(agent, AgentStats())
+            if read_only and self.readers_running < self.max_readers and not self.readers_waiting:
+                self.readers_running += 1
+                return 0.0
+            if not read_only and not self.writer_running and not self.writers:
+                self.writer_running = True
+                return 0.0
+            if self.depth() >= self.max_queued:
+                stats.refused += 1
+                raise Busy(f"{self.depth()} calls already queued")
+            ticket = (-priority, next(self.arrivals), agent)
+            if read_only:
+                self.readers_waiting += 1
+            else:
+                heapq.heappush(self.writers, ticket)
+            self.max_depth = max(self.max_depth, self.depth())
+            try:
+                while not (self.readers_running < self.max_readers if read_only
+                           else not self.writer_running and self.writers[0] == ticket):
+                    if cancelled is not None and cancelled():
+                        raise Cancelled()
+                    self.changed.wait(CANCEL_POLL if cancelled is not None else None)
+            except BaseException:
+                if read_only:
+                    self.readers_waiting -= 1
+                else:
+                    self.writers.remove(ticket)
+                    heapq.heapify(self.writers)
+                    self.changed.notify_all() # The next writer may now be at the head.
+                raise
+            if read_only:
+                self.readers_waiting -= 1
+                self.readers_running += 1
+            else:
+                heapq.heappop(self.writers)
+                self.writer_running = True
+        return round((time.monotonic() - started) * 1000, 3)
+
+    def release(self, agent, read_only, wait_ms, run_ms):
+        """Frees the call's slot and records its queue wait and run time."""
+        with self.lock:
+            if read_only:
+                self.readers_running -= 1
+            else:
+                self.writer_running = False
+            self.changed.notify_all()
+            self.completed += 1
+            stats = self.agents.setdefault(agent, AgentStats())
+            stats.calls += 1
+            stats.wait_ms.append(wait_ms)
+            stats.latency_ms.append(round(wait_ms + run_ms, 3))
+            summary = self.summary()
+        save_stats(summary, self.stats_file)
+
+    def summary(self):
+        uptime = time.time() - self.started
+        return {"since": self.started, "uptime_s": round(uptime, 3), "completed": self.completed,
+                "throughput_per_min": round(self.completed / uptime * 60, 3) if uptime > 0 else 0.0,
+                "queued": self.depth(), "max_queued": self.max_depth,
+                "agents": {agent: stats.summary() for agent, stats in sorted(self.agents.items())}}
+
+def save_stats(summary, path=STATS_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(summary, f)
+    os.replace(tmp_path, path)
+
+def report(summary):
+    print(f"{summary['completed']} call(s) in {summary['uptime_s']:.0f} s: {summary['throughput_per_min']:.1f} per minute; "
+          f"{summary['queued']} queued now, at most {summary['max_queued']}.")
+    for agent, stats in summary['agents'].items():
+        print(f"  {agent}: {stats['calls']} call(s), {stats['refused']} refused; queue wait p50 {stats['wait_ms_p50']:.1f} ms, "
+              f"p95 {stats['wait_ms_p95']:.1f} ms; latency p50 {stats['latency_ms_p50']:.1f} ms, p95 {stats['latency_ms_p95']:.1f} ms")
+
+def main():
+    try:
+        with open(STATS_FILE) as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        print("No scheduler statistics yet; they are recorded by the gateway daemon.")
+        return
+    report(summary)
+
+if __name__ == "__main__":
+    main()
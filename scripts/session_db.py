@@ -0,0 +1,247 @@
+# scripts/session_db.py
+# v14.2: Optional SQLite store of session events, next to session.log as session.log.db. When it is
+# enabled (GATEWAY_SESSION_DB=1, or the database exists, e.g. after --import) the session log writer
+# mirrors every entry into it under the log's lock, and the monitor records its suggestions there.
+# The database is in WAL mode, so readers see a consistent snapshot without ever blocking the writer.
+# Every entry is kept as the JSON line written to session.log, so --export reproduces the JSONL
+# (and a handoff's full_session_log) exactly; intents, command results and suggestions also get
+# tables of their own, indexed by session, time, type and command base, so queries such as
+# "failures of git in the last 10 commands" are index lookups instead of a parse of the log.
+# session.log stays the source of truth: --import rebuilds the store from it.
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+import session_log
+
+BUSY_TIMEOUT_MS = 5000 # a writer waits this long for another writer's transaction
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    session INTEGER NOT NULL,
+    seq INTEGER,
+    type TEXT,
+    timestamp_ns INTEGER,
+    raw TEXT NOT NULL -- the entry as written to session.log
+);
+CREATE INDEX IF NOT EXISTS events_session_type ON events (session, type);
+CREATE INDEX IF NOT EXISTS events_time ON events (timestamp_ns);
+CREATE TABLE IF NOT EXISTS intents (
+    event_id INTEGER PRIMARY KEY REFERENCES events (id),
+    session INTEGER NOT NULL,
+    details TEXT,
+    agent TEXT
+);
+CREATE INDEX IF NOT EXISTS intents_session ON intents (session);
+CREATE TABLE IF NOT EXISTS command_results (
+    event_id INTEGER PRIMARY KEY REFERENCES events (id),
+    session INTEGER NOT NULL,
+    command TEXT,
+    command_base TEXT,
+    returncode INTEGER,
+    duration_ms REAL,
+    agent TEXT
+);
+CREATE INDEX IF NOT EXISTS command_results_session ON command_results (session);
+CREATE INDEX IF NOT EXISTS command_results_base ON command_results (session, command_base);
+CREATE TABLE IF NOT EXISTS suggestions (
+    id INTEGER PRIMARY KEY,
+    timestamp_ns INTEGER,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS suggestions_time ON suggestions (timestamp_ns);
+'''
+
+def db_path(log_path=session_log.SESSION_LOG_FILE):
+    return log_path + session_log.STORE_SUFFIX # with its -wal and -shm files
+
+enabled = session_log.store_enabled
+
+class SessionStore:
+    """The session events of one log. Its reads mirror IndexedSessionLog's (tail, last), within the
+    store's latest session unless one is given."""
+
+    def __init__(self, log_path=session_log.SESSION_LOG_FILE):
+        self.log_path = log_path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(db_path(log_path), timeout=BUSY_TIMEOUT_MS / 1000,
+                                  isolation_level=None, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL') # In WAL mode, still consistent after a crash.
+        self.db.executescript(SCHEMA)
+
+    def insert(self, entry, raw, session):
+        """Records one entry, given as the JSON text written for it, in a transaction of its own. A
+        failure is reported rather than raised: the entry is already in session.log."""
+        with self.lock:
+            try:
+                self.db.execute('BEGIN IMMEDIATE')
+                self.insert_one(entry, raw, session)
+                self.db.execute('COMMIT')
+            except sqlite3.Error as e:
+                if self.db.in_transaction:
+                    self.db.execute('ROLLBACK')
+                print(f"session_db: entry {entry.get('seq')} not recorded ({e}); rebuild the store with "
+                      f"python3 scripts/session_db.py --import.", file=sys.stderr)
+
+    def insert_one(self, entry, raw, session):
+        kind = entry.get('type')
+        timestamp = entry.get('timestamp')
+        event_id = self.db.execute(
+            'INSERT INTO events (session, seq, type, timestamp_ns, raw) VALUES (?, ?, ?, ?, ?)',
+            (session, entry.get('seq'), kind, session_log.timestamp_ns(timestamp) if isinstance(timestamp, str) else None, raw)).lastrowid
+        if kind == 'intent':
+            self.db.execute('INSERT INTO intents VALUES (?, ?, ?, ?)',
+                            (event_id, session, text(entry.get('details')), entry.get('agent')))
+        elif kind == 'command_result':
+            command = text(entry.get('command'))
+            self.db.execute('INSERT INTO command_results VALUES (?, ?, ?, ?, ?, ?, ?)',
+                            (event_id, session, command, session_log.command_base(command),
+                             entry.get('returncode'), entry.get('duration_ms'), entry.get('agent')))
+
+    def add_suggestion(self, timestamp, message):
+        with self.lock:
+            self.db.execute('INSERT INTO suggestions (timestamp_ns, message) VALUES (?, ?)',
+                            (session_log.timestamp_ns(timestamp), message))
+
+    def import_log(self):
+        """Replaces the store's events with those of the log's sessions. Returns how many there were."""
+        count = 0
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                for table in ('intents', 'command_results', 'events'):
+                    self.db.execute(f'DELETE FROM {table}')
+                for session in session_log.sessions(self.log_path):
+                    for entry in session_log.read_entries(self.log_path, session):
+                        self.insert_one(entry, json.dumps(entry), session)
+                        count += 1
+                self.db.execute('COMMIT')
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+        return count
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def session(self):
+        """The latest session with events, or None."""
+        return self.query('SELECT MAX(session) FROM events')[0][0]
+
+    def position(self):
+        """Changes whenever an entry is recorded; None while the store is empty."""
+        return self.query('SELECT MAX(id) FROM events')[0][0]
+
+    def current(self, session):
+        return self.session() if session is None else session
+
+    def lines(self, session=None):
+        """A session's entries in log order, as the JSON text written to session.log."""
+        return [raw for (raw,) in self.query('SELECT raw FROM events WHERE session = ? ORDER BY id', (self.current(session),))]
+
+    def entries(self, session=None):
+        return [json.loads(raw) for raw in self.lines(session)]
+
+    def tail(self, n, session=None):
+        """The last n entries, in log order."""
+        rows = self.query('SELECT raw FROM events WHERE session = ? ORDER BY id DESC LIMIT ?', (self.current(session), max(n, 0)))
+        return [json.loads(raw) for (raw,) in reversed(rows)]
+
+    def last(self, n, types=None, base=None, session=None):
+        """The last n entries of the given types (a set) and command base, in log order."""
+        sql, params = 'SELECT e.raw FROM events e', [self.current(session)]
+        if base is not None:
+            sql += ' JOIN command_results c ON c.event_id = e.id WHERE c.session = ? AND c.command_base = ?'
+            params.append(base)
+        else:
+            sql += ' WHERE e.session = ?'
+        if types is not None:
+            sql += f" AND e.type IN ({', '.join('?' * len(types))})"
+            params.extend(sorted(types))
+        rows = self.query(sql + ' ORDER BY e.id DESC LIMIT ?', (*params, max(n, 0)))
+        return [json.loads(raw) for (raw,) in reversed(rows)]
+
+    def between(self, start_ns, end_ns, types=None):
+        """The entries timestamped in [start_ns, end_ns), across sessions, oldest first."""
+        sql, params = 'SELECT raw FROM events WHERE timestamp_ns >= ? AND timestamp_ns < ?', [start_ns, end_ns]
+        if types is not None:
+            sql += f" AND type IN ({', '.join('?' * len(types))})"
+            params.extend(sorted(types))
+        return [json.loads(raw) for (raw,) in self.query(sql + ' ORDER BY timestamp_ns, id', params)]
+
+    def failures(self, base, window=10, session=None):
+        """The failed commands with this command base among the last window commands of a session."""
+        rows = self.query(
+            'SELECT e.raw FROM (SELECT event_id, command_base, returncode FROM command_results WHERE session = ? '
+            'ORDER BY event_id DESC LIMIT ?) c JOIN events e ON e.id = c.event_id '
+            'WHERE c.command_base = ? AND c.returncode IS NOT 0 ORDER BY c.event_id',
+            (self.current(session), window, base))
+        return [json.loads(raw) for (raw,) in rows]
+
+    def suggestions(self, n=10):
+        rows = self.query('SELECT timestamp_ns, message FROM suggestions ORDER BY id DESC LIMIT ?', (n,))
+        return rows[::-1]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def text(value):
+    return value if value is None or isinstance(value, str) else json.dumps(value)
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_store(log_path=session_log.SESSION_LOG_FILE):
+    """The process-wide store for a log, opened on first use."""
+    with _stores_lock:
+        if log_path not in _stores:
+            _stores[log_path] = SessionStore(log_path)
+        return _stores[log_path]
+
+def main():
+    parser = argparse.ArgumentParser(description="Query or maintain the SQLite store of session events.")
+    parser.add_argument("--log", default=session_log.SESSION_LOG_FILE, help="The session log (default: session.log).")
+    parser.add_argument("--session", type=int, help="The session to read (default: the latest).")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--import", dest="import_log", action="store_true", help="(Re)build the store from the session log, enabling it.")
+    action.add_argument("--export", action="store_true", help="Print a session's entries as JSONL, as session.log holds them.")
+    action.add_argument("--failures", metavar="TOOL", help="Print the failed TOOL commands among the last --window commands.")
+    action.add_argument("--suggestions", type=int, metavar="N", help="Print the last N monitor suggestions.")
+    parser.add_argument("--window", type=int, default=10, help="Commands --failures looks back over (default: 10).")
+    args = parser.parse_args()
+
+    if not args.import_log and not os.path.exists(db_path(args.log)):
+        print(f"ERROR: No session store at {db_path(args.log)}; create it with --import.", file=sys.stderr)
+        sys.exit(1)
+    with SessionStore(args.log) as store:
+        if args.import_log:
+            print(f"✅ Imported {store.import_log()} entries into {db_path(args.log)}.")
+        elif args.export:
+            for raw in store.lines(args.session):
+                sys.stdout.write(raw + '\n')
+        elif args.failures:
+            for entry in store.failures(args.failures, args.window, args.session):
+                print(f"seq {entry.get('seq')}: exit {entry.get('returncode')}: {entry.get('command')}")
+        elif args.suggestions:
+            for timestamp, message in store.suggestions(args.suggestions):
+                print(f"{timestamp}: {message}")
+        else:
+            session = store.current(args.session)
+            for kind, count in store.query('SELECT type, COUNT(*) FROM events WHERE session = ? GROUP BY type ORDER BY 2 DESC', (session,)):
+                print(f"{count:>8} {kind}")
+
+if __name__ == "__main__":
+    main()
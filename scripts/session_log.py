@@ -0,0 +1,610 @@
+# scripts/session_log.py
+# v14.2: The session log writer and reader. Every entry is one line written with a single
+# O_APPEND write under a lock (or several consecutive lines, for a batch's BufferedWriter),
+# numbered with a per-log sequence number, so concurrent gateway calls never interleave; the
+# reader tolerates the partial trailing line of an in-flight write.
+# Under the same lock the writer appends a fixed-size record per entry (byte offset, length, seq,
+# timestamp, type, command base) to an index sidecar, so IndexedSessionLog can take the tail, the
+# Nth entry or the entries of one type without parsing the rest of the log. The log is the hot
+# segment of a session: past the segment size the writer seals it (see log_segments.py), and the
+# readers continue into a session's sealed segments. When the SQLite session store is enabled (see
+# session_db.py) the writer also records each entry there, under the same lock.
+
+import atexit
+import fcntl
+import json
+import os
+import re
+import struct
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+
+# log_segments is imported where a log is sealed or its sealed segments are read: it brings gzip,
+# lzma, shutil, subprocess and tempfile, which an append does not need.
+
+SESSION_LOG_FILE = 'session.log'
+SEQ_SUFFIX = '.seq' # Sidecar holding the last sequence number handed out for the log.
+INDEX_SUFFIX = '.idx' # Sidecar holding an IndexRecord per entry, in log order.
+STORE_SUFFIX = '.db' # SQLite mirror of the log (session_db.py), when enabled.
+BINARY_MAGIC = b'GWLOGB1\n' # binary_log.MAGIC: the file is in the binary encoding, not JSONL.
+INDEX_MAGIC = b'GWLIDX1\0'
+INDEX_HEADER = struct.Struct('<8sQ') # magic, inode of the log it indexes
+INDEX_RECORD = struct.Struct('<QIqq16s24s') # offset, length, seq, timestamp ns, type, command base
+NO_VALUE = -1 << 63 # seq or timestamp of an entry without one
+INDEX_READ_RECORDS = 4096 # records read at a time when an index is scanned
+TIMESTAMP_PATTERN = re.compile(r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d{1,9}))?(Z|[+-]\d\d:\d\d)?')
+GROUP_COMMIT_INTERVAL = 0.05 # seconds
+SEGMENT_MAX_BYTES = 4 * 1024 * 1024 # hot segment size at which the writer seals it (GATEWAY_LOG_SEGMENT_KB)
+SEGMENTS_SUFFIX = '.segments' # session.log.segments/: the sealed segments and their manifest (log_segments.py)
+MANIFEST_FILE = 'manifest.json' # {"session": current session, "segments": [{file, session, entries, ...}, ...]}
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+FSYNC_MODES = ('none', 'group', 'always')
+BUFFER_MAX_ENTRIES = 64 # entries a BufferedWriter holds before writing them
+BUFFER_MAX_DELAY = 1.0 # seconds a BufferedWriter holds an entry, at most, while entries keep coming
+
+IndexRecord = namedtuple('IndexRecord', 'offset length seq timestamp_ns type command_base')
+
+def timestamp_ns(text):
+    """Epoch nanoseconds of an ISO-8601 timestamp (the gateway's +00:00 or bootstrap's nanosecond Z form), or None."""
+    match = TIMESTAMP_PATTERN.fullmatch(text) if isinstance(text, str) else None
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, fraction, zone = match.groups()
+    try:
+        days = date(int(year), int(month), int(day)).toordinal() - EPOCH_ORDINAL
+    except ValueError:
+        return None
+    seconds = days * 86400 + int(hour) * 3600 + int(minute) * 60 + int(second)
+    if zone not in (None, 'Z'):
+        offset = int(zone[1:3]) * 3600 + int(zone[4:6]) * 60
+        seconds -= offset if zone[0] == '+' else -offset
+    return seconds * 1_000_000_000 + int((fraction or '0').ljust(9, '0'))
+
+def command_base(command):
+    """The tool a command runs: its first word, as the monitor's triggers name it."""
+    words = command.split() if isinstance(command, str) else None
+    return words[0] if words else ''
+
+def segment_max_bytes():
+    return int(os.environ.get('GATEWAY_LOG_SEGMENT_KB', SEGMENT_MAX_BYTES // 1024)) * 1024
+
+def manifest_path(path):
+    return os.path.join(path + SEGMENTS_SUFFIX, MANIFEST_FILE)
+
+def fixed(text, size):
+    return text.encode('utf-8')[:size]
+
+def index_record(offset, entry, length):
+    seq = entry.get('seq')
+    ns = timestamp_ns(entry.get('timestamp'))
+    return INDEX_RECORD.pack(offset, length, seq if isinstance(seq, int) else NO_VALUE, NO_VALUE if ns is None else ns,
+                             fixed(str(entry.get('type', '')), 16), fixed(command_base(entry.get('command')), 24))
+
+def unpack_record(data, position=0):
+    offset, length, seq, ns, type_, base = INDEX_RECORD.unpack_from(data, position)
+    return IndexRecord(offset, length, None if seq == NO_VALUE else seq, None if ns == NO_VALUE else ns,
+                       type_.rstrip(b'\0').decode('utf-8', 'replace'), base.rstrip(b'\0').decode('utf-8', 'replace'))
+
+def scan_lines(f, offset):
+    """(offset, length, entry) of each complete entry line of a log from offset on."""
+    f.seek(offset)
+    for line in f:
+        if not line.endswith(b'\n'):
+            break
+        position, offset = offset, offset + len(line)
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(entry, dict):
+            yield position, len(line), entry
+
+def store_enabled(path=SESSION_LOG_FILE):
+    """Whether entries are mirrored into the SQLite session store: GATEWAY_SESSION_DB=1, or it exists."""
+    return os.environ.get('GATEWAY_SESSION_DB') == '1' or os.path.exists(path + STORE_SUFFIX)
+
+class SessionLogWriter:
+    """Appends entries to a session log. fsync is 'none', 'always' (per entry) or 'group' (batched in the background)."""
+
+    def __init__(self, path=SESSION_LOG_FILE, fsync='none', group_commit_interval=GROUP_COMMIT_INTERVAL, segment_bytes=None, store=None):
+        if fsync not in FSYNC_MODES:
+            raise ValueError(f"fsync must be one of {', '.join(FSYNC_MODES)}")
+        self.path = path
+        self.fsync = fsync
+        # Size at which the log is sealed into a segment of its own; 0 never seals.
+        self.segment_bytes = segment_max_bytes() if segment_bytes is None else segment_bytes
+        self.group_commit_interval = group_commit_interval
+        if store is None:
+            store = False
+            if store_enabled(path):
+                import session_db # Only then: importing sqlite3 would add milliseconds to every run.
+                store = session_db.get_store(path)
+        self.store = store # A session_db.SessionStore, or False
+        self.manifest_inode = self.session = None
+        self.lock = threading.Lock()
+        self.dirty = threading.Event()
+        self.closed = False
+        self.fd = self.seq_fd = self.index_fd = None
+        self.open()
+        if fsync == 'group':
+            threading.Thread(target=self.group_commit_loop, daemon=True).start()
+
+    def open(self):
+        self.seq_fd = os.open(self.path + SEQ_SUFFIX, os.O_RDWR | os.O_CREAT, 0o644)
+        self.open_log()
+
+    def open_log(self):
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self.index_fd = os.open(self.path + INDEX_SUFFIX, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        self.inode = os.fstat(self.fd).st_ino
+
+    def is_rotated(self, path, inode):
+        try:
+            return os.stat(path).st_ino != inode
+        except FileNotFoundError:
+            return True
+
+    def reopen_if_rotated(self):
+        # An older bootstrap.sh removed the sequence sidecar for a new session; follow it.
+        if self.is_rotated(self.path + SEQ_SUFFIX, os.fstat(self.seq_fd).st_ino):
+            self.close_files()
+            self.open()
+
+    def follow_seal(self):
+        """Reopens the log if another writer sealed it since this one opened it. Called under the lock,
+        which every seal holds, so nothing is appended to a sealed segment."""
+        if self.is_rotated(self.path, self.inode):
+            os.close(self.fd)
+            os.close(self.index_fd)
+            self.open_log()
+
+    def close_files(self):
+        for fd in (self.fd, self.seq_fd, self.index_fd):
+            os.close(fd)
+
+    def next_seq(self):
+        raw = os.pread(self.seq_fd, 32, 0).strip()
+        if raw:
+            return int(raw) + 1
+        # A log that predates its sidecar: continue from its line count.
+        with open(self.path, 'rb') as f:
+            return sum(1 for _ in f) + 1
+
+    def append(self, entry):
+        """Writes one entry and returns its sequence number."""
+        return self.extend([entry])[-1]
+
+    def extend(self, entries):
+        """Writes consecutive entries with one write, under one lock; returns their sequence numbers."""
+        if not entries:
+            return []
+        with self.lock:
+            self.reopen_if_rotated()
+            fcntl.flock(self.seq_fd, fcntl.LOCK_EX)
+            try:
+                self.follow_seal()
+                first = self.next_seq()
+                offset = start = self.sync_index()
+                lines, records, rows = [], [], []
+                for seq, entry in enumerate(entries, first):
+                    entry = {**entry, "seq": seq}
+                    raw = json.dumps(entry)
+                    line = (raw + '\n').encode('utf-8')
+                    lines.append(line)
+                    records.append(index_record(offset, entry, len(line)))
+                    rows.append((entry, raw))
+                    offset += len(line)
+                data = b''.join(lines)
+                written = os.write(self.fd, data)
+                while written < len(data): # Only on a full disk or similar; the lock still keeps lines whole.
+                    written += os.write(self.fd, data[written:])
+                os.pwrite(self.seq_fd, str(first + len(lines) - 1).encode().ljust(20), 0)
+                os.write(self.index_fd, b''.join(records))
+                if self.store:
+                    session = self.current_session()
+                    for entry, raw in rows:
+                        self.store.insert(entry, raw, session)
+                if self.segment_bytes and start + len(data) >= self.segment_bytes:
+                    self.seal()
+            finally:
+                fcntl.flock(self.seq_fd, fcntl.LOCK_UN)
+            if self.fsync == 'always':
+                os.fsync(self.fd)
+            elif self.fsync == 'group':
+                self.dirty.set()
+        return list(range(first, first + len(lines)))
+
+    __call__ = append
+
+    def seal(self):
+        """Moves the log into a sealed segment, starts an empty one and has the sealed one compressed
+        in the background (called under the lock). Returns the segment's manifest entry."""
+        import log_segments
+        count = (os.fstat(self.index_fd).st_size - INDEX_HEADER.size) // INDEX_RECORD.size
+        data = os.pread(self.index_fd, count * INDEX_RECORD.size, INDEX_HEADER.size)
+        records = [unpack_record(data, i * INDEX_RECORD.size) for i in range(count)]
+        # Extremes rather than the ends: concurrent writers may append slightly out of timestamp order.
+        timestamps = [record.timestamp_ns for record in records if record.timestamp_ns is not None]
+        segment = log_segments.seal(self.path, {
+            "entries": count, "first_seq": records[0].seq if records else None, "last_seq": records[-1].seq if records else None,
+            "min_timestamp_ns": min(timestamps, default=None), "max_timestamp_ns": max(timestamps, default=None)})
+        os.close(self.fd)
+        os.close(self.index_fd)
+        self.open_log()
+        log_segments.compress_in_background(self.path)
+        return segment
+
+    def current_session(self):
+        """The number of the session being appended to (called under the lock). Read from the segment
+        manifest again only when it was replaced, which a new session always does."""
+        try:
+            inode = os.stat(manifest_path(self.path)).st_ino
+        except FileNotFoundError:
+            inode = None
+        if inode != self.manifest_inode or self.session is None:
+            import log_segments
+            self.manifest_inode, self.session = inode, log_segments.load_manifest(self.path)['session']
+        return self.session
+
+    def new_session(self):
+        """Seals the current session's log, if it has entries, and starts the next session, numbered
+        from 1 again. Returns the sealed segment's manifest entry, or None."""
+        import log_segments
+        with self.lock:
+            fcntl.flock(self.seq_fd, fcntl.LOCK_EX)
+            try:
+                self.follow_seal()
+                sealed = self.seal() if self.sync_index() else None
+                log_segments.start_session(self.path)
+                os.pwrite(self.seq_fd, b'0'.ljust(20), 0)
+            finally:
+                fcntl.flock(self.seq_fd, fcntl.LOCK_UN)
+        return sealed
+
+    def sync_index(self):
+        """Brings the index up to the end of the log (called under the lock) and returns that offset.
+        Lines written without the writer (bootstrap's first entry, or a write cut short by a crash) are
+        indexed here; an index of another log, or a torn last record, is rebuilt or trimmed."""
+        size = os.fstat(self.fd).st_size
+        index_size = os.fstat(self.index_fd).st_size
+        header = os.pread(self.index_fd, INDEX_HEADER.size, 0)
+        if len(header) < INDEX_HEADER.size or INDEX_HEADER.unpack(header) != (INDEX_MAGIC, self.inode):
+            os.ftruncate(self.index_fd, 0)
+            os.write(self.index_fd, INDEX_HEADER.pack(INDEX_MAGIC, self.inode))
+            index_size = INDEX_HEADER.size
+        torn = (index_size - INDEX_HEADER.size) % INDEX_RECORD.size
+        if torn:
+            index_size -= torn
+            os.ftruncate(self.index_fd, index_size)
+        end = 0
+        if index_size > INDEX_HEADER.size:
+            last = unpack_record(os.pread(self.index_fd, INDEX_RECORD.size, index_size - INDEX_RECORD.size))
+            end = last.offset + last.length
+        if end != size:
+            if end > size: # The log was truncated in place; index it again from the start.
+                os.ftruncate(self.index_fd, INDEX_HEADER.size)
+                end = 0
+            with open(self.path, 'rb') as f:
+                os.write(self.index_fd, b''.join(index_record(position, entry, length) for position, length, entry in scan_lines(f, end)))
+        return size
+
+    def group_commit_loop(self):
+        while not self.closed:
+            self.dirty.wait()
+            time.sleep(self.group_commit_interval) # Let more appends join this commit.
+            self.sync()
+
+    def sync(self):
+        with self.lock:
+            if self.dirty.is_set() and not self.closed:
+                self.dirty.clear()
+                os.fsync(self.fd)
+
+    def flush(self):
+        if self.fsync == 'group':
+            self.sync()
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            if not self.closed:
+                self.closed = True
+                self.dirty.set() # Wake the group-commit thread so it can exit.
+                self.close_files()
+
+class BufferedWriter:
+    """Holds entries for a writer and writes them together with extend(): once max_entries are
+    held, once the oldest has waited max_delay seconds (checked as entries arrive), and on flush()."""
+
+    def __init__(self, writer, max_entries=BUFFER_MAX_ENTRIES, max_delay=BUFFER_MAX_DELAY):
+        self.writer = writer
+        self.max_entries = max_entries
+        self.max_delay = max_delay
+        self.entries = []
+        self.since = None
+
+    def append(self, entry):
+        if not self.entries:
+            self.since = time.monotonic()
+        self.entries.append(entry)
+        if len(self.entries) >= self.max_entries or time.monotonic() - self.since >= self.max_delay:
+            self.flush()
+
+    __call__ = append
+
+    def flush(self):
+        if self.entries:
+            entries, self.entries = self.entries, []
+            self.writer.extend(entries)
+        self.writer.flush()
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+def get_writer(path=SESSION_LOG_FILE):
+    """The process-wide writer for a log, opened on first use. GATEWAY_LOG_FSYNC selects the fsync mode."""
+    with _writers_lock:
+        if path not in _writers:
+            _writers[path] = SessionLogWriter(path, fsync=os.environ.get('GATEWAY_LOG_FSYNC', 'none'))
+        return _writers[path]
+
+@atexit.register
+def _close_writers():
+    for writer in _writers.values():
+        writer.close()
+
+def parse_entries(stream, needles=()):
+    """Yields the entries of a binary session log stream. A final line without its newline is an
+    append still in flight and is not yielded; other malformed lines are skipped. Given needles
+    (bytes), lines containing none of them are skipped without being parsed."""
+    for line in stream:
+        if not line.endswith(b'\n'):
+            break
+        if not line.strip() or needles and not any(needle in line for needle in needles):
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            continue
+
+def read_stream(f, needles=(), keep=None):
+    """The entries of a binary file stream: JSONL, or binary_log's encoding, recognised by its magic.
+    needles are passed to parse_entries, keep to binary_log.decode; each may only skip entries."""
+    if f.read(len(BINARY_MAGIC)) == BINARY_MAGIC:
+        import binary_log
+        return binary_log.decode(f, keep)
+    f.seek(0)
+    return parse_entries(f, needles)
+
+def read_entries(path=SESSION_LOG_FILE, session=None, needles=(), wanted=None, keep=None):
+    """The entries of a session (default: the current one): its sealed segments, then the hot log.
+    needles and keep are passed to read_stream; sealed segments for which wanted(segment) is false
+    are skipped."""
+    import log_segments
+    try:
+        hot = open(path, 'rb') # Opened first: if it is sealed from here on, the manifest read next lists it.
+    except FileNotFoundError:
+        hot = None
+    try:
+        manifest = log_segments.read_manifest(path)
+        segments = log_segments.session_segments(manifest, session)
+        for segment in segments:
+            if wanted is None or wanted(segment):
+                with log_segments.open_segment(path, segment) as f:
+                    yield from read_stream(f, needles, keep)
+        if hot is not None and session in (None, manifest['session']):
+            if os.fstat(hot.fileno()).st_ino not in {segment.get('inode') for segment in segments}:
+                yield from read_stream(hot, needles, keep)
+    finally:
+        if hot is not None:
+            hot.close()
+
+def sessions(path=SESSION_LOG_FILE):
+    """The numbers of the sessions a log has entries for, oldest first."""
+    import log_segments
+    manifest = log_segments.read_manifest(path)
+    return sorted({segment['session'] for segment in manifest['segments']} | {manifest['session']})
+
+def sealed_entries(path, inode, offset):
+    """(session, entries after offset) of the sealed segment that was the hot log with this inode, or None."""
+    import log_segments
+    for segment in log_segments.read_manifest(path)['segments']:
+        if segment.get('inode') == inode:
+            with log_segments.open_segment(path, segment) as f:
+                f.seek(offset) # For a compressed segment this decompresses up to offset.
+                return segment['session'], list(parse_entries(f))
+    return None
+
+class SessionLogReader:
+    """Incrementally reads a session log, returning only complete entries appended since the last call."""
+
+    def __init__(self, path=SESSION_LOG_FILE):
+        self.path = path
+        self.offset = 0
+        self.inode = None
+
+    def read_new(self):
+        """Returns (entries, reset): reset is True when a new session replaced the log or it was truncated
+        since the last read. A log sealed into a segment mid-session is followed without a reset."""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return [], False
+        with f:
+            st = os.fstat(f.fileno())
+            entries = []
+            reset = self.inode is not None and (st.st_ino != self.inode or st.st_size < self.offset)
+            if reset and st.st_ino != self.inode:
+                # Sealed since the last read: finish it first, and carry on if the session goes on.
+                sealed = sealed_entries(self.path, self.inode, self.offset)
+                import log_segments
+                if sealed is not None and sealed[0] == log_segments.read_manifest(self.path)['session']:
+                    entries, reset = sealed[1], False
+            if self.inode is None or st.st_ino != self.inode or st.st_size < self.offset:
+                self.offset = 0
+            self.inode = st.st_ino
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break # Picked up on the next read, once complete.
+                self.offset += len(line)
+                if line.strip():
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+            return entries, reset
+
+class IndexedSessionLog:
+    """Random access to a session log through its index sidecar. Entries past the end of the index (a
+    log no writer has appended to yet, or an append in flight) are found by scanning only that part.
+    Positions are within the hot segment; tail() and last() continue into the session's sealed
+    segments when it holds too few entries."""
+
+    def __init__(self, path=SESSION_LOG_FILE):
+        self.path = path
+        self.log = self.index = None
+        self.inode = None
+        self.count = 0 # entries in the index
+        self.extra = [] # IndexRecords of the entries after them
+        try:
+            self.log = open(path, 'rb')
+        except FileNotFoundError:
+            return
+        st = os.fstat(self.log.fileno())
+        self.inode = st.st_ino
+        try:
+            self.index = open(path + INDEX_SUFFIX, 'rb')
+        except FileNotFoundError:
+            pass
+        indexed_end = 0
+        if self.index is not None:
+            header = self.index.read(INDEX_HEADER.size)
+            if len(header) == INDEX_HEADER.size and INDEX_HEADER.unpack(header) == (INDEX_MAGIC, st.st_ino):
+                self.count = (os.fstat(self.index.fileno()).st_size - INDEX_HEADER.size) // INDEX_RECORD.size
+            if self.count:
+                last = self.record(self.count - 1)
+                indexed_end = last.offset + last.length
+                if indexed_end > st.st_size: # Truncated in place since it was indexed.
+                    self.count = indexed_end = 0
+        self.extra = [unpack_record(index_record(offset, entry, length)) for offset, length, entry in scan_lines(self.log, indexed_end)]
+
+    def __len__(self):
+        return self.count + len(self.extra)
+
+    def position(self):
+        """Changes whenever an entry is appended (or a new hot segment started); None while it is empty."""
+        return (self.inode, len(self)) if len(self) else None
+
+    def record(self, position):
+        """The IndexRecord of the entry at position (negative counts from the end)."""
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        if position >= self.count:
+            return self.extra[position - self.count]
+        return unpack_record(os.pread(self.index.fileno(), INDEX_RECORD.size, INDEX_HEADER.size + position * INDEX_RECORD.size))
+
+    def records(self, reverse=False):
+        """(position, IndexRecord) of every entry, in log order or from the end, reading the index in chunks."""
+        if reverse:
+            for position in range(len(self) - 1, self.count - 1, -1):
+                yield position, self.extra[position - self.count]
+        starts = range(0, self.count, INDEX_READ_RECORDS)
+        for start in (reversed(starts) if reverse else starts):
+            stop = min(start + INDEX_READ_RECORDS, self.count)
+            data = os.pread(self.index.fileno(), (stop - start) * INDEX_RECORD.size, INDEX_HEADER.size + start * INDEX_RECORD.size)
+            positions = range(start, stop)
+            for position in (reversed(positions) if reverse else positions):
+                yield position, unpack_record(data, (position - start) * INDEX_RECORD.size)
+        if not reverse:
+            for position, record in enumerate(self.extra, self.count):
+                yield position, record
+
+    def read(self, record):
+        return json.loads(os.pread(self.log.fileno(), record.length, record.offset))
+
+    def entry(self, position):
+        """The entry at position (negative counts from the end)."""
+        return self.read(self.record(position))
+
+    def tail(self, n):
+        """The last n entries, in log order, read with one pread of their span."""
+        if n <= 0:
+            return []
+        if not len(self):
+            return self.earlier(n)
+        first, last = self.record(max(0, len(self) - n)), self.record(-1)
+        end = last.offset + last.length
+        data = os.pread(self.log.fileno(), end - first.offset, first.offset)
+        entries = list(parse_entries(data.splitlines(keepends=True)))
+        return self.earlier(n - len(entries)) + entries if len(entries) < n else entries
+
+    def earlier(self, n, types=None, base=None):
+        """The last n matching entries of the session's sealed segments, in log order. A sealed segment
+        is read whole, as it may be compressed; only a hot segment just short of entries needs one."""
+        import log_segments
+        found = []
+        for segment in reversed(log_segments.session_segments(log_segments.read_manifest(self.path))):
+            if n <= len(found):
+                break
+            if segment.get('inode') == self.inode:
+                continue # This is the log opened as the hot segment, sealed since.
+            with log_segments.open_segment(self.path, segment) as f:
+                matching = [entry for entry in parse_entries(f) if (types is None or entry.get('type') in types)
+                            and (base is None or command_base(entry.get('command')) == base)]
+            found = matching[-(n - len(found)):] + found
+        return found
+
+    def find_seq(self, seq):
+        """The position of the entry numbered seq, or None. Sequence numbers rise in log order; entries
+        without one (bootstrap's session_start) only ever come first."""
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            found = self.record(middle).seq
+            if found == seq:
+                return middle
+            if found is None or found < seq:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def select(self, types=None, base=None, reverse=False):
+        """The entries of the given types and/or command base, parsing no others. A base longer than the
+        index keeps is checked against each entry its truncation matched."""
+        indexed_base = None if base is None else fixed(base, 24).decode('utf-8', 'replace')
+        truncated = base is not None and len(base.encode('utf-8')) >= 24
+        for _, record in self.records(reverse):
+            if (types is None or record.type in types) and (base is None or record.command_base == indexed_base):
+                entry = self.read(record)
+                if not truncated or command_base(entry.get('command')) == base:
+                    yield entry
+
+    def last(self, n, types=None, base=None):
+        """The last n entries of the given types and/or command base, in log order."""
+        found = []
+        if n > 0:
+            for entry in self.select(types, base, reverse=True):
+                found.append(entry)
+                if len(found) == n:
+                    break
+        found.reverse()
+        return self.earlier(n - len(found), types, base) + found if len(found) < n else found
+
+    def close(self):
+        for f in (self.log, self.index):
+            if f is not None:
+                f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,196 @@
+# scripts/shell_pool.py
+# v14.2: A pool of long-lived bash coprocesses, one per shell session. Commands run inside the
+# session's shell, so 'cd', exported variables and activated venvs persist between gateway calls
+# and no bash is started per command. Each command is framed with sentinel markers that carry
+# its exit code and the shell's working directory. The pool lives in the gateway daemon: a call
+# that runs in-process (no daemon, or piped stdin) warns and runs in a fresh bash instead.
+
+import os
+import selectors
+import subprocess
+import threading
+import time
+import uuid
+
+MAX_SHELLS = 8
+IDLE_TIMEOUT = 30 * 60 # seconds before an unused session shell is retired
+READ_CHUNK_SIZE = 65536
+
+def ansi_c_quote(text):
+    """Quotes text as a bash $'...' string, which survives any byte sequence including newlines."""
+    out = []
+    for ch in text:
+        if ch == '\\':
+            out.append('\\\\')
+        elif ch == "'":
+            out.append("\\'")
+        elif ch == '\n':
+            out.append('\\n')
+        elif ord(ch) < 32 or ord(ch) == 127:
+            out.append(f'\\x{ord(ch):02x}')
+        else:
+            out.append(ch)
+    return "$'" + ''.join(out) + "'"
+
+class FrameReader:
+    """Forwards one output stream of a shell to a tee until the sentinel line, which it holds back."""
+
+    def __init__(self, marker, tee):
+        self.marker = marker
+        self.tee = tee
+        self.pending = b''
+        self.trailer = None
+
+    def emit(self, data):
+        if data:
+            self.tee.feed(data)
+
+    def feed(self, chunk):
+        """Returns True once the sentinel line has been read."""
+        self.pending += chunk
+        idx = self.pending.find(self.marker)
+        if idx < 0:
+            # Hold back a tail that could be the start of a marker split across reads.
+            keep = len(self.marker) - 1
+            self.emit(self.pending[:-keep])
+            self.pending = self.pending[-keep:]
+            return False
+        end = self.pending.find(b'\n', idx + len(self.marker))
+        self.emit(self.pending[:idx])
+        if end < 0:
+            self.pending = self.pending[idx:]
+            return False
+        self.trailer = self.pending[idx + len(self.marker):end].decode('utf-8', errors='replace')
+        self.pending = b''
+        return True
+
+    def close(self):
+        self.emit(self.pending)
+        self.pending = b''
+
+class PersistentShell:
+    """One long-lived bash. Not thread-safe on its own; ShellPool serialises access per session."""
+
+    def __init__(self, env=None, cwd=None, new_session=False):
+        self.token = f"__GATEWAY_{uuid.uuid4().hex}__"
+        self.proc = subprocess.Popen(['/bin/bash', '--noprofile', '--norc'], stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, cwd=cwd,
+                                     start_new_session=new_session)
+        self.cwd = cwd or os.getcwd()
+        self.lock = threading.Lock()
+        self.users = 0 # Calls holding or waiting for this shell; guarded by the pool lock.
+        self.last_used = time.monotonic()
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def run(self, command, stdout_tee, stderr_tee):
+        """Runs a command in this shell, feeding its output to the tees. Returns the exit code."""
+        self.last_used = time.monotonic()
+        # eval keeps a syntax error in the command from breaking the framing; stdin is the shell's
+        # control channel, so the command gets /dev/null instead.
+        script = (f"eval {ansi_c_quote(command)} < /dev/null\n"
+                  f"__gateway_rc=$?\n"
+                  f"printf '\\n{self.token} %d %s\\n' \"$__gateway_rc\" \"$PWD\"\n"
+                  f"printf '\\n{self.token}\\n' >&2\n")
+        marker = b'\n' + self.token.encode()
+        readers = {self.proc.stdout.fileno(): FrameReader(marker, stdout_tee),
+                   self.proc.stderr.fileno(): FrameReader(marker, stderr_tee)}
+        try:
+            self.proc.stdin.write(script.encode('utf-8'))
+            self.proc.stdin.flush()
+        except BrokenPipeError:
+            pass # The shell is gone; reading below reports how it exited.
+
+        with selectors.DefaultSelector() as selector:
+            for fd in readers:
+                selector.register(fd, selectors.EVENT_READ)
+            while selector.get_map():
+                for key, _ in selector.select():
+                    chunk = os.read(key.fd, READ_CHUNK_SIZE)
+                    if not chunk or readers[key.fd].feed(chunk):
+                        selector.unregister(key.fd)
+        for reader in readers.values():
+            reader.close()
+
+        trailer = readers[self.proc.stdout.fileno()].trailer
+        if trailer is None:
+            # The command ended the shell itself (e.g. 'exit 3').
+            return self.proc.wait()
+        returncode, _, self.cwd = trailer.strip().partition(' ')
+        return int(returncode)
+
+    def close(self):
+        if self.alive():
+            self.proc.stdin.close()
+            try:
+                self.proc.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+
+class ShellPool:
+    """Session name -> PersistentShell, bounded by MAX_SHELLS with least-recently-used retirement."""
+
+    def __init__(self, max_shells=MAX_SHELLS, idle_timeout=IDLE_TIMEOUT):
+        self.max_shells = max_shells
+        self.idle_timeout = idle_timeout
+        self.shells = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, session, env=None, new_session=False):
+        with self.lock:
+            now = time.monotonic()
+            for name, shell in list(self.shells.items()):
+                if shell.users == 0 and (not shell.alive() or now - shell.last_used > self.idle_timeout):
+                    shell.close()
+                    del self.shells[name]
+            shell = self.shells.get(session)
+            if shell is None or not shell.alive():
+                idle = sorted((s.last_used, name) for name, s in self.shells.items() if s.users == 0)
+                while len(self.shells) >= self.max_shells and idle:
+                    self.shells.pop(idle.pop(0)[1]).close()
+                shell = self.shells[session] = PersistentShell(env=env, new_session=new_session)
+            shell.users += 1
+            return shell
+
+    def release(self, shell):
+        with self.lock:
+            shell.users -= 1
+
+    def run(self, session, command, stdout_tee, stderr_tee, env=None, call=None):
+        """Runs a command in the session's shell, starting one with env if needed. Returns the exit code.
+        With a call (gateway.CallProcesses), the shell runs in its own process group and cancelling
+        the call kills it, command included; the next command gets a fresh shell."""
+        shell = self.acquire(session, env, new_session=call is not None)
+        try:
+            with shell.lock:
+                if call is not None:
+                    call.add(shell.proc)
+                try:
+                    return shell.run(command, stdout_tee, stderr_tee)
+                finally:
+                    if call is not None:
+                        call.discard(shell.proc)
+        finally:
+            self.release(shell)
+
+    def cwd(self, session):
+        shell = self.shells.get(session)
+        return shell.cwd if shell is not None and shell.alive() else os.getcwd()
+
+    def close(self):
+        with self.lock:
+            for shell in self.shells.values():
+                shell.close()
+            self.shells.clear()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ShellPool()
+        return _pool
@@ -0,0 +1,252 @@
+# scripts/stat_index.py
+# v14.2: Attributes file changes to the command that made them. The gateway keeps a stat index
+# (directory -> its mtime and, per file, mtime/size/inode/ctime) of the worktree in .gateway/. Around a
+# state-changing command it re-stats every indexed directory, which is cheap next to the files, and
+# rescans only candidates. A candidate is a directory whose mtime moved (something was created,
+# deleted or renamed in it), a directory holding a path the command names, or the command's
+# working directory. A command that may write anywhere, such as an interpreter or build tool,
+# makes every directory a candidate. A change is the command's only if it happened after the
+# command started by the filesystem's own clock; older changes refresh the index silently. A name
+# that is new to its directory, or now names another inode, counts as created by its ctime, which a
+# rename or cp -p sets even when the file keeps its old mtime; so does a whole directory moved in.
+# Each directory's file table is kept as JSON text and decoded only when that directory is
+# rescanned: a call that runs in-process (the daemon keeps the index in memory) pays about 3 ms on
+# a tree of 300 directories and 6000 files, half of what decoding it all took, and grows with the
+# number of directories. GATEWAY_TRACK_FILES=0 or --no-track-files turns tracking off.
+
+import fcntl
+import json
+import os
+import shlex
+
+import file_watch
+
+STATE_DIR = '.gateway'
+INDEX_FILE = os.path.join(STATE_DIR, 'stat_index.json') # {dir: [mtime_ns, JSON text of {name: [mtime_ns, size, inode, ctime_ns]}]}
+CLOCK_FILE = os.path.join(STATE_DIR, 'stat_index.clock') # touched to read the filesystem's current time
+LOCK_FILE = os.path.join(STATE_DIR, 'stat_index.lock')
+MAX_LISTED = 100 # paths per change kind kept in a log entry
+# Commands that only write the paths they name (and create or delete entries in the directories of
+# those paths). Any other command word makes every indexed directory a candidate.
+TARGETED_COMMANDS = {'touch', 'mv', 'cp', 'rm', 'mkdir', 'rmdir', 'ln', 'sed', 'tee', 'echo', 'printf', 'cat', 'chmod',
+                     'chown', 'truncate', 'patch', 'git', 'tar', 'unzip', 'gzip', 'gunzip', 'ls', 'head', 'tail', 'grep',
+                     'wc', 'sort', 'diff', 'true', 'false', ':'}
+SHELL_OPERATORS = {'|', '||', '&', '&&', ';', ';;', '(', ')', '\n'}
+
+_cached = None # (stat key of INDEX_FILE, index) so a daemon does not re-read its own writes
+
+def scan_dir(path):
+    """Returns (mtime_ns, {file name: [mtime_ns, size, inode, ctime_ns]}, [subdirectory names]), or None if path is not a directory."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        entries = os.scandir(path)
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        return None
+    files, subdirs = {}, []
+    with entries:
+        for entry in entries:
+            if file_watch.is_ignored(entry.name): # The gateway's own state, caches and the session log.
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                    continue
+                st = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            files[entry.name] = [st.st_mtime_ns, st.st_size, st.st_ino, st.st_ctime_ns]
+    return mtime, files, subdirs
+
+def encode(files):
+    return json.dumps(files, separators=(',', ':'))
+
+def walk(root, index):
+    """Adds root and every directory below it to index; returns the directories added."""
+    added, pending = [], [root]
+    while pending:
+        path = pending.pop()
+        scanned = scan_dir(path)
+        if scanned is None:
+            continue
+        mtime, files, subdirs = scanned
+        index[path] = [mtime, encode(files)]
+        added.append(path)
+        pending.extend(os.path.normpath(os.path.join(path, name)) for name in subdirs)
+    return added
+
+def load():
+    global _cached
+    try:
+        st = os.stat(INDEX_FILE)
+    except FileNotFoundError:
+        return None
+    key = (st.st_mtime_ns, st.st_size, st.st_ino)
+    if _cached is None or _cached[0] != key:
+        try:
+            with open(INDEX_FILE) as f:
+                index = json.load(f)
+        except ValueError:
+            return None
+        if any(not isinstance(files, str) for _, files in index.values()):
+            return None # Written by an older version; rebuilt.
+        _cached = (key, index)
+    return _cached[1]
+
+def save(index):
+    global _cached
+    os.makedirs(STATE_DIR, exist_ok=True)
+    import tempfile # Only when the index changed: it brings shutil, a few ms a call.
+    fd, tmp_path = tempfile.mkstemp(dir=STATE_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(json.dumps(index, separators=(',', ':'))) # dumps runs the C encoder; dump does not.
+    os.replace(tmp_path, INDEX_FILE)
+    st = os.stat(INDEX_FILE)
+    _cached = ((st.st_mtime_ns, st.st_size, st.st_ino), index)
+
+def clock():
+    """The filesystem's current time, which is coarser than time.time_ns() and may lag it."""
+    os.makedirs(STATE_DIR, exist_ok=True)
+    with open(CLOCK_FILE, 'a'):
+        os.utime(CLOCK_FILE)
+    return os.stat(CLOCK_FILE).st_mtime_ns
+
+def candidates(command, cwd):
+    """Returns (directories, subtrees) a command may write in, both relative to the worktree, or None for anywhere."""
+    try:
+        lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+        lexer.whitespace_split = True
+        words = list(lexer)
+    except ValueError:
+        return None
+    directories, subtrees = {cwd}, set()
+    command_word = True
+    for word in words:
+        if word in SHELL_OPERATORS:
+            command_word = True
+            continue
+        if set(word) <= set('<>&|0123456789'):
+            continue # A redirection operator; its target is the next word.
+        if command_word:
+            if '=' in word and not word.startswith('='):
+                continue # An assignment before the command.
+            if os.path.basename(word) not in TARGETED_COMMANDS:
+                return None
+            command_word = False
+            continue
+        if word.startswith('-'):
+            word = word.partition('=')[2]
+            if not word:
+                continue
+        path = os.path.normpath(os.path.join(cwd, word))
+        if path.startswith('..') or os.path.isabs(path):
+            continue # Outside the worktree.
+        if os.path.isdir(path):
+            subtrees.add(path)
+        parent = os.path.dirname(path) or '.'
+        if os.path.isdir(parent):
+            directories.add(parent)
+    return directories, subtrees
+
+class Tracker:
+    """The index as of a command's start; finish() rescans after it and reports what it changed."""
+
+    def __init__(self, command, cwd):
+        self.command = command
+        cwd = os.path.relpath(cwd) if cwd else '.'
+        self.cwd = cwd if not cwd.startswith('..') else None
+        os.makedirs(STATE_DIR, exist_ok=True)
+        self.lock_fd = os.open(LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self.lock_fd, fcntl.LOCK_EX)
+        try:
+            if load() is None:
+                index = {}
+                walk('.', index) # The first tracked command pays for the full walk.
+                save(index)
+        finally:
+            fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
+        self.started = clock()
+
+    def finish(self):
+        """Returns the log fields for the files the command created, modified or deleted."""
+        fcntl.flock(self.lock_fd, fcntl.LOCK_EX)
+        try:
+            index = dict(load() or {})
+            changes = self.rescan(index)
+            if index != load():
+                save(index)
+        finally:
+            fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
+            os.close(self.lock_fd)
+        if not any(changes.values()):
+            return {}
+        fields = {}
+        for kind, paths in changes.items():
+            if paths:
+                paths = sorted(paths)
+                fields[kind] = paths[:MAX_LISTED]
+                if len(paths) > MAX_LISTED:
+                    fields[f"{kind}_omitted"] = len(paths) - MAX_LISTED
+        return {"files_changed": fields}
+
+    def rescan(self, index):
+        changes = {"created": [], "modified": [], "deleted": []}
+        targets = candidates(self.command, self.cwd) if self.cwd is not None else (set(), set())
+        rescan, gone = set(), []
+        for path, (mtime, _) in index.items():
+            try:
+                st = os.stat(path)
+            except (FileNotFoundError, NotADirectoryError):
+                gone.append(path)
+                continue
+            if targets is None or st.st_mtime_ns != mtime or path in targets[0] or any(
+                    path == subtree or path.startswith(subtree + os.sep) or subtree == '.' for subtree in targets[1]):
+                rescan.add(path)
+        for path in gone:
+            _, files = index.pop(path)
+            if self.changed_here(os.path.dirname(path) or '.'):
+                changes['deleted'].extend(os.path.join(path, name) for name in json.loads(files))
+        for path in sorted(rescan):
+            if path not in index:
+                continue # Removed above as part of a deleted tree.
+            scanned = scan_dir(path)
+            if scanned is None:
+                continue
+            mtime, files, subdirs = scanned
+            old_mtime, old_files = index[path]
+            old_files = json.loads(old_files)
+            if mtime != old_mtime or files != old_files:
+                index[path] = [mtime, encode(files)]
+            for name, stat in files.items():
+                old = old_files.get(name)
+                if old is None or old[2] != stat[2]: # A new name, or a new file under an old one (mv, cp -p keep mtimes).
+                    if mtime >= self.started and stat[3] >= self.started:
+                        changes['created'].append(os.path.join(path, name))
+                elif stat[0] >= self.started and old[:2] != stat[:2]:
+                    changes['modified'].append(os.path.join(path, name))
+            if mtime >= self.started:
+                changes['deleted'].extend(os.path.join(path, name) for name in old_files if name not in files)
+            for name in subdirs:
+                subdir = os.path.normpath(os.path.join(path, name))
+                if subdir not in index:
+                    try:
+                        moved_in = mtime >= self.started and os.stat(subdir).st_ctime_ns >= self.started
+                    except FileNotFoundError:
+                        continue
+                    for added in walk(subdir, index): # A directory made or moved in: all of it is new.
+                        changes['created'].extend(os.path.join(added, file_name) for file_name, stat in json.loads(index[added][1]).items()
+                                                  if moved_in or stat[3] >= self.started)
+        return {kind: [os.path.normpath(path) for path in paths] for kind, paths in changes.items()}
+
+    def changed_here(self, path):
+        """True if the nearest existing directory at or above path was changed during the command."""
+        while True:
+            try:
+                return os.stat(path).st_mtime_ns >= self.started
+            except FileNotFoundError:
+                if path in ('', '.'):
+                    return False
+                path = os.path.dirname(path) or '.'
+
+def begin(command, cwd=None):
+    """Starts tracking the file changes of a command about to run in cwd (default: the worktree root)."""
+    return Tracker(command, cwd)
@@ -0,0 +1,16 @@
+# tests/conftest.py
+# The gateway's modules live in scripts/ and import each other by bare name, as they do when
+# run from there; config paths are relative to the repository root.
+
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'scripts'))
+
+@pytest.fixture
+def repo_root(monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)
+    return REPO_ROOT
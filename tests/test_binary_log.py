@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+import binary_log
+import consolidate_handoff
+import log_reader
+import session_log
+
+DIGEST = 'ab' * 32
+
+@pytest.fixture
+def log_path(tmp_path):
+    path = str(tmp_path / 'session.log')
+    with open(path, 'w') as f: # bootstrap's nanosecond Z timestamp, and entries the gateway writes.
+        f.write(json.dumps({"type": "session_start", "timestamp": "2026-01-02T03:04:05.123456789Z"}) + '\n')
+    writer = session_log.SessionLogWriter(path, segment_bytes=0)
+    for i in range(20):
+        writer.append({"type": "intent", "details": f"step {i} ✓", "timestamp": "2026-01-02T03:04:06.000001+00:00", "agent": None})
+        writer.append({"type": "command_result", "command": "git diff" if i % 2 else "pytest -q", "returncode": i % 3,
+                       "stdout": "", "stdout_hash": DIGEST, "stderr": "x\ud800", "timestamp": f"2026-01-02T03:05:{i:02d}+00:00",
+                       "duration_ms": 0.1 + i, "cached": True, "profile": {"hash": DIGEST, "cpu_s": 1e-7}})
+    writer.append({"type": "note", "timestamp": "2026-01-02T05:04:05+02:00", "seq": "x", "command": ["a"], "other_hash": "AB" * 32})
+    writer.close()
+    return path
+
+def test_jsonl_round_trip_is_exact(log_path, tmp_path):
+    encoded, decoded = str(tmp_path / 'session.bin'), str(tmp_path / 'decoded.log')
+    assert binary_log.encode_file(log_path, encoded) == 42
+    assert binary_log.decode_file(encoded, decoded) == 42
+    with open(log_path, 'rb') as original, open(decoded, 'rb') as f:
+        assert f.read() == original.read()
+    with open(log_path, 'rb') as original, open(encoded, 'rb') as f:
+        assert len(f.read()) < len(original.read()) * 0.6
+
+def test_handoff_round_trip_is_exact(log_path, tmp_path):
+    handoff = str(tmp_path / 'handoff.json')
+    with open(handoff, 'w') as f:
+        consolidate_handoff.write_handoff(f, {"handoff_id": "x", "state": {"git_status": ""}}, session_log.read_entries(log_path))
+    encoded, decoded = str(tmp_path / 'handoff.bin'), str(tmp_path / 'decoded.json')
+    binary_log.encode_file(handoff, encoded)
+    binary_log.decode_file(encoded, decoded)
+    with open(handoff) as original, open(decoded) as f:
+        assert f.read() == original.read()
+
+def test_readers_recognise_the_encoding(log_path, tmp_path):
+    encoded = str(tmp_path / 'session.bin')
+    binary_log.encode_file(log_path, encoded)
+    assert list(log_reader.entries(encoded)) == list(session_log.read_entries(log_path))
+    since = session_log.timestamp_ns("2026-01-02T03:05:10+00:00")
+    for filters in ({"types": {'command_result'}}, {"base": 'pytest'}, {"since": since}, {"types": {'note'}, "until": since}):
+        assert list(log_reader.entries(encoded, **filters)) == list(log_reader.entries(log_path, **filters))
+    assert log_reader.last(3, encoded, types={'intent'}) == log_reader.last(3, log_path, types={'intent'})
+
+def test_timestamp_styles():
+    for text in ("2026-01-02T03:04:05.123456789Z", "2026-01-02T03:04:05.000100+00:00", "2026-01-02T03:04:05+00:00", "2026-01-02T03:04:05"):
+        ns, style = binary_log.parse_timestamp(text)
+        assert binary_log.format_timestamp(ns, style) == text
+    assert binary_log.parse_timestamp("2026-01-02T03:04:05+02:00") is None
@@ -0,0 +1,39 @@
+import io
+import os
+
+import pytest
+
+import blob_store
+
+@pytest.fixture(autouse=True)
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+@pytest.mark.parametrize('compression', sorted(blob_store.COMPRESSIONS))
+def test_roundtrip(compression):
+    data = b'line\n' * 1000 + b'\xff\xfe'
+    digest = blob_store.save_blob(io.BytesIO(data), compression)
+    assert blob_store.find_blob(digest) == (blob_store.blob_path(digest, compression), compression)
+    assert blob_store.load_blob(digest) == data and blob_store.blob_depth(digest) == 0
+    assert digest == blob_store.save_blob(io.BytesIO(data), 'none') # The digest is of the uncompressed bytes.
+
+def test_existing_blobs_are_not_rewritten():
+    digest = blob_store.save_blob(io.BytesIO(b'same\n'), 'gzip')
+    assert blob_store.save_blob(io.BytesIO(b'same\n'), 'lzma') == digest
+    assert os.listdir(blob_store.OUTPUT_DIR) == [digest + '.gz']
+
+def test_deltas_chain_onto_their_base():
+    base = blob_store.save_blob(io.BytesIO(b'a\nb\nc\n'))
+    blob_store.save_delta('1' * 64, base, [[0, 2], ['x\n']])
+    blob_store.save_delta('2' * 64, '1' * 64, [['y\n'], [1, 3]])
+    assert blob_store.load_blob('1' * 64) == b'a\nb\nx\n'
+    assert blob_store.load_blob('2' * 64) == b'y\nb\nx\n'
+    assert [blob_store.blob_depth(d) for d in (base, '1' * 64, '2' * 64, '3' * 64)] == [0, 1, 2, None]
+
+def test_resolve_output():
+    digest = blob_store.save_blob(io.BytesIO(b'full output\n'))
+    assert blob_store.resolve_output({"stdout": "inline"}, 'stdout') == 'inline'
+    assert blob_store.resolve_output({"stdout": "preview", "stdout_hash": digest}, 'stdout') == 'full output'
+    assert blob_store.resolve_output({"stderr": "", "stderr_hash": '0' * 64}, 'stderr') == f"[output {'0' * 64} not found in .session_outputs]"
+    with pytest.raises(FileNotFoundError):
+        blob_store.load_blob('0' * 64)
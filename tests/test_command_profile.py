@@ -0,0 +1,34 @@
+import subprocess
+
+import pytest
+
+import blob_store
+import command_profile
+
+@pytest.fixture(autouse=True)
+def worktree(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open('work.py', 'w') as f:
+        f.write("def busy():\n    return sum(i * i for i in range(20000))\nbusy()\n")
+
+def run(command, persistent_shell=False):
+    profile = command_profile.begin()
+    subprocess.run(['/bin/bash', '-c', profile.wrap(command, persistent_shell)], check=True)
+    return profile.finish()
+
+def test_profiles_every_python_process():
+    fields, summary = run("python3 work.py && echo x | python3 -c 'import sys; sys.stdin.read()'")
+    assert fields['profile']['processes'] == 2
+    assert 'busy (work.py:1)' in summary
+    stats = command_profile.load(fields['profile']['hash'])
+    assert any(name == 'busy' for _, _, name in stats.stats)
+    assert blob_store.find_blob(fields['profile']['hash'])[1] == command_profile.PROFILE_COMPRESSION
+
+def test_persistent_shell_exports_stay_in_a_subshell():
+    fields, _ = run("python3 work.py", persistent_shell=True)
+    assert fields['profile']['processes'] == 1
+    wrapped = command_profile.begin().wrap("true", persistent_shell=True)
+    assert wrapped.startswith('(') and wrapped.endswith('\n)')
+
+def test_nothing_to_profile():
+    assert run("echo hi") == ({}, None)
@@ -0,0 +1,55 @@
+import base64
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import session_log
+
+ENTRIES = [{"type": "intent", "details": "look", "seq": 1},
+           {"type": "command_result", "command": "ls", "returncode": 0, "stdout": "aé", "seq": 2}]
+
+@pytest.fixture(autouse=True)
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open('session.log', 'w') as f:
+        for entry in ENTRIES:
+            f.write(json.dumps(entry) + '\n')
+
+def consolidate(*args, **kwargs):
+    script = os.path.join(os.path.dirname(session_log.__file__), 'consolidate_handoff.py')
+    proc = subprocess.run([sys.executable, script, *args], capture_output=True, check=True, **kwargs)
+    assert b'Handoff complete' in proc.stdout
+    handoff_file, = os.listdir('context/handoffs')
+    with open(os.path.join('context/handoffs', handoff_file)) as f:
+        return json.load(f)
+
+def test_session_log_by_path():
+    handoff = consolidate('--session-log', 'session.log')
+    assert handoff['full_session_log'] == ENTRIES
+    assert list(handoff)[-1] == 'full_session_log' and handoff['protocol_version'] == '14.2'
+
+def test_session_log_from_stdin():
+    with open('session.log', 'rb') as f:
+        assert consolidate('--session-log', '-', stdin=f)['full_session_log'] == ENTRIES
+
+def test_session_log_from_an_inherited_descriptor():
+    read_end, write_end = os.pipe()
+    with open('session.log', 'rb') as f:
+        os.write(write_end, f.read())
+    os.close(write_end)
+    try:
+        handoff = consolidate('--session-fd', str(read_end), pass_fds=(read_end,))
+    finally:
+        os.close(read_end)
+    assert handoff['full_session_log'] == ENTRIES
+
+def test_session_log_as_base64():
+    with open('session.log', 'rb') as f:
+        data = base64.b64encode(f.read()).decode('ascii')
+    assert consolidate('--session-data', data)['full_session_log'] == ENTRIES
+
+def test_without_a_session_log():
+    assert consolidate()['full_session_log'] == []
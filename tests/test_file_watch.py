@@ -0,0 +1,51 @@
+import os
+import threading
+
+import pytest
+
+import file_watch
+
+@pytest.fixture(autouse=True)
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('src')
+
+def write(path, text='x'):
+    with open(path, 'w') as f:
+        f.write(text)
+
+def later(function, *args):
+    threading.Timer(0.05, function, args).start()
+
+def test_a_change_is_reported():
+    write('src/a.py')
+    with file_watch.FileWatcher(['src']) as watcher:
+        later(write, 'src/a.py', 'y')
+        assert watcher.wait(timeout=5) == {'src/a.py'}
+        assert watcher.wait(timeout=0.2) == set()
+
+def test_a_watched_file_ignores_its_neighbours():
+    write('a.txt')
+    write('b.txt')
+    with file_watch.FileWatcher(['a.txt']) as watcher:
+        write('b.txt', 'y')
+        later(os.replace, 'b.txt', 'a.txt') # Saved by rename, as editors do.
+        assert watcher.wait(timeout=5) == {'./a.txt'}
+
+def test_ignored_names_are_not_reported():
+    with file_watch.FileWatcher(['src']) as watcher:
+        for name in ('.a.py.swp', 'a.py~', 'session.log', '.#a.py'):
+            write(os.path.join('src', name))
+        os.makedirs('src/__pycache__')
+        assert watcher.wait(timeout=0.3) == set()
+
+def test_new_directories_are_watched():
+    with file_watch.FileWatcher(['src']) as watcher:
+        os.makedirs('src/pkg')
+        assert watcher.wait(timeout=5) == {'src/pkg'}
+        later(write, 'src/pkg/b.py')
+        assert watcher.wait(timeout=5) == {'src/pkg/b.py'}
+
+def test_missing_paths_cannot_be_watched():
+    with pytest.raises(FileNotFoundError, match='cannot watch missing'):
+        file_watch.FileWatcher(['src', 'missing'])
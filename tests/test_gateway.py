@@ -0,0 +1,180 @@
+import io
+import json
+import os
+import subprocess
+import threading
+import time
+
+import pytest
+
+import blob_store
+import file_watch
+import gateway
+import read_only
+import session_log
+import stat_index
+
+@pytest.fixture(autouse=True)
+def workspace(tmp_path, monkeypatch, repo_root):
+    os.symlink(os.path.join(repo_root, 'config'), tmp_path / 'config')
+    os.symlink(os.path.join(repo_root, 'scripts'), tmp_path / 'scripts')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(session_log, '_writers', {})
+    monkeypatch.setattr(read_only, '_policy', None)
+    monkeypatch.setattr(stat_index, '_cached', None)
+    yield tmp_path
+    for writer in session_log._writers.values():
+        writer.close()
+
+def execute(*argv):
+    out, err = io.BytesIO(), io.BytesIO()
+    returncode = gateway.execute(gateway.parse_args(list(argv)), out, err, stdin=subprocess.DEVNULL)
+    return returncode, out.getvalue(), err.getvalue()
+
+def logged(kind='command_result'):
+    return [entry for entry in session_log.read_entries(session_log.SESSION_LOG_FILE) if entry['type'] == kind]
+
+def write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+class TimedSink:
+    """A binary stream that records when each chunk arrived."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, chunk):
+        self.chunks.append((time.monotonic(), bytes(chunk)))
+
+    def flush(self):
+        pass
+
+def test_output_streams_while_the_command_runs():
+    out = TimedSink()
+    options = gateway.RunOptions(stdin=subprocess.DEVNULL)
+    returncode = gateway.run_step('stream', "echo first; sleep 0.5; echo second", out, io.BytesIO(), options)
+    finished = time.monotonic()
+    assert returncode == 0
+    assert b''.join(chunk for _, chunk in out.chunks) == b'first\nsecond\n'
+    assert out.chunks[0][1] == b'first\n' and finished - out.chunks[0][0] >= 0.4
+    assert logged()[0]['stdout'] == 'first\nsecond'
+
+def test_intent_and_result_are_logged():
+    assert execute('--intent', 'look', '--command', 'echo hi; echo oops >&2; exit 3') == (3, b'hi\n', b'oops\n')
+    intent, = logged('intent')
+    result, = logged()
+    assert intent['details'] == 'look' and intent['seq'] + 1 == result['seq']
+    assert (result['command'], result['returncode'], result['stdout'], result['stderr']) == ('echo hi; echo oops >&2; exit 3', 3, 'hi', 'oops')
+    assert (result['stdout_bytes'], result['stderr_bytes']) == (3, 5)
+
+def write_plan(steps):
+    with open('plan.jsonl', 'w') as f:
+        for command in steps:
+            f.write(json.dumps({"intent": f"run {command}", "command": command}) + '\n')
+    return 'plan.jsonl'
+
+def test_batch_stops_at_the_first_failure():
+    returncode, out, err = execute('--batch', write_plan(['echo one', 'exit 4', 'echo three']))
+    assert (returncode, out) == (4, b'one\n')
+    assert b'batch stopped at step 2/3 (exit code 4)' in err
+    assert [entry['command'] for entry in logged()] == ['echo one', 'exit 4']
+    assert len(logged('intent')) == 2
+
+def test_batch_keep_going_runs_every_step_and_returns_the_first_failure():
+    returncode, out, err = execute('--batch', write_plan(['exit 4', 'echo two', 'exit 5']), '--keep-going')
+    assert (returncode, out, err) == (4, b'two\n', b'')
+    assert [entry['returncode'] for entry in logged()] == [4, 0, 5]
+    seqs = [entry['seq'] for entry in session_log.read_entries(session_log.SESSION_LOG_FILE)]
+    assert seqs == list(range(1, 7))
+
+def test_bad_batch_plan():
+    write('plan.jsonl', '{"intent": "no command"}\n')
+    returncode, _, err = execute('--batch', 'plan.jsonl')
+    assert returncode == 2 and b'cannot load batch plan' in err
+
+def test_fan_out_keeps_request_order():
+    out, err = io.BytesIO(), io.BytesIO()
+    commands = ["sleep 0.3; echo slow", "echo fast", "echo err >&2; exit 2"]
+    returncode = gateway.run_fan_out('fan out', commands, out, err, gateway.RunOptions(stdin=subprocess.DEVNULL))
+    assert (returncode, out.getvalue(), err.getvalue()) == (2, b'slow\nfast\n', b'err\n')
+    assert [entry['command'] for entry in logged()] == commands
+    assert len(logged('intent')) == 1
+
+def test_fan_out_refuses_state_changing_commands(capsys):
+    with pytest.raises(SystemExit):
+        gateway.parse_args(['--intent', 'x', '--command', 'ls', '--command', 'rm -rf x'])
+    assert 'not read-only: rm -rf x' in capsys.readouterr().err
+
+def test_limit_prefix():
+    assert gateway.RunOptions().limit_prefix() == ''
+    assert gateway.RunOptions(cpu_limit=2).limit_prefix() == "ulimit -t 2 || exit 126\n"
+    assert gateway.RunOptions(cpu_limit=2, memory_limit=512).limit_prefix() == "ulimit -t 2 -v 524288 || exit 126\n"
+
+def test_limits_apply_to_the_command_and_are_logged():
+    returncode, out, _ = execute('--intent', 'limits', '--cpu-limit', '7', '--memory-limit', '2048', '--command', 'ulimit -t; ulimit -v')
+    assert (returncode, out) == (0, b'7\n2097152\n')
+    result, = logged()
+    assert (result['cpu_limit_s'], result['memory_limit_mb']) == (7, 2048)
+
+def test_resource_usage_is_the_commands_own():
+    execute('--intent', 'burn', '--command', 'python3 -c "sum(range(3 * 10 ** 7))"')
+    execute('--intent', 'idle', '--command', 'sleep 0.2')
+    burn, idle = logged()
+    assert burn['cpu_user_s'] + burn['cpu_sys_s'] > 0.1
+    assert idle['cpu_user_s'] + idle['cpu_sys_s'] < 0.1 and idle['duration_ms'] >= 200
+    assert burn['max_rss_kb'] > 0
+
+def test_direct_argv():
+    env = {'PATH': os.environ['PATH']}
+    executable, argv = gateway.direct_argv("ls -la 'a b'", env)
+    assert os.path.basename(executable) == 'ls' and argv == ['ls', '-la', 'a b']
+    for command in ("echo hi", "cd /tmp", "ls *.py", "ls | wc -l", "FOO=1 ls", "ls $HOME", "no-such-command-here", "ls 'open"):
+        assert gateway.direct_argv(command, env) is None, command
+
+def test_direct_and_bash_paths_agree():
+    write('a b.txt', 'x\n')
+    direct = execute('--intent', 'direct', '--command', "cat 'a b.txt' missing.txt")
+    bash = execute('--intent', 'bash', '--command', "cat 'a b.txt' missing.txt; exit $?")
+    assert direct == bash and direct[0] == 1 and direct[1] == b'x\n'
+
+def test_large_output_spills_to_the_blob_store():
+    returncode, out, _ = execute('--intent', 'big', '--inline-limit', '1', '--command', "python3 -c \"print('x' * 5000)\"")
+    assert returncode == 0 and out == b'x' * 5000 + b'\n'
+    result, = logged()
+    assert len(result['stdout']) < 1200 and 'bytes omitted' in result['stdout']
+    assert blob_store.load_blob(result['stdout_hash']) == out
+    assert blob_store.resolve_output(result, 'stdout') == 'x' * 5000
+
+def test_non_utf8_output_is_kept_byte_exact():
+    returncode, out, _ = execute('--intent', 'bytes', '--command', r"printf 'ok\xff\xfe'")
+    assert (returncode, out) == (0, b'ok\xff\xfe')
+    result, = logged()
+    assert blob_store.load_blob(result['stdout_hash']) == b'ok\xff\xfe'
+    assert result['stdout'].startswith('ok')
+
+def test_handoff_command_gets_the_log_by_path():
+    execute('--intent', 'work', '--command', 'echo done')
+    returncode, out, _ = execute('--intent', 'hand off', '--command', 'python3 scripts/consolidate_handoff.py')
+    assert returncode == 0 and b'Handoff complete' in out
+    handoff_file, = os.listdir('context/handoffs')
+    with open(os.path.join('context/handoffs', handoff_file)) as f:
+        handoff = json.load(f)
+    assert [entry['type'] for entry in handoff['full_session_log']] == ['intent', 'command_result', 'intent']
+    assert logged()[-1]['command'] == 'python3 scripts/consolidate_handoff.py' # Logged as typed, without --session-log.
+
+def test_watch_reruns_on_change(monkeypatch):
+    write('watched.txt', '1')
+    wait = file_watch.FileWatcher.wait
+    calls = []
+    def wait_once(self, timeout=None):
+        calls.append(timeout)
+        if len(calls) > 1:
+            raise KeyboardInterrupt
+        threading.Timer(0.1, write, ('watched.txt', '2')).start()
+        return wait(self, timeout=5)
+    monkeypatch.setattr(file_watch.FileWatcher, 'wait', wait_once)
+    returncode, out, err = execute('--intent', 'watch', '--watch', 'watched.txt', '--command', 'cat watched.txt')
+    assert (returncode, out) == (0, b'12')
+    assert b'watched.txt; re-running.' in err
+    assert [entry['stdout'] for entry in logged()] == ['1', '2']
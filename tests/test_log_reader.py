@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+import log_reader
+import log_segments
+import session_log
+
+def timestamp(i):
+    return f"2026-01-02T03:{i // 60:02d}:{i % 60:02d}+00:00"
+
+@pytest.fixture
+def log_path(tmp_path, monkeypatch):
+    monkeypatch.setenv('GATEWAY_LOG_COMPRESSION', 'gzip')
+    path = str(tmp_path / 'session.log')
+    writer = session_log.SessionLogWriter(path, segment_bytes=1000)
+    for i in range(60):
+        writer.append({"type": "intent", "details": f"step {i}", "timestamp": timestamp(i)})
+        writer.append({"type": "command_result", "command": "git diff" if i % 3 else "pytest -q", "returncode": 0,
+                       "stdout": '{"type": "intent"}', "timestamp": timestamp(i)})
+    writer.close()
+    return path
+
+def test_filters_across_segments(log_path):
+    everything = list(session_log.read_entries(log_path))
+    assert len(everything) == 120 and len(log_segments.read_manifest(log_path)['segments']) > 3
+    assert list(log_reader.entries(log_path, types={'intent'})) == [e for e in everything if e['type'] == 'intent']
+    assert [e['seq'] for e in log_reader.entries(log_path, base='pytest')] == list(range(2, 121, 6))
+    since, until = session_log.timestamp_ns(timestamp(10)), session_log.timestamp_ns(timestamp(13))
+    assert [e['details'] for e in log_reader.entries(log_path, types={'intent'}, since=since, until=until)] == ['step 10', 'step 11', 'step 12']
+
+def test_time_range_skips_sealed_segments(log_path, monkeypatch):
+    opened = []
+    open_segment = log_segments.open_segment
+    monkeypatch.setattr(log_segments, 'open_segment', lambda path, segment: opened.append(segment) or open_segment(path, segment))
+    since = session_log.timestamp_ns(timestamp(58))
+    assert [e['details'] for e in log_reader.entries(log_path, types={'intent'}, since=since)] == ['step 58', 'step 59']
+    assert len(opened) <= 1
+
+def test_last(log_path):
+    everything = list(session_log.read_entries(log_path))
+    assert log_reader.last(5, log_path) == everything[-5:]
+    assert log_reader.last(3, log_path, types={'command_result'}, base='pytest') == [e for e in everything if e.get('command') == 'pytest -q'][-3:]
+    since = session_log.timestamp_ns(timestamp(20))
+    assert log_reader.last(2, log_path, types={'intent'}, until=since) == [everything[36], everything[38]]
+
+def test_handoff(tmp_path):
+    path = str(tmp_path / 'handoff.json')
+    with open(path, 'w') as f:
+        json.dump({"full_session_log": [{"type": "intent", "details": "a"}, {"type": "command_result", "command": "ls"}]}, f)
+    assert list(log_reader.entries(path, types={'command_result'})) == [{"type": "command_result", "command": "ls"}]
+    assert log_reader.last(1, path) == [{"type": "command_result", "command": "ls"}]
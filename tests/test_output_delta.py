@@ -0,0 +1,99 @@
+import hashlib
+import json
+import random
+
+import pytest
+
+import blob_store
+import gateway
+import output_delta
+
+COMMAND = 'cat data.txt'
+
+@pytest.fixture(autouse=True)
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+def record(data, command=COMMAND):
+    """Stores an output the way gateway.output_fields does; returns (its log fields, its digest)."""
+    tee = gateway.OutputTee(None)
+    tee.feed(data)
+    fields = output_delta.store(command, 'stdout', tee, 4096)
+    if fields is None:
+        digest = blob_store.save_blob(tee.spool, 'gzip')
+        output_delta.remember(command, 'stdout', digest)
+        return None, digest
+    return fields, fields['stdout_hash']
+
+def lines(count, seed=0):
+    rng = random.Random(seed)
+    return [b'row %d %s\n' % (i, b'x' * rng.randrange(1, 60)) for i in range(count)]
+
+@pytest.mark.parametrize("base, data", [
+    (b'a\nb\nc\n', b'a\nb\nc\n'),
+    (b'a\nb\nc\n', b'a\nB\nc\n'),
+    (b'a\nb\nc\n', b'a\nb\nc'),
+    (b'a\nb\nc', b'a\nb\nc\nd'),
+    (b'', b'x\ny\n'),
+    (b'x\ny\n', b''),
+    (b'a\r\nb\r\n', b'a\r\nb\r\nc\r\n'),
+    (b'same\nsame\nsame\n', b'same\nother\nsame\nsame\nsame\n'),
+    (b'caf\xc3\xa9\n\xff\xfe raw\n', b'caf\xc3\xa9\n\xff\xfe raw\n\x80\x81 more\xc3\n'),
+    (b'\xff\n' * 5, b'\xfe\n' + b'\xff\n' * 5),
+])
+def test_line_delta_round_trips(base, data):
+    ops, removed, added = output_delta.line_delta(base, data)
+    # Through JSON, as the delta is stored; surrogateescape must keep raw bytes intact.
+    ops = json.loads(json.dumps(ops))
+    assert blob_store.apply_delta(base, ops) == data
+    assert b''.join(added) in data
+
+def test_line_delta_finds_moved_blocks_and_deletions():
+    base = lines(1000)
+    data = base[:10] + base[500:] + base[10:400]
+    ops, removed, added = output_delta.line_delta(b''.join(base), b''.join(data))
+    assert blob_store.apply_delta(b''.join(base), ops) == b''.join(data)
+    assert removed == base[400:500] and added == []
+    assert len(ops) == 3
+
+def test_line_delta_gives_up_past_its_budget():
+    base = b''.join(lines(100))
+    assert output_delta.line_delta(base, base + b'y' * 1000 + b'\n', budget=500) is None
+    assert output_delta.line_delta(base, b'new\n' * 200, budget=500) is None
+    assert output_delta.line_delta(base, base + b'tail\n', budget=500) is not None
+
+def test_store_chains_deltas_and_loads_each_version():
+    versions = [b''.join(lines(200, seed=1))]
+    for step in range(5):
+        current = versions[-1].splitlines(keepends=True)
+        current[step * 7] = b'edited %d \xff\n' % step
+        versions.append(b''.join(current + [b'appended %d\n' % step]))
+    digests = [record(data)[1] for data in versions]
+    for depth, (digest, data) in enumerate(zip(digests, versions)):
+        assert blob_store.blob_depth(digest) == depth
+        assert blob_store.load_blob(digest) == data
+        assert digest == hashlib.sha256(data).hexdigest()
+
+def test_store_describes_the_change():
+    base = b''.join(lines(100))
+    record(base)
+    fields, _ = record(base.replace(b'row 5 ', b'row five ', 1))
+    assert fields['stdout'].startswith("[previous run's output with 1 line(s) removed and 1 added")
+    assert '+ row five ' in fields['stdout']
+    fields, _ = record(base.replace(b'row 5 ', b'row five ', 1))
+    assert fields['stdout'].startswith("[unchanged from the previous run")
+
+def test_chain_is_cut_at_max_depth(monkeypatch):
+    monkeypatch.setattr(output_delta, 'MAX_DEPTH', 2)
+    data = lines(100)
+    depths = []
+    for step in range(4):
+        data.append(b'step %d\n' % step)
+        depths.append(blob_store.blob_depth(record(b''.join(data))[1]))
+    assert depths == [0, 1, 2, 0]
+
+def test_unrelated_output_is_stored_whole():
+    record(b''.join(lines(100, seed=1)))
+    fields, digest = record(b''.join(lines(100, seed=2)).replace(b'row', b'col'))
+    assert fields is None
+    assert blob_store.blob_depth(digest) == 0
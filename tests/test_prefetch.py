@@ -0,0 +1,54 @@
+import os
+import time
+
+import pytest
+
+import prefetch
+import read_only
+import result_cache
+
+def sessions():
+    step = [("Fix the parser in src/parse.py", "sed -i s/a/b/ src/parse.py"), (None, "cat src/parse.py")]
+    other = [("Fix the lexer in src/lex.py", "sed -i s/x/y/ src/lex.py"), (None, "cat src/lex.py")]
+    return [step, other, [(None, "git status"), (None, "git diff")] * 2]
+
+def test_template_round_trip():
+    previous = ['sed', '-i', 's/a/b/', 'src/parse.py']
+    words = prefetch.template(['cat', 'src/parse.py', 'README.md'], previous, ['README.md'])
+    assert words == ['cat', '{prev:3}', '{intent:0}']
+    assert prefetch.instantiate(words, ['sed', '-n', '1p', 'other.py'], []) is None
+    assert prefetch.instantiate(words, ['sed', '-n', '1p', 'other.py'], ['notes.txt']) == "cat other.py notes.txt"
+
+def test_predicts_from_shared_arguments():
+    model = prefetch.NextCommandModel().learn(sessions())
+    history = [("Edit src/new.py", ['sed', '-i', 's/q/r/', 'src/new.py'])]
+    assert model.predict(history) == ["cat src/new.py"]
+    assert model.predict([(None, ['git', 'status'])]) == ["git diff"]
+    assert model.predict([(None, ['ls'])]) == []
+
+def test_pipelines_are_not_learned():
+    model = prefetch.NextCommandModel().learn([[(None, "ls"), (None, "ls | wc -l")]] * 3)
+    assert model.predict([(None, ['ls'])]) == []
+
+def test_evaluate_counts_predicted_steps():
+    assert prefetch.evaluate(sessions(), [(None, "git status"), (None, "git diff"), (None, "ls")]) == (1, 2)
+
+@pytest.fixture
+def worktree(repo_root, tmp_path, monkeypatch):
+    monkeypatch.setattr(read_only, '_policy', None)
+    read_only.load_policy() # From the repository's config, before leaving it.
+    monkeypatch.chdir(tmp_path)
+    with open('a.txt', 'w') as f:
+        f.write('hello\n')
+
+def test_prefetch_warms_the_cache(worktree):
+    prefetcher = prefetch.Prefetcher(model=prefetch.NextCommandModel().learn(sessions()))
+    prefetcher.after_step("Edit a.txt", "sed -i s/x/y/ a.txt", dict(os.environ))
+    key = result_cache.cache_key("cat a.txt")
+    deadline = time.monotonic() + 10
+    while result_cache.get(key) is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert result_cache.get(key) == (0, b'hello\n', b'')
+    assert prefetcher.note_hit(key, 0.1)
+    assert not prefetcher.note_hit(key, 0.1) # Only the first hit is the prefetch's.
+    assert prefetch.load_stats()['hits'] == 1
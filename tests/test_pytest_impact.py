@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import pytest_impact
+
+@pytest.mark.parametrize("command, expected", [
+    ("pytest -q tests", ['pytest', '-q', 'tests']),
+    ("python3 -m pytest -x", ['python3', '-m', 'pytest', '-x']),
+    (".venv/bin/pytest", ['.venv/bin/pytest']),
+    ("pytest tests | tail -5", None),
+    ("cd tests && pytest", None),
+    ("cat pytest.ini", None),
+    ("python3 -m pip install pytest", None),
+])
+def test_pytest_words(command, expected):
+    assert pytest_impact.pytest_words(command) == expected
+
+def test_split_arguments_keeps_option_values_out_of_operands():
+    words = ['python3', '-m', 'pytest', '-k', 'slow', '-p', 'no:cacheprovider', '--tb=short', 'tests/unit', '-x']
+    options, operands = pytest_impact.split_arguments(words)
+    assert operands == ['tests/unit']
+    assert pytest_impact.is_narrowed(options)
+    assert not pytest_impact.is_narrowed(['python3', '-m', 'pytest', '-x'])
+
+def test_imported_modules(tmp_path):
+    (tmp_path / 'pkg' / 'sub').mkdir(parents=True)
+    (tmp_path / 'pkg' / 'sub' / 'mod.py').write_text(
+        "import os, json as j\nfrom . import sibling\nfrom ..core import thing\nfrom pkg.util import helper\n")
+    modules = pytest_impact.imported_modules(str(tmp_path), os.path.join('pkg', 'sub', 'mod.py'))
+    assert {'os', 'json', 'pkg.sub.sibling', 'pkg.core', 'pkg.core.thing', 'pkg.util', 'pkg.util.helper'} <= set(modules)
+
+def test_impacted_test_files_follows_imports_transitively():
+    graph = {
+        'src/core.py': [],
+        'src/api.py': ['core'], # src/ is on sys.path in this suite.
+        'src/other.py': [],
+        'tests/test_api.py': ['api'],
+        'tests/test_core.py': ['src.core'],
+        'tests/test_other.py': ['src.other'],
+    }
+    test_files = {'tests/test_api.py', 'tests/test_core.py', 'tests/test_other.py'}
+    assert pytest_impact.impacted_test_files({'src/core.py'}, graph, test_files) == {'tests/test_api.py', 'tests/test_core.py'}
+    assert pytest_impact.impacted_test_files({'tests/test_other.py'}, graph, test_files) == {'tests/test_other.py'}
+    assert pytest_impact.impacted_test_files({'README.md'}, graph, test_files) == set()
+
+def test_conftest_and_config_changes_select_what_they_govern():
+    graph = {'tests/unit/conftest.py': ['helpers'], 'tests/helpers.py': [], 'tests/unit/test_a.py': [], 'tests/test_b.py': []}
+    test_files = {'tests/unit/test_a.py', 'tests/test_b.py'}
+    assert pytest_impact.impacted_test_files({'tests/helpers.py'}, graph, test_files) == {'tests/unit/test_a.py'}
+    assert pytest_impact.impacted_test_files({'conftest.py'}, graph, test_files) is None
+    assert pytest_impact.impacted_test_files({'pyproject.toml'}, graph, test_files) is None
+
+def run_impacted(cwd):
+    """Runs pytest -v --impacted the way the gateway does; returns (ran, verbose output)."""
+    run = pytest_impact.PytestRun([sys.executable, '-m', 'pytest', '-v', '-p', 'no:cacheprovider'], str(cwd), True)
+    if run.nothing_to_run():
+        return False, ''
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    proc = subprocess.run(['bash', '-c', run.command()], cwd=cwd, env=env, capture_output=True, text=True)
+    run.finish(proc.returncode)
+    return True, proc.stdout
+
+def test_failed_tests_run_first_then_their_whole_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'pytest.ini').write_text('[pytest]\n')
+    (tmp_path / 'data.txt').write_text('ok')
+    (tmp_path / 'impact_helper.py').write_text('VALUE = 1\n')
+    (tmp_path / 'test_a.py').write_text(
+        "import impact_helper\n\n"
+        "def test_1():\n    assert open('data.txt').read() == 'ok'\n\n"
+        "def test_2():\n    assert impact_helper.VALUE == 1\n")
+    def edit(path, text, mtime):
+        path.write_text(text)
+        os.utime(path, (mtime, mtime))
+    assert run_impacted(tmp_path)[0] # No green run yet: everything runs, and it is green.
+    edit(tmp_path / 'impact_helper.py', 'VALUE = 2\n', 1_000_000)
+    assert 'test_2 FAILED' in run_impacted(tmp_path)[1]
+    # test_2 is fixed, but test_1 now fails through a data file the import graph cannot see.
+    edit(tmp_path / 'impact_helper.py', 'VALUE = 1\n', 2_000_000)
+    (tmp_path / 'data.txt').write_text('broken')
+    ran, output = run_impacted(tmp_path)
+    assert ran and output.index('test_2 PASSED') < output.index('test_1 FAILED')
+    ran, output = run_impacted(tmp_path) # Not green since: test_a.py is still selected.
+    assert ran and 'test_1 FAILED' in output
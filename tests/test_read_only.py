@@ -0,0 +1,58 @@
+import pytest
+
+import read_only
+
+@pytest.fixture(autouse=True)
+def policy(repo_root, monkeypatch):
+    monkeypatch.setattr(read_only, '_policy', None)
+
+@pytest.mark.parametrize("command", [
+    "git status",
+    "git --no-pager log --oneline -5",
+    "git diff --stat HEAD~1",
+    "git show HEAD:scripts/run.py",
+    "git ls-files | grep .py | wc -l",
+    "git grep -n foo",
+    "find . -name '*.py' -type f",
+    "find scripts -maxdepth 1 -newer session.log",
+    "grep -rn 'def main' scripts",
+])
+def test_read_only(command):
+    assert read_only.is_read_only(command)
+
+@pytest.mark.parametrize("command", [
+    "git commit -m x",
+    "git push origin main",
+    "git stash",
+    "git checkout -b new",
+    "git diff --output=patch.txt",
+    "git diff --output patch.txt",
+    "git log -o out.txt",
+    "git grep -O foo",
+    "git grep -Ovim foo",
+    "git grep -nO foo",
+    "git grep --open-files-in-pager=vim foo",
+    "git -C scripts status", # The value of -C is taken for the subcommand; refusing is the safe side.
+    "find . -delete",
+    "find . -name '*.pyc' -execdir rm {} +",
+    "find . -ok rm {} +",
+    "find . -fprint listing.txt",
+    "find . -fls listing.txt",
+    r"find . -exec rm {} \;",
+])
+def test_state_changing(command):
+    assert not read_only.is_read_only(command)
+
+@pytest.mark.parametrize("command", [
+    "git log > log.txt",
+    "cat a; rm a",
+    "ls && rm a",
+    "cat $(echo a)",
+    "cat `echo a`",
+    "ls\nrm a",
+    "cat 'unterminated",
+    "python3 -c 'print(1)'",
+    "ls | xargs rm",
+])
+def test_shell_syntax_and_unknown_commands(command):
+    assert not read_only.is_read_only(command)
@@ -0,0 +1,62 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import replay_session
+
+SCRIPT = os.path.join(os.path.dirname(replay_session.__file__), 'replay_session.py')
+
+def step(command, read_only=True):
+    return {"command": command, "read_only": read_only}
+
+def test_read_only_runs_share_a_wave_and_other_steps_run_alone():
+    steps = [step('ls'), step('cat a'), step('touch b', False), step('touch c', False), step('ls')]
+    assert [[s['command'] for s in wave] for wave in replay_session.plan_waves(steps)] == [['ls', 'cat a'], ['touch b'], ['touch c'], ['ls']]
+    assert replay_session.plan_waves([]) == []
+
+def test_recorded_limits():
+    assert replay_session.recorded_limits({}) == ''
+    assert replay_session.recorded_limits({"cpu_limit_s": 5}) == "ulimit -t 5 || exit 126\n"
+    assert replay_session.recorded_limits({"cpu_limit_s": 5, "memory_limit_mb": 64}) == "ulimit -t 5 -v 65536 || exit 126\n"
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch, repo_root):
+    os.symlink(os.path.join(repo_root, 'config'), tmp_path / 'config') # read_only's policy.
+    monkeypatch.chdir(tmp_path)
+    for command in ("git init -q", "git config user.email t@example.com", "git config user.name t"):
+        subprocess.run(command, shell=True, check=True)
+    with open('a.txt', 'w') as f:
+        f.write('one\n')
+    subprocess.run("git add a.txt && git commit -qm a", shell=True, check=True)
+    return tmp_path
+
+def result(command, stdout, returncode=0, **fields):
+    return {"type": "command_result", "command": command, "returncode": returncode, "stdout": stdout, "stderr": "", "duration_ms": 10000, **fields}
+
+def replay(entries, *args):
+    with open('handoff.json', 'w') as f:
+        json.dump({"full_session_log": [{"type": "intent", "details": "replay me"}, *entries]}, f)
+    proc = subprocess.run([sys.executable, SCRIPT, 'handoff.json', '--rev', 'HEAD', '--json', 'report.json', *args], capture_output=True, text=True)
+    with open('report.json') as f:
+        return proc.returncode, proc.stdout, json.load(f)
+
+def test_replay_reports_each_step(repo):
+    entries = [result("cat a.txt", "one"), result("git push origin main", ""),
+               result("echo two >> a.txt", ""), result("cat a.txt", "one"),
+               result("ulimit -t", "3", cpu_limit_s=3)]
+    returncode, out, report = replay(entries)
+    assert returncode == 1
+    assert '[  2] skipped git push origin main' in out
+    assert [(s['step'], s['differences']) for s in report['steps']] == [(1, []), (3, []), (4, ['stdout differs']), (5, [])]
+    assert [s['read_only'] for s in report['steps']] == [True, False, True, False]
+    with open('a.txt') as f:
+        assert f.read() == 'one\n' # Replayed in a scratch worktree, not here.
+    assert subprocess.run("git worktree list", shell=True, capture_output=True, text=True).stdout.count('\n') == 1
+
+def test_an_unchanged_session_replays_cleanly(repo):
+    returncode, out, report = replay([result("cat a.txt", "one"), result("exit 3", "", 3)])
+    assert returncode == 0 and '2 step(s) replayed: 2 same, 0 changed, 0 slower.' in out
+    assert report['steps'][1]['replayed']['returncode'] == 3
@@ -0,0 +1,53 @@
+import os
+import subprocess
+
+import pytest
+
+import result_cache
+
+@pytest.fixture(autouse=True)
+def worktree(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for command in ("git init -q", "git config user.email t@example.com", "git config user.name t"):
+        subprocess.run(command, shell=True, check=True)
+    with open('a.txt', 'w') as f:
+        f.write('a\n')
+    subprocess.run("git add a.txt && git commit -qm a", shell=True, check=True)
+
+def cached(command, stdout):
+    key = result_cache.cache_key(command)
+    result_cache.put(key, 0, stdout, b'')
+    return key
+
+def test_hit_and_miss():
+    key = cached("cat a.txt", b'a\n')
+    assert result_cache.get(result_cache.cache_key("cat a.txt")) == (0, b'a\n', b'')
+    assert result_cache.get(result_cache.cache_key("cat a.txt | wc -l")) is None
+    assert result_cache.cache_key("cat a.txt") == key
+
+def test_changed_inputs_invalidate():
+    cat, log = cached("cat a.txt", b'a\n'), cached("git log --oneline", b'x a\n')
+    with open('a.txt', 'a') as f:
+        f.write('more\n')
+    assert result_cache.cache_key("cat a.txt") != cat
+    assert result_cache.cache_key("git log --oneline") == log # The worktree is not git log's input...
+    subprocess.run("git commit -qam more", shell=True, check=True)
+    assert result_cache.cache_key("git log --oneline") != log # ...but a new commit is.
+
+def test_eviction_keeps_the_most_recently_used():
+    old, new = cached("cat a.txt", b'x' * 600), cached("ls", b'y' * 600)
+    os.utime(result_cache.entry_path(old), ns=(0, 0))
+    result_cache.evict(max_bytes=1000)
+    assert result_cache.get(old) is None and result_cache.get(new) is not None
+
+@pytest.mark.parametrize("command", [
+    "git status", "git diff", "git grep x", "git ls-files -o", "git ls-files --others --exclude-standard",
+    "git ls-files -mo", "git ls-files --deleted", "git describe --dirty", "git describe --dirty=-wip --tags",
+    "find .", "grep -r a .", "ls -l", "cat *.txt", "cat $HOME/a.txt",
+])
+def test_uncacheable(command):
+    assert result_cache.fingerprint(command) is None
+
+@pytest.mark.parametrize("command", ["git ls-files", "git ls-files -s", "git describe --tags", "git diff --cached", "ls -a", "head -n 5 a.txt"])
+def test_cacheable(command):
+    assert result_cache.fingerprint(command) is not None
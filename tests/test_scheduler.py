@@ -0,0 +1,76 @@
+import json
+import threading
+import time
+
+import pytest
+
+import scheduler
+
+@pytest.fixture
+def sched(tmp_path):
+    return scheduler.Scheduler(max_queued=2, max_readers=2, stats_file=str(tmp_path / 'stats.json'))
+
+def queue_writer(sched, agent, priority, order):
+    def run():
+        wait_ms = sched.admit(agent, False, priority)
+        order.append(agent)
+        sched.release(agent, False, wait_ms, 1.0)
+    thread = threading.Thread(target=run)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while agent not in [ticket[2] for ticket in sched.writers] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return thread
+
+def test_state_changing_calls_run_one_at_a_time_by_priority(sched):
+    wait_ms = sched.admit('a', False)
+    order = []
+    threads = [queue_writer(sched, 'low', 0, order), queue_writer(sched, 'high', 5, order)]
+    assert sched.admit('r', True) == 0.0 # Read-only calls do not wait behind them.
+    sched.release('r', True, 0.0, 1.0)
+    sched.release('a', False, wait_ms, 1.0)
+    for thread in threads:
+        thread.join(5)
+    assert order == ['high', 'low']
+
+def test_full_queue_refuses_calls(sched):
+    sched.admit('a', False)
+    order = []
+    threads = [queue_writer(sched, 'b', 0, order), queue_writer(sched, 'c', 0, order)]
+    with pytest.raises(scheduler.Busy):
+        sched.admit('d', False)
+    sched.release('a', False, 0.0, 1.0)
+    for thread in threads:
+        thread.join(5)
+    assert sched.summary()['agents']['d']['refused'] == 1
+
+def test_readers_are_capped(sched):
+    sched.admit('a', True)
+    sched.admit('b', True)
+    with pytest.raises(scheduler.Cancelled):
+        sched.admit('c', True, cancelled=lambda: True)
+    assert sched.readers_waiting == 0
+
+def test_cancelled_writer_leaves_the_queue(sched):
+    sched.admit('a', False)
+    with pytest.raises(scheduler.Cancelled):
+        sched.admit('b', False, cancelled=lambda: True)
+    assert sched.writers == []
+    sched.release('a', False, 0.0, 1.0)
+    assert sched.admit('c', False) == 0.0
+
+def test_stats_are_recorded_per_agent(sched, tmp_path):
+    for latency in (10.0, 20.0, 30.0):
+        sched.admit('a', True)
+        sched.release('a', True, 0.0, latency)
+    with open(tmp_path / 'stats.json') as f:
+        summary = json.load(f)
+    assert summary['completed'] == 3
+    assert summary['agents']['a']['calls'] == 3
+    assert summary['agents']['a']['latency_ms_p50'] == 20.0
+
+def test_agent_identity():
+    assert scheduler.agent_identity({'GATEWAY_AGENT': 'x', 'TMUX_PANE': '%1'}) == 'x'
+    assert scheduler.agent_identity({'TMUX_PANE': '%1'}) == 'tmux%1'
+    assert scheduler.agent_identity({}) == 'default'
+    assert scheduler.agent_priority({'GATEWAY_PRIORITY': 'high'}) == 0
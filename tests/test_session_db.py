@@ -0,0 +1,68 @@
+import sqlite3
+
+import pytest
+
+import meta_monitor
+import session_db
+import session_log
+
+@pytest.fixture
+def log_path(tmp_path, monkeypatch):
+    monkeypatch.setenv('GATEWAY_SESSION_DB', '1')
+    path = str(tmp_path / 'session.log')
+    writer = session_log.SessionLogWriter(path, segment_bytes=0)
+    writer.append({"type": "session_start", "timestamp": "2026-01-02T03:04:05.123456789Z"})
+    for i in range(1, 21):
+        writer.append({"type": "intent", "details": f"step {i}", "timestamp": f"2026-01-02T03:05:{i:02d}+00:00"})
+        writer.append({"type": "command_result", "command": "git status" if i % 4 else "pytest -q",
+                       "returncode": 1 if i in (12, 15, 19) else 0, "duration_ms": 1.5, "timestamp": f"2026-01-02T03:05:{i:02d}+00:00"})
+    writer.close()
+    return path
+
+def test_mirrors_the_log_losslessly(log_path):
+    store = session_db.get_store(log_path)
+    with open(log_path) as f:
+        assert store.lines() == f.read().splitlines()
+    assert store.tail(3) == list(session_log.read_entries(log_path))[-3:]
+    assert [e['seq'] for e in store.last(3, {'command_result'}, 'pytest')] == [25, 33, 41]
+
+def test_indexed_queries(log_path):
+    store = session_db.get_store(log_path)
+    assert [e['seq'] for e in store.failures('git', 10)] == [31, 39]
+    assert [e['seq'] for e in store.failures('pytest', 10)] == [25]
+    assert [e['seq'] for e in store.failures('git', 3)] == [39]
+    plan = ' '.join(row[-1] for row in store.query(
+        'EXPLAIN QUERY PLAN SELECT event_id FROM command_results WHERE session = 1 AND command_base = ?', ('git',)))
+    assert 'command_results_base' in plan
+    start = session_log.timestamp_ns("2026-01-02T03:05:10+00:00")
+    assert len(store.between(start, start + 2 * 10**9, {'intent'})) == 2
+
+def test_new_session_and_import(log_path):
+    writer = session_log.SessionLogWriter(log_path, segment_bytes=0)
+    writer.new_session()
+    writer.append({"type": "intent", "details": "next"})
+    writer.close()
+    store = session_db.get_store(log_path)
+    assert store.session() == 2 and store.entries() == [{"type": "intent", "details": "next", "seq": 1}]
+    before = [store.lines(1), store.lines(2)]
+    assert store.import_log() == 42
+    assert [store.lines(1), store.lines(2)] == before
+
+def test_readers_do_not_block_the_writer(log_path):
+    reader = sqlite3.connect(session_db.db_path(log_path), isolation_level=None)
+    reader.execute('BEGIN')
+    assert reader.execute('SELECT COUNT(*) FROM events').fetchone() == (41,)
+    writer = session_log.SessionLogWriter(log_path, segment_bytes=0)
+    writer.append({"type": "intent", "details": "during a read"})
+    writer.close()
+    assert reader.execute('SELECT COUNT(*) FROM events').fetchone() == (41,) # Its snapshot.
+    reader.execute('COMMIT')
+    assert reader.execute('SELECT COUNT(*) FROM events').fetchone() == (42,)
+
+def test_monitor_reads_and_records_through_the_store(log_path, monkeypatch, tmp_path):
+    monkeypatch.setattr(meta_monitor, 'SESSION_LOG_FILE', log_path)
+    monkeypatch.setattr(meta_monitor, 'SUGGESTIONS_LOG', str(tmp_path / 'suggestions.log'))
+    triggers = {"patterns": [{"name": "Tool Fixation", "threshold": 1, "message": "{tool_name} failed {count} times"}]}
+    store = session_db.get_store(log_path)
+    meta_monitor.check_for_patterns(meta_monitor.recent_entries(store, triggers), triggers)
+    assert [message for _, message in store.suggestions()] == ["git failed 1 times"]
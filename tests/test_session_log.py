@@ -0,0 +1,159 @@
+import json
+import os
+
+import pytest
+
+import log_segments
+import meta_monitor
+import session_log
+
+@pytest.fixture
+def log_path(tmp_path):
+    path = str(tmp_path / 'session.log')
+    with open(path, 'w') as f: # As bootstrap.sh starts a session, without the writer.
+        f.write(json.dumps({"type": "session_start", "timestamp": "2026-01-02T03:04:05.123456789Z"}) + '\n')
+    writer = session_log.SessionLogWriter(path)
+    for i in range(1, 31):
+        writer.append({"type": "intent", "details": f"step {i}", "timestamp": "2026-01-02T03:04:06.000001+00:00"})
+        writer.append({"type": "command_result", "command": "git status" if i % 3 else "ls -la", "returncode": i % 2})
+    writer.close()
+    return path
+
+def test_timestamp_ns():
+    assert session_log.timestamp_ns("2026-01-02T03:04:05.123456789Z") == 1767323045123456789
+    assert session_log.timestamp_ns("2026-01-02T05:04:05.123456+02:00") == 1767323045123456000
+    assert session_log.timestamp_ns("yesterday") is None
+
+def test_index_covers_every_entry(log_path):
+    with session_log.IndexedSessionLog(log_path) as log:
+        assert log.count == len(log) == 61 # bootstrap's entry was indexed by the first append.
+        first = log.record(0)
+        assert (first.type, first.seq, first.timestamp_ns) == ('session_start', None, 1767323045123456789)
+        assert log.record(-1).command_base == 'ls'
+        assert log.entry(-1) == list(session_log.read_entries(log_path))[-1]
+
+def test_tail_seek_and_filter(log_path):
+    entries = list(session_log.read_entries(log_path))
+    with session_log.IndexedSessionLog(log_path) as log:
+        assert log.tail(3) == entries[-3:]
+        assert log.tail(100) == entries
+        assert log.entry(log.find_seq(17)) == next(e for e in entries if e.get('seq') == 17)
+        assert log.find_seq(1000) is None
+        assert list(log.select({'command_result'}, 'ls')) == [e for e in entries if e.get('command') == 'ls -la']
+        assert log.last(2, {'intent'}) == [e for e in entries if e['type'] == 'intent'][-2:]
+
+def test_appends_past_the_index_are_scanned(log_path):
+    with open(log_path, 'a') as f:
+        f.write(json.dumps({"type": "note", "seq": 61}) + '\n{"type": "partial"')
+    with session_log.IndexedSessionLog(log_path) as log:
+        assert (log.count, len(log)) == (61, 62)
+        assert log.tail(1) == [{"type": "note", "seq": 61}]
+
+def test_torn_or_foreign_index_is_repaired(log_path):
+    with open(log_path + session_log.INDEX_SUFFIX, 'ab') as f:
+        f.write(b'\0' * 10) # A record cut short by a crash.
+    writer = session_log.SessionLogWriter(log_path)
+    writer.append({"type": "intent"})
+    writer.close()
+    os.replace(log_path, log_path + '.old') # Rotated: the index now names another inode.
+    writer = session_log.SessionLogWriter(log_path)
+    writer.append({"type": "intent", "details": "new"})
+    writer.close()
+    with session_log.IndexedSessionLog(log_path + '.old') as log:
+        assert (log.count, len(log)) == (0, 62) # The old log's index was taken over; it is scanned instead.
+    with session_log.IndexedSessionLog(log_path) as log:
+        assert log.count == 1 and log.tail(5)[0]['details'] == 'new'
+
+def test_buffered_writer_writes_in_batches(tmp_path, monkeypatch):
+    path = str(tmp_path / 'session.log')
+    writer = session_log.SessionLogWriter(path)
+    writes = []
+    extend = writer.extend
+    monkeypatch.setattr(writer, 'extend', lambda entries: writes.append(len(entries)) or extend(entries))
+    buffered = session_log.BufferedWriter(writer, max_entries=4)
+    for i in range(10):
+        buffered({"type": "intent", "details": f"step {i}"})
+    assert writes == [4, 4] and len(list(session_log.read_entries(path))) == 8
+    buffered.flush()
+    assert writes == [4, 4, 2]
+    with session_log.IndexedSessionLog(path) as log:
+        assert [entry['seq'] for entry in log.tail(10)] == list(range(1, 11))
+        assert log.entry(log.find_seq(7))['details'] == 'step 6'
+    writer.close()
+
+def test_missing_log():
+    with session_log.IndexedSessionLog('/nonexistent/session.log') as log:
+        assert len(log) == 0 and log.tail(5) == [] and log.last(5) == []
+
+def test_monitor_reads_only_what_its_patterns_need(log_path):
+    triggers = {"patterns": [{"name": "Analysis Paralysis", "threshold": 8, "tools": ["git"]}]}
+    entries = list(session_log.read_entries(log_path))
+    with session_log.IndexedSessionLog(log_path) as log:
+        recent = meta_monitor.recent_entries(log, triggers)
+    assert recent[-meta_monitor.HISTORY_WINDOW:] == entries[-meta_monitor.HISTORY_WINDOW:]
+    commands = [e for e in entries if e['type'] == 'command_result']
+    assert [e for e in recent if e['type'] == 'command_result'][-8:] == commands[-8:]
+
+def append_entries(path, writer_id):
+    writer = session_log.SessionLogWriter(path)
+    for i in range(50):
+        writer.append({"type": "intent", "writer": writer_id, "n": i})
+    writer.close()
+
+def test_concurrent_writers_keep_the_index_whole(tmp_path):
+    import multiprocessing
+    path = str(tmp_path / 'session.log')
+    procs = [multiprocessing.Process(target=append_entries, args=(path, i)) for i in range(4)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    with session_log.IndexedSessionLog(path) as log:
+        assert log.count == len(log) == 200
+        assert [log.record(i).seq for i in range(200)] == list(range(1, 201))
+
+@pytest.fixture
+def sealing_writer(tmp_path, monkeypatch):
+    monkeypatch.setenv('GATEWAY_LOG_COMPRESSION', 'none') # Compressed by the test itself, not in the background.
+    path = str(tmp_path / 'session.log')
+    writer = session_log.SessionLogWriter(path, segment_bytes=400)
+    yield path, writer
+    writer.close()
+
+def test_sealed_segments_read_as_one_log(sealing_writer):
+    path, writer = sealing_writer
+    for i in range(40):
+        writer.append({"type": "command_result", "command": "git status" if i % 2 else "ls", "n": i})
+    manifest = log_segments.read_manifest(path)
+    assert len(manifest['segments']) > 3 and os.path.getsize(path) < 400
+    assert [e['n'] for e in session_log.read_entries(path)] == list(range(40))
+    assert sum(s['entries'] for s in manifest['segments']) + len(session_log.IndexedSessionLog(path)) == 40
+    assert log_segments.compress_segments(path, 'gzip') == len(manifest['segments'])
+    assert [e['n'] for e in session_log.read_entries(path)] == list(range(40))
+    with session_log.IndexedSessionLog(path) as log:
+        assert [e['n'] for e in log.tail(25)] == list(range(15, 40))
+        assert [e['n'] for e in log.last(12, base='ls')] == list(range(16, 40, 2))
+
+def test_reader_follows_a_seal_within_the_session(sealing_writer):
+    path, writer = sealing_writer
+    reader = session_log.SessionLogReader(path)
+    seen = []
+    for i in range(30):
+        writer.append({"type": "intent", "n": i})
+        entries, reset = reader.read_new()
+        assert not reset
+        seen.extend(e['n'] for e in entries)
+    assert seen == list(range(30))
+
+def test_new_session_seals_and_restarts_numbering(sealing_writer):
+    path, writer = sealing_writer
+    for i in range(3):
+        writer.append({"type": "intent", "n": i})
+    sealed = writer.new_session()
+    assert (sealed['session'], sealed['entries'], sealed['last_seq']) == (1, 3, 3)
+    writer.append({"type": "intent", "n": 3})
+    assert session_log.sessions(path) == [1, 2]
+    assert [(e['n'], e['seq']) for e in session_log.read_entries(path)] == [(3, 1)]
+    assert [e['n'] for e in session_log.read_entries(path, session=1)] == [0, 1, 2]
+    with session_log.IndexedSessionLog(path) as log:
+        assert [e['n'] for e in log.tail(5)] == [3] # Earlier sessions are not part of the tail.
@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import shell_pool
+
+RUN_PY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts', 'run.py')
+
+TOKEN = b'__GATEWAY_0123456789abcdef__'
+MARKER = b'\n' + TOKEN
+
+class Collector:
+    def __init__(self):
+        self.data = b''
+
+    def feed(self, chunk):
+        self.data += chunk
+
+def read_frame(stream, chunk_sizes):
+    """Feeds stream to a FrameReader in chunks of the given sizes; returns (reader, output, done after chunk)."""
+    tee = Collector()
+    reader = shell_pool.FrameReader(MARKER, tee)
+    offset, done_at = 0, None
+    for number, size in enumerate(chunk_sizes):
+        if reader.feed(stream[offset:offset + size]):
+            done_at = number
+            break
+        offset += size
+    reader.close()
+    return reader, tee.data, done_at
+
+FRAME = b'line one\nline two' + MARKER + b' 3 /tmp/work dir\n'
+
+@pytest.mark.parametrize("split", range(1, len(FRAME)))
+def test_sentinel_split_across_two_reads(split):
+    reader, output, done_at = read_frame(FRAME, [split, len(FRAME)])
+    assert output == b'line one\nline two'
+    assert reader.trailer == ' 3 /tmp/work dir'
+    assert done_at == 1 # The trailer is only complete with its newline, which is in the second read.
+
+def test_sentinel_fed_one_byte_at_a_time():
+    reader, output, done_at = read_frame(FRAME, [1] * len(FRAME))
+    assert output == b'line one\nline two'
+    assert reader.trailer == ' 3 /tmp/work dir'
+    assert done_at == len(FRAME) - 1
+
+def test_partial_marker_in_output_is_forwarded():
+    stream = b'x' + MARKER[:-1] + b'y\n' + MARKER + b' 0 /\n'
+    reader, output, _ = read_frame(stream, [len(MARKER) // 2] * len(stream))
+    assert output == b'x' + MARKER[:-1] + b'y\n'
+    assert reader.trailer == ' 0 /'
+
+def test_output_is_streamed_before_the_sentinel():
+    tee = Collector()
+    reader = shell_pool.FrameReader(MARKER, tee)
+    assert not reader.feed(b'a' * 1000)
+    assert tee.data == b'a' * (1000 - len(MARKER) + 1) # Only a possible marker prefix is held back.
+
+def test_stream_ending_without_sentinel_keeps_everything():
+    reader, output, done_at = read_frame(b'short', [2, 2, 2])
+    assert output == b'short'
+    assert reader.trailer is None and done_at is None
+
+@pytest.fixture
+def shell(tmp_path):
+    shell = shell_pool.PersistentShell(cwd=str(tmp_path))
+    yield shell
+    shell.close()
+
+def test_persistent_shell_frames_output(shell, tmp_path):
+    out, err = Collector(), Collector()
+    assert shell.run("printf 'no newline'; echo oops >&2; mkdir sub; cd sub; exit_code() { return 4; }; exit_code", out, err) == 4
+    assert out.data == b'no newline'
+    assert err.data == b'oops\n'
+    assert shell.cwd == str(tmp_path / 'sub')
+
+def test_persistent_shell_large_output(shell):
+    out, err = Collector(), Collector()
+    assert shell.run("head -c 300000 /dev/zero | tr '\\0' 'z'", out, err) == 0
+    assert out.data == b'z' * 300000
+
+@pytest.mark.parametrize("stdin, reason", [(subprocess.DEVNULL, b'no gateway daemon'), (subprocess.PIPE, b'stdin is piped')])
+def test_persistent_shell_without_the_daemon_warns(tmp_path, repo_root, stdin, reason):
+    os.symlink(os.path.join(repo_root, 'config'), tmp_path / 'config')
+    proc = subprocess.run([sys.executable, RUN_PY, '--intent', 'cd', '--shell', 'persistent', '--command', 'cd /; pwd'],
+                          cwd=tmp_path, stdin=stdin, capture_output=True)
+    assert proc.returncode == 0 and proc.stdout == b'/\n'
+    assert b'warning: --shell persistent ignored: ' + reason in proc.stderr
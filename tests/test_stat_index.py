@@ -0,0 +1,57 @@
+import os
+import subprocess
+import time
+
+import pytest
+
+import stat_index
+
+@pytest.fixture(autouse=True)
+def worktree(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(stat_index, '_cached', None)
+    os.makedirs('src/sub')
+    for path in ('src/a.txt', 'src/sub/b.txt', 'top.txt'):
+        with open(path, 'w') as f:
+            f.write(path)
+
+def run(command):
+    tracker = stat_index.begin(command)
+    subprocess.run(command, shell=True, check=True)
+    return tracker.finish().get('files_changed', {})
+
+def test_candidates():
+    directories, subtrees = stat_index.candidates("sed -i s/a/b/ src/a.txt && echo x >> src/sub/new.txt", '.')
+    assert directories == {'.', 'src', 'src/sub'}
+    assert subtrees == set()
+    assert stat_index.candidates("rm -rf src", '.')[1] == {'src'}
+    assert stat_index.candidates("python3 tool.py src/a.txt", '.') is None
+    assert stat_index.candidates("cd src && echo x > a.txt", '.') is None
+
+def test_attributes_created_modified_and_deleted_files():
+    assert run("echo more >> src/a.txt") == {'modified': ['src/a.txt']}
+    assert run("touch src/new.txt && rm src/sub/b.txt") == {'created': ['src/new.txt'], 'deleted': ['src/sub/b.txt']}
+    assert run("mkdir -p src/x/y && echo 1 > src/x/y/z.txt") == {'created': ['src/x/y/z.txt']}
+    assert run("rm -rf src/x") == {'deleted': ['src/x/y/z.txt']}
+    assert run("true") == {}
+
+def test_moved_and_copied_files_keep_their_mtime_but_are_created():
+    run("true") # Builds the index.
+    time.sleep(0.05) # Past the filesystem clock's granularity.
+    assert run("mv src/a.txt src/sub/a.txt") == {'created': ['src/sub/a.txt'], 'deleted': ['src/a.txt']}
+    assert run("cp -p top.txt src/top.txt") == {'created': ['src/top.txt']}
+    assert run("mv src/sub moved") == {'created': ['moved/a.txt', 'moved/b.txt'], 'deleted': ['src/sub/a.txt', 'src/sub/b.txt']}
+    assert run("mv moved/b.txt top.txt") == {'created': ['top.txt'], 'deleted': ['moved/b.txt']}
+
+def test_untargeted_commands_find_in_place_writes_anywhere():
+    assert run("python3 -c \"open('src/sub/b.txt', 'a').write('x')\"") == {'modified': ['src/sub/b.txt']}
+
+def test_changes_made_before_the_command_are_not_attributed_to_it():
+    run("true") # Builds the index.
+    with open('src/a.txt', 'a') as f:
+        f.write('edited outside the gateway')
+    time.sleep(0.05) # Past the filesystem clock's granularity.
+    assert run("touch top.txt") == {'modified': ['top.txt']}
+
+def test_gateway_state_and_session_log_are_ignored():
+    assert run("mkdir -p .gateway && echo x > .gateway/state && echo y >> session.log") == {}